@@ -0,0 +1,333 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+from fastapi import HTTPException, Request
+from metrics import metrics
+
+
+# Only honour X-Forwarded-For behind a proxy that sets it
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "false").lower() == "true"
+
+admission_wait_seconds = metrics.histogram(
+    "perplex_admission_wait_seconds", "Time agent runs waited in the admission queue", ("agent",)
+)
+admission_rejected_total = metrics.counter(
+    "perplex_admission_rejected_total",
+    "Requests turned away by admission control (rate_limited, queue_full, queue_timeout)",
+    ("agent", "reason")
+)
+
+
+class AdmissionRejected(HTTPException):
+    """Raised when a request is turned away; rendered as 429 or 503 with Retry-After"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            status_code=status_code,
+            detail=f"Server busy ({reason}), retry in {self.retry_after}s",
+            headers={"Retry-After": str(self.retry_after)}
+        )
+
+
+class TokenBucket:
+    """Refills rate tokens per second up to burst; each request takes one, or its cost"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1) -> float:
+        """
+        Take cost tokens; returns 0 on success or the seconds until they are available
+
+        A cost above burst only needs a full bucket and leaves it in debt, so the
+        client's later requests wait until the whole cost has been refilled.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        needed = min(cost, self.burst)
+        if self.tokens >= needed:
+            self.tokens -= cost
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Per-client token buckets, least recently seen clients forgotten first"""
+
+    def __init__(self, requests_per_minute: float = 30, burst: float = 10, max_clients: int = 10000):
+        """
+        Args:
+            requests_per_minute: Sustained request rate per client; 0 disables rate limiting
+            burst: Requests a client may make at once before the sustained rate applies
+            max_clients: Clients tracked before the least recently seen are dropped
+        """
+        self.rate = requests_per_minute / 60
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def check(self, client_id: str, cost: float = 1) -> None:
+        """
+        Take tokens for a client, raising AdmissionRejected (429) when it has too few left
+
+        Args:
+            client_id: Caller, as returned by client_id()
+            cost: Tokens the request takes, e.g. one per item of a batch
+        """
+        if self.rate <= 0:
+            return
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = self._buckets[client_id] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(client_id)
+
+        wait = bucket.take(cost)
+        if wait:
+            admission_rejected_total.inc(agent="", reason="rate_limited")
+            raise AdmissionRejected(429, "rate_limited", wait)
+
+
+class AdmissionSlot:
+    """A granted run slot; release it when the run finishes"""
+
+    def __init__(self, controller: "AdmissionController", agent_type: str, agent_semaphore: Optional[asyncio.Semaphore]):
+        self.controller = controller
+        self.agent_type = agent_type
+        self.agent_semaphore = agent_semaphore
+        self.started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self.controller._release(self)
+
+
+class AdmissionController:
+    """
+    Caps concurrent agent runs globally and per agent, queueing the overflow
+
+    A run that cannot start immediately waits in a bounded queue. When the
+    queue is full, or the wait exceeds the deadline, the request is rejected
+    with a 503 and a Retry-After estimated from recent run times.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 32,
+        agent_limits: Dict[str, int] = None,
+        max_queue: int = 100,
+        queue_timeout: float = 10
+    ):
+        """
+        Args:
+            max_concurrent: Agent runs allowed at once across all agents
+            agent_limits: Mapping of agent type to its own concurrency cap
+            max_queue: Runs allowed to wait for a slot before new ones are rejected
+            queue_timeout: Seconds a run may wait for a slot
+        """
+        self.max_concurrent = max_concurrent
+        self.agent_limits = {agent: limit for agent, limit in (agent_limits or {}).items() if limit > 0}
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._global = asyncio.Semaphore(max_concurrent)
+        self._agents = {agent: asyncio.Semaphore(limit) for agent, limit in self.agent_limits.items()}
+
+        self.in_flight: Dict[str, int] = {}
+        self.waiting: Dict[str, int] = {}
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        # Moving average of run duration, used to estimate Retry-After
+        self.average_run_seconds = 5.0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(self.waiting.values())
+
+    def _retry_after(self) -> float:
+        return self.average_run_seconds * (self.queue_depth + 1) / self.max_concurrent
+
+    def _reject(self, agent_type: str, reason: str) -> AdmissionRejected:
+        self.rejected += 1
+        admission_rejected_total.inc(agent=agent_type, reason=reason)
+        return AdmissionRejected(503, reason, self._retry_after())
+
+    def check(self, agent_type: str) -> None:
+        """
+        Reject a run now, without waiting, if it would find the queue full
+
+        Raises:
+            AdmissionRejected: Every slot is taken and the queue is full
+        """
+        agent_semaphore = self._agents.get(agent_type)
+        must_wait = self._global.locked() or (agent_semaphore is not None and agent_semaphore.locked())
+        if must_wait and self.queue_depth >= self.max_queue:
+            raise self._reject(agent_type, "queue_full")
+
+    async def acquire(self, agent_type: str) -> AdmissionSlot:
+        """
+        Wait for a run slot for an agent
+
+        Args:
+            agent_type: Agent the run belongs to
+
+        Returns:
+            The granted slot, to be released when the run finishes
+
+        Raises:
+            AdmissionRejected: The queue is full or the wait timed out
+        """
+        agent_semaphore = self._agents.get(agent_type)
+        must_wait = self._global.locked() or (agent_semaphore is not None and agent_semaphore.locked())
+
+        if must_wait:
+            if self.queue_depth >= self.max_queue:
+                raise self._reject(agent_type, "queue_full")
+            self.queued += 1
+            self.waiting[agent_type] = self.waiting.get(agent_type, 0) + 1
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(self._acquire(agent_semaphore), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._reject(agent_type, "queue_timeout")
+            finally:
+                self.waiting[agent_type] -= 1
+                admission_wait_seconds.observe(time.monotonic() - started, agent=agent_type)
+        else:
+            await self._acquire(agent_semaphore)
+            admission_wait_seconds.observe(0.0, agent=agent_type)
+
+        self.admitted += 1
+        self.in_flight[agent_type] = self.in_flight.get(agent_type, 0) + 1
+        return AdmissionSlot(self, agent_type, agent_semaphore)
+
+    async def _acquire(self, agent_semaphore: Optional[asyncio.Semaphore]) -> None:
+        """Take the agent slot, then the global one, so waiters never hold a global slot idle"""
+        if agent_semaphore is not None:
+            await agent_semaphore.acquire()
+        try:
+            await self._global.acquire()
+        except BaseException:
+            if agent_semaphore is not None:
+                agent_semaphore.release()
+            raise
+
+    def _release(self, slot: AdmissionSlot) -> None:
+        self._global.release()
+        if slot.agent_semaphore is not None:
+            slot.agent_semaphore.release()
+        self.in_flight[slot.agent_type] -= 1
+        duration = time.monotonic() - slot.started
+        self.average_run_seconds = 0.9 * self.average_run_seconds + 0.1 * duration
+
+    @asynccontextmanager
+    async def slot(self, agent_type: str) -> AsyncIterator[AdmissionSlot]:
+        """Hold a run slot for the duration of the block"""
+        slot = await self.acquire(agent_type)
+        try:
+            yield slot
+        finally:
+            slot.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Concurrency, queue and rejection counters for monitoring"""
+        return {
+            "max_concurrent": self.max_concurrent,
+            "agent_limits": self.agent_limits,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "in_flight": dict(self.in_flight),
+            "waiting": dict(self.waiting),
+            "queue_depth": self.queue_depth,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "average_run_seconds": self.average_run_seconds
+        }
+
+    def gauge(self) -> Dict[Tuple[str, str], float]:
+        """Per-agent in-flight and waiting counts for /metrics"""
+        values = {}
+        for agent_type, count in self.in_flight.items():
+            values[(agent_type, "in_flight")] = count
+        for agent_type, count in self.waiting.items():
+            values[(agent_type, "waiting")] = count
+        return values
+
+
+T = TypeVar("T")
+
+
+async def retry_rejected(call: Callable[[], Awaitable[T]], max_attempts: int = 3) -> T:
+    """
+    Run call, waiting out admission rejections before trying again
+
+    For work nobody is waiting on interactively, such as background jobs and
+    batches, which can afford to queue behind live traffic.
+
+    Raises:
+        AdmissionRejected: Still rejected after max_attempts tries
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return await call()
+        except AdmissionRejected as e:
+            if attempt == max_attempts:
+                raise
+            await asyncio.sleep(e.retry_after)
+
+
+def client_id(request: Request) -> str:
+    """Identify the caller: an API key header if sent, otherwise the client address"""
+    api_key = request.headers.get("X-API-Key")
+    if api_key:
+        return f"key:{api_key}"
+    forwarded = request.headers.get("X-Forwarded-For") if TRUST_FORWARDED_FOR else None
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def enforce_rate_limit(request: Request) -> None:
+    """FastAPI dependency applying the per-client rate limit"""
+    rate_limiter.check(client_id(request))
+
+
+def charge_rate_limit(request: Request, cost: float) -> None:
+    """Apply the per-client rate limit to a request that does the work of cost requests"""
+    rate_limiter.check(client_id(request), cost)
+
+
+# Global admission controller and rate limiter instances
+admission_controller = AdmissionController(
+    max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", 32)),
+    agent_limits={
+        "general": int(os.getenv("ADMISSION_MAX_CONCURRENT_GENERAL", 0)),
+        "sports": int(os.getenv("ADMISSION_MAX_CONCURRENT_SPORTS", 0)),
+        "finance": int(os.getenv("ADMISSION_MAX_CONCURRENT_FINANCE", 0)),
+    },
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", 100)),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 10))
+)
+rate_limiter = RateLimiter(
+    requests_per_minute=float(os.getenv("RATE_LIMIT_PER_MINUTE", 30)),
+    burst=float(os.getenv("RATE_LIMIT_BURST", 10))
+)
+
+metrics.gauge_callback(
+    "perplex_admission", "Agent runs in flight and waiting for a slot", ("agent", "state"), admission_controller.gauge
+)
@@ -1,23 +1,33 @@
-from openai import OpenAI
 from agents import function_tool
-from dotenv import load_dotenv
-import os
-from tools import execute_web_search
+from typing import List
+from tools import execute_web_search_async, execute_batch_search_async, execute_local_search_async, search_tool_error, SEARCH_RESULTS_GUIDE
 import logging
-from models import PerplexityResponse
-from base_agent import BaseAgent
+from models import AgentAnswer
+from base_agent import BaseAgent, build_instructions
+from agent_registry import agent_registry
+from result_index import result_index
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
-load_dotenv()
 
 # Create the web search tool using function_tool decorator
-@function_tool
-def web_search(query: str, num_results: int = 5) -> str:
+@function_tool(failure_error_function=search_tool_error)
+async def web_search(query: str, num_results: int = 5) -> str:
     """Search the web for current information on any topic"""
     # Add subtle current context to search queries for more recent results (less aggressive)
     enhanced_query = f"{query} recent latest"
-    return execute_web_search(enhanced_query, num_results)
+    return await execute_web_search_async(enhanced_query, num_results)
+
+@function_tool(failure_error_function=search_tool_error)
+async def web_search_batch(queries: List[str], num_results: int = 5) -> str:
+    """Search the web for several queries at once, e.g. one per company or topic, and get merged results"""
+    enhanced_queries = [f"{query} recent latest" for query in queries]
+    return await execute_batch_search_async(enhanced_queries, "web", num_results)
+
+@function_tool(failure_error_function=search_tool_error)
+async def local_search(query: str, num_results: int = 5) -> str:
+    """Search results this service has seen recently, falling back to a live web search when they are missing or stale"""
+    return await execute_local_search_async(query, num_results, web_query=f"{query} recent latest")
 
 class PerplexityAgent(BaseAgent):
     """Main agent class for the Perplexity AI clone using OpenAI Agent SDK"""
@@ -26,32 +36,50 @@ class PerplexityAgent(BaseAgent):
         """Create the OpenAI agent with tools"""
         if not self.agent:
             from agents import Agent
+            # Like live_scores for sports, the index tool and its guide go last so the rest
+            # of the prompt prefix is the same with the index on or off
+            tools = [web_search, web_search_batch]
+            local_search_guide = ""
+            if result_index.enabled:
+                tools.append(local_search)
+                local_search_guide = (
+                    "For a single search, call local_search instead of web_search: it answers from results "
+                    "seen recently when they cover the question and searches the web itself otherwise. "
+                    "Use web_search when its results are not enough and for questions about the last few hours."
+                )
             self.agent = Agent(
                 name="Perplexity AI Clone",
-                instructions="""You are a helpful AI assistant similar to Perplexity AI. 
+                instructions=build_instructions(
+                    """You are a helpful AI assistant similar to Perplexity AI. 
                 
                 When users ask questions that require current information, use the web_search tool 
                 to find relevant, up-to-date information and then provide your response in the 
-                structured format.
+                structured format. When a question needs several separate searches (for example 
+                comparing multiple companies, people or topics), use web_search_batch with one 
+                query per entity in a single call instead of calling web_search repeatedly.
                 
                 Your response should include:
                 1. A comprehensive summary that synthesizes the search results into a clear, 
                    informative response written in a natural, engaging style
-                2. A list of all sources from your search results, each with the exact title 
-                   and complete URL
+                2. The numbers of the search results your summary draws on, as citations
                 
                 Make sure to:
                 - Write a comprehensive but concise summary focusing on current and recent information
-                - Include ALL sources from your search results
-                - Use the exact titles and URLs provided in the search results
+                - Cite every search result you used
                 - Cite specific facts and figures when available in the summary
                 - Prioritize recent information and current events
-                - When searching, focus on the most up-to-date information available""",
-                tools=[web_search],
+                - When searching, focus on the most up-to-date information available
+                """,
+                    SEARCH_RESULTS_GUIDE,
+                    local_search_guide
+                ),
+                tools=tools,
                 model="gpt-4o-mini",
-                output_type=PerplexityResponse
+                output_type=AgentAnswer,
+                model_settings=self.model_settings()
             )
         return self.agent
 
 # Create a global instance
 perplexity_agent = PerplexityAgent()
+agent_registry.register(perplexity_agent)
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+from typing import Any, Dict
+from agents import Agent, AgentOutputSchema
+from base_agent import BaseAgent
+from history_policy import count_tokens
+from metrics import tokens_total
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# OpenAI only caches prompts at least this long; a shorter prefix is cached only together with conversation history
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+
+def prompt_prefix(agent: Agent) -> Dict[str, Any]:
+    """The part of every request that comes before the conversation: model, tool schemas, instructions and output schema"""
+    return {
+        "model": str(agent.model),
+        "tools": [
+            {
+                "name": tool.name,
+                "description": getattr(tool, "description", ""),
+                "parameters": getattr(tool, "params_json_schema", {}),
+                "strict": getattr(tool, "strict_json_schema", None)
+            }
+            for tool in agent.tools
+        ],
+        "instructions": agent.instructions,
+        "output": AgentOutputSchema(agent.output_type).json_schema() if agent.output_type else None
+    }
+
+
+def prefix_fingerprint(agent: Agent) -> str:
+    """Short hash of an agent's prompt prefix; equal fingerprints mean requests can share cached prompt tokens"""
+    payload = json.dumps(prompt_prefix(agent), sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class AgentRegistry:
+    """
+    The agents the app serves, built once at startup
+
+    Provider-side prompt caching only reuses a prefix that is byte-identical to
+    an earlier request's. The registry builds every agent once, fingerprints
+    its prompt prefix, warns if that prefix ever changes, and reports how much
+    of each agent's input was read from the cache.
+    """
+
+    def __init__(self):
+        self.agents: Dict[str, BaseAgent] = {}
+        # agent type -> prefix fingerprint at build time
+        self._fingerprints: Dict[str, str] = {}
+        self._prefix_tokens: Dict[str, int] = {}
+
+    def register(self, agent: BaseAgent) -> None:
+        self.agents[agent.agent_type] = agent
+
+    def get(self, agent_type: str) -> BaseAgent:
+        return self.agents[agent_type]
+
+    def build(self) -> None:
+        """Create every registered agent and record its prompt prefix"""
+        for agent_type, agent in self.agents.items():
+            built = agent.create_agent()
+            self._fingerprints[agent_type] = prefix_fingerprint(built)
+            self._prefix_tokens[agent_type] = count_tokens([prompt_prefix(built)])
+            logger.info(
+                f"Built {agent_type} agent: prompt prefix {self._fingerprints[agent_type]}, "
+                f"~{self._prefix_tokens[agent_type]} tokens"
+            )
+
+    def cache_stats(self, agent_type: str) -> Dict[str, Any]:
+        """Prompt prefix and cached input tokens for one agent"""
+        agent = self.agents[agent_type].create_agent()
+        fingerprint = prefix_fingerprint(agent)
+        if agent_type in self._fingerprints and fingerprint != self._fingerprints[agent_type]:
+            logger.warning(
+                f"The {agent_type} agent's prompt prefix changed since startup "
+                f"({self._fingerprints[agent_type]} -> {fingerprint}); cached prompts no longer match"
+            )
+
+        input_tokens = tokens_total.total(kind="input", agent=agent_type)
+        cached_tokens = tokens_total.total(kind="cached_input", agent=agent_type)
+        prefix_tokens = self._prefix_tokens.get(agent_type) or count_tokens([prompt_prefix(agent)])
+        return {
+            "prefix_fingerprint": fingerprint,
+            "prefix_tokens": prefix_tokens,
+            "prefix_cacheable": prefix_tokens >= PROMPT_CACHE_MIN_TOKENS,
+            "input_tokens": int(input_tokens),
+            "cached_input_tokens": int(cached_tokens),
+            "cached_ratio": cached_tokens / input_tokens if input_tokens else 0.0
+        }
+
+    def describe(self, agent_type: str) -> Dict[str, Any]:
+        """Name, model, tools and prompt cache statistics of a built agent"""
+        agent = self.agents[agent_type].create_agent()
+        return {
+            "type": agent_type,
+            "name": agent.name,
+            "model": agent.model,
+            "tools": [tool.name for tool in agent.tools],
+            "prompt_cache": self.cache_stats(agent_type)
+        }
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Prompt cache statistics for every agent"""
+        return {agent_type: self.cache_stats(agent_type) for agent_type in self.agents}
+
+
+# Global agent registry instance; agent modules register their instances on import
+agent_registry = AgentRegistry()
@@ -0,0 +1,284 @@
+import hashlib
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Set, Tuple
+from models import PerplexityResponse
+
+
+SparseVector = Dict[int, float]
+
+# Words that carry no topic and would otherwise inflate similarity between unrelated questions
+STOPWORDS = {
+    "a", "an", "and", "are", "about", "at", "be", "can", "did", "do", "does", "for", "from",
+    "get", "give", "how", "i", "in", "is", "it", "me", "of", "on", "or", "please", "tell",
+    "that", "the", "their", "to", "was", "were", "what", "whats", "when", "where", "which",
+    "who", "why", "with", "you"
+}
+
+# Answers age out faster where the underlying data moves faster
+DEFAULT_TTLS = {
+    "finance": float(os.getenv("ANSWER_CACHE_TTL_FINANCE", 300)),
+    "sports": float(os.getenv("ANSWER_CACHE_TTL_SPORTS", 900)),
+    "general": float(os.getenv("ANSWER_CACHE_TTL_GENERAL", 3600)),
+}
+
+
+def normalize_message(message: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", message.lower()).split())
+
+
+def content_words(message: str) -> List[str]:
+    """Content words of a message, stopwords removed and trailing plural 's' stripped"""
+    words = []
+    for word in normalize_message(message).split():
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def content_terms(message: str) -> Set[str]:
+    return set(content_words(message))
+
+
+def entity_terms(message: str) -> Set[str]:
+    """
+    Terms that name a specific thing: numbers, tickers and capitalised words past the first
+
+    Returned in content_terms form so they can be looked up in another message's terms.
+    """
+    words = re.sub(r"[^\w\s]", " ", message).split()
+    entities = set()
+    for position, word in enumerate(words):
+        if any(char.isdigit() for char in word) or (word.isupper() and len(word) > 1) or (position and word[0].isupper()):
+            entities |= content_terms(word)
+    return entities
+
+
+def same_subject(a: str, b: str, lexical: bool = False) -> bool:
+    """
+    Whether two similar questions can share an answer
+
+    Embedding similarity cannot tell a rephrasing from a question about a different
+    entity, so every entity in one message must also appear in the other.
+
+    Args:
+        a: One message
+        b: The other message
+        lexical: The embedder only sees word overlap, so it can't tell "arizona" for
+            "pennsylvania" from a synonym; a word in each message that the other lacks
+            then means a different subject. Words only one message adds are left to
+            the similarity threshold.
+    """
+    terms_a, terms_b = content_terms(a), content_terms(b)
+    if lexical and terms_a - terms_b and terms_b - terms_a:
+        return False
+    return entity_terms(a) <= terms_b and entity_terms(b) <= terms_a
+
+
+def _normalize_vector(vector: SparseVector) -> SparseVector:
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {index: value / norm for index, value in vector.items()} if norm else {}
+
+
+class HashingEmbedder:
+    """
+    Local, dependency-free stand-in for an embedding model
+
+    Hashes content words (stopwords removed, trailing plural 's' stripped) into
+    a fixed number of buckets. Good enough to match rephrasings that share the
+    same key terms, and fully offline for tests. It only sees word overlap, so a
+    question differing in one entity still scores high; lexical tells the cache
+    not to reuse an answer across questions with a word swapped for another.
+    """
+
+    lexical = True
+
+    def __init__(self, dimensions: int = 4096):
+        self.dimensions = dimensions
+
+    async def embed(self, text: str) -> SparseVector:
+        vector: SparseVector = {}
+        for word in content_words(text):
+            bucket = int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dimensions
+            vector[bucket] = vector.get(bucket, 0.0) + 1.0
+        return _normalize_vector(vector)
+
+
+class OpenAIEmbedder:
+    """Embeds messages with the OpenAI embeddings API"""
+
+    lexical = False
+
+    def __init__(self, model: str = "text-embedding-3-small", client=None):
+        """
+        Args:
+            model: Embedding model
+            client: AsyncOpenAI client; the app lifespan passes its shared one, otherwise one is created on first use
+        """
+        self.client = client
+        self.model = model
+
+    async def embed(self, text: str) -> SparseVector:
+        if self.client is None:
+            from openai import AsyncOpenAI
+            self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        response = await self.client.embeddings.create(model=self.model, input=text)
+        return _normalize_vector(dict(enumerate(response.data[0].embedding)))
+
+
+def cosine(a: SparseVector, b: SparseVector) -> float:
+    """Cosine similarity of two normalized sparse vectors"""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(index, 0.0) for index, value in a.items())
+
+
+class AnswerEntry:
+    """A cached answer and the question it was produced for"""
+
+    def __init__(self, message: str, vector: SparseVector, response: PerplexityResponse, ttl: float):
+        self.message = message
+        self.vector = vector
+        self.response = response
+        self.expires_at = time.monotonic() + ttl
+
+
+class AnswerCache:
+    """Semantic cache of first-turn answers, indexed per agent type"""
+
+    def __init__(
+        self,
+        embedder=None,
+        threshold: float = 0.85,
+        max_entries: int = 1000,
+        ttls: Dict[str, float] = None
+    ):
+        """
+        Args:
+            embedder: Object with an async embed(text) -> sparse vector method
+            threshold: Minimum cosine similarity for a cached answer to be reused
+            max_entries: Maximum cached answers per agent type before LRU eviction
+            ttls: Mapping of agent type to answer TTL in seconds
+        """
+        self.embedder = embedder or HashingEmbedder()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttls = ttls if ttls is not None else dict(DEFAULT_TTLS)
+        # agent type -> normalized message -> entry, least recently used first
+        self._index: Dict[str, "OrderedDict[str, AnswerEntry]"] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ttl_for(self, agent_type: str) -> float:
+        return self.ttls.get(agent_type, self.ttls.get("general", 3600))
+
+    async def lookup(
+        self, agent_type: str, message: str
+    ) -> Tuple[Optional[Tuple[PerplexityResponse, float]], Optional[SparseVector]]:
+        """
+        Find a cached answer for a similar question
+
+        Args:
+            agent_type: Agent the question was sent to
+            message: The user's question
+
+        Returns:
+            The cached response and its similarity, or None on a miss, and the message's
+            embedding if one was computed, so store can reuse it instead of embedding again
+        """
+        entries = self._index.get(agent_type)
+        key = normalize_message(message)
+        if not entries:
+            self.misses += 1
+            return None, None
+
+        now = time.monotonic()
+        for expired in [k for k, entry in entries.items() if entry.expires_at <= now]:
+            del entries[expired]
+
+        vector = None
+        best, best_score = entries.get(key), 1.0
+        if best is None:
+            vector = await self.embedder.embed(message)
+            best_score = 0.0
+            lexical = getattr(self.embedder, "lexical", False)
+            for entry in entries.values():
+                if not same_subject(message, entry.message, lexical):
+                    continue
+                score = cosine(vector, entry.vector)
+                if score > best_score:
+                    best, best_score = entry, score
+
+        if best is None or best_score < self.threshold:
+            self.misses += 1
+            return None, vector
+
+        entries.move_to_end(normalize_message(best.message))
+        self.hits += 1
+        return (best.response, best_score), vector
+
+    async def store(
+        self, agent_type: str, message: str, response: PerplexityResponse, vector: Optional[SparseVector] = None
+    ) -> None:
+        """
+        Cache an answer for a question
+
+        Args:
+            agent_type: Agent the question was sent to
+            message: The user's question
+            response: The answer to cache
+            vector: The message's embedding from lookup; computed here if not given
+        """
+        if vector is None:
+            vector = await self.embedder.embed(message)
+        if not vector:
+            return
+
+        entries = self._index.setdefault(agent_type, OrderedDict())
+        key = normalize_message(message)
+        entries[key] = AnswerEntry(message, vector, response, self.ttl_for(agent_type))
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._index.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "embedder": type(self.embedder).__name__,
+            "threshold": self.threshold,
+            "entries": {agent_type: len(entries) for agent_type, entries in self._index.items()},
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "ttls": self.ttls
+        }
+
+
+def create_answer_cache() -> AnswerCache:
+    """Build the answer cache from ANSWER_CACHE_* settings"""
+    embedder = OpenAIEmbedder() if os.getenv("ANSWER_CACHE_EMBEDDER", "local") == "openai" else HashingEmbedder()
+    return AnswerCache(
+        embedder=embedder,
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.85)),
+        max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1000))
+    )
+
+
+# Global answer cache instance
+answer_cache = create_answer_cache()
@@ -1,75 +1,338 @@
-from openai import OpenAI
-from agents import Agent, Runner
-from dotenv import load_dotenv
+from openai.types.responses import ResponseTextDeltaEvent
+from agents import ModelSettings, Runner
+import asyncio
+import inspect
 import os
 import logging
+import time
 import uuid
-from models import PerplexityResponse
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Any, Iterator, List
+from models import AgentAnswer, PerplexityResponse
 from abc import ABC, abstractmethod
 from conversation_storage import conversation_manager
+from summary_cache import summary_scheduler
+from streaming import SummaryTokenExtractor
+from tools import cited_sources, search_failures_sink, search_results_sink
+from answer_cache import answer_cache
+from metrics import MetricsHooks, labelled, record_run_usage, span
+from admission import AdmissionRejected, admission_controller
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
-load_dotenv()
+
+
+class InflightRuns:
+    """Counts agent runs serving requests so shutdown can wait for them to finish"""
+    
+    def __init__(self):
+        self.active = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+    
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        self.active += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            if not self.active:
+                self._idle.set()
+    
+    async def drain(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for in-flight runs; False if some were still running"""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+# Global in-flight run tracker
+inflight_runs = InflightRuns()
+
+
+def build_instructions(*sections: str) -> str:
+    """
+    Join instruction sections into the exact text sent with every request
+
+    Source indentation and trailing spaces are removed and empty sections are
+    skipped. Sections that depend on configuration should come last, so agents
+    configured differently still share as much of the cached prompt as possible.
+    """
+    cleaned = []
+    for section in sections:
+        lines = [line.rstrip() for line in inspect.cleandoc(section).splitlines()]
+        if any(lines):
+            cleaned.append("\n".join(lines))
+    return "\n\n".join(cleaned)
 
 
 class BaseAgent(ABC):
     """Base agent class containing common functionality for all specialized agents"""
     
+    # Key for per-agent caches and settings
+    agent_type = "general"
+    
+    # Prompt used to generate the landing page summary for this agent's domain
+    summary_prompt = "Give me a comprehensive overview of the latest news and updates in this domain."
+    
     def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.agent = None
         
+    def model_settings(self) -> ModelSettings:
+        """
+        Settings for every run of this agent
+        
+        The prompt cache key sends all of this agent's requests, which share one
+        prompt prefix, to the same provider-side prompt cache. It goes in the
+        request body because the openai client versions allowed by pyproject
+        don't all accept it as a keyword argument.
+        """
+        return ModelSettings(extra_body={"prompt_cache_key": f"perplex-{self.agent_type}"})
+    
     @abstractmethod
     def create_agent(self):
         """Create the specialized agent - must be implemented by subclasses"""
         pass
     
+    def _build_response(self, result, results: List[Dict[str, Any]]) -> PerplexityResponse:
+        """The model's summary, with explore_more built from the search results recorded during the run"""
+        answer = result.final_output_as(AgentAnswer)
+        return PerplexityResponse(summary=answer.summary, explore_more=cited_sources(results, answer.citations))
+    
     async def chat(self, message: str, thread_id: str = None):
-        """Chat with the agent - common implementation for all agents"""
+        """Chat with the agent - common implementation for all agents
+        
+        First-turn requests (no thread_id) are answered from the semantic answer
+        cache when a similar question was answered recently; the returned "cache"
+        key reports "hit", "miss" or "bypass". Answers are only cached when every
+        search of the run succeeded and at least one result was found.
+        
+        A failed run still returns an apology as the response, for endpoints that
+        show it to the user, with the failure in the "error" key.
+        """
         if not self.agent:
             self.create_agent()
         
+        # Only thread-less questions are independent of prior conversation and safe to share
+        use_cache = not thread_id and os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+        
         # Generate thread_id if not provided
         if not thread_id:
             thread_id = str(uuid.uuid4())
         
-        try:
-            # Get the session for this thread_id
-            session = conversation_manager.get_session(thread_id)
-            
-            # Run the agent with session to maintain conversation history
-            result = await Runner.run(
-                starting_agent=self.agent,
-                input=message,
-                session=session
-            )
-            
-            logger.info(f"{self.__class__.__name__} response: {result}")
-            
-            # Extract the structured response
-            structured_response = result.final_output_as(PerplexityResponse)
-            
-            return {
-                "response": structured_response,
-                "thread_id": thread_id
-            }
-            
-        except Exception as e:
-            logger.error(f"Error in {self.__class__.__name__} chat: {e}")
-            error_response = PerplexityResponse(
-                summary=f"I encountered an error while processing your request: {str(e)}",
-                explore_more=[]
-            )
-            
-            return {
-                "response": error_response,
-                "thread_id": thread_id or "error"
-            }
+        with labelled(agent=self.agent_type), inflight_runs.track():
+            try:
+                # Get the session for this thread_id
+                with span("session_open"):
+                    session = await conversation_manager.get_session(thread_id)
+                
+                vector = None
+                if use_cache:
+                    cached, vector = await answer_cache.lookup(self.agent_type, message)
+                    if cached:
+                        cached_response, similarity = cached
+                        # Seed the new thread so follow-up questions keep the context
+                        await session.add_items([
+                            {"role": "user", "content": message},
+                            {"role": "assistant", "content": cached_response.model_dump_json()}
+                        ])
+                        return {
+                            "response": cached_response,
+                            "thread_id": thread_id,
+                            "cache": "hit",
+                            "similarity": similarity
+                        }
+                
+                # Threads handed out with a precomputed summary get it in their history on first use
+                seed_items = await summary_scheduler.claim_seed(thread_id)
+                if seed_items:
+                    await session.add_items(seed_items)
+                
+                # Run the agent with session to maintain conversation history,
+                # once admission control grants a slot
+                results = []
+                failures = []
+                hooks = MetricsHooks()
+                async with admission_controller.slot(self.agent_type):
+                    started = time.perf_counter()
+                    sink_token = search_results_sink.set(results)
+                    failures_token = search_failures_sink.set(failures)
+                    try:
+                        result = await Runner.run(
+                            starting_agent=self.agent,
+                            input=message,
+                            session=session,
+                            hooks=hooks
+                        )
+                    finally:
+                        search_failures_sink.reset(failures_token)
+                        search_results_sink.reset(sink_token)
+                
+                usage = result.context_wrapper.usage
+                record_run_usage(usage, hooks.tool_calls)
+                logger.info(
+                    f"{self.__class__.__name__} run finished in {time.perf_counter() - started:.2f}s: "
+                    f"{usage.requests} LLM requests, {hooks.tool_calls} tool calls, "
+                    f"{usage.input_tokens} input / {usage.output_tokens} output tokens"
+                )
+                
+                # Extract the structured response
+                with span("parse_output"):
+                    structured_response = self._build_response(result, results)
+                
+                # An answer written while search was down, or with nothing found, shouldn't be
+                # served to everyone asking something similar until it expires
+                if use_cache and results and not failures:
+                    await answer_cache.store(self.agent_type, message, structured_response, vector)
+                elif use_cache:
+                    logger.info(
+                        f"Not caching {self.agent_type} answer: {len(failures)} failed searches, {len(results)} results"
+                    )
+                
+                return {
+                    "response": structured_response,
+                    "thread_id": thread_id,
+                    "cache": "miss" if use_cache else "bypass"
+                }
+                
+            except AdmissionRejected:
+                raise
+            except Exception as e:
+                logger.error(f"Error in {self.__class__.__name__} chat: {e}")
+                error_response = PerplexityResponse(
+                    summary=f"I encountered an error while processing your request: {str(e)}",
+                    explore_more=[]
+                )
+                
+                return {
+                    "response": error_response,
+                    "thread_id": thread_id or "error",
+                    "error": str(e)
+                }
+
+    async def chat_stream(self, message: str, thread_id: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Chat with the agent, yielding events as the run progresses
+        
+        Yields dictionaries with "event" and "data" keys: "start" with the thread_id,
+        "tool_start"/"tool_end" around each tool call, "sources" as soon as search
+        results return, "token" for each piece of the summary, then "done" with the
+        final response or "error".
+        
+        Unlike chat, this does not take an admission slot itself: the caller
+        holds one around the stream, after checking before the response starts
+        that a saturated server can be answered with a 503.
+        """
+        if not self.agent:
+            self.create_agent()
+        
+        if not thread_id:
+            thread_id = str(uuid.uuid4())
+        
+        yield {"event": "start", "data": {"thread_id": thread_id}}
+        
+        with inflight_runs.track():
+            try:
+                session = await conversation_manager.get_session(thread_id)
+                
+                seed_items = await summary_scheduler.claim_seed(thread_id)
+                if seed_items:
+                    await session.add_items(seed_items)
+                
+                # The streamed run executes in its own task, which inherits these sinks
+                results = []
+                failures = []
+                hooks = MetricsHooks()
+                sink_token = search_results_sink.set(results)
+                failures_token = search_failures_sink.set(failures)
+                try:
+                    with labelled(agent=self.agent_type):
+                        result = Runner.run_streamed(
+                            starting_agent=self.agent,
+                            input=message,
+                            session=session,
+                            hooks=hooks
+                        )
+                finally:
+                    search_failures_sink.reset(failures_token)
+                    search_results_sink.reset(sink_token)
+                
+                summary_tokens = SummaryTokenExtractor()
+                seen_urls = set()
+                
+                # A client that disconnects closes this generator at a yield; cancel the
+                # run so it stops calling the model and search for nobody
+                try:
+                    async for event in result.stream_events():
+                        if event.type == "raw_response_event":
+                            if isinstance(event.data, ResponseTextDeltaEvent):
+                                text = summary_tokens.feed(event.data.delta)
+                                if text:
+                                    yield {"event": "token", "data": {"text": text}}
+                    
+                        elif event.type == "run_item_stream_event":
+                            if event.name == "tool_called":
+                                raw_item = event.item.raw_item
+                                yield {"event": "tool_start", "data": {
+                                    "name": getattr(raw_item, "name", None),
+                                    "arguments": getattr(raw_item, "arguments", None),
+                                    "call_id": getattr(raw_item, "call_id", None)
+                                }}
+                        
+                            elif event.name == "tool_output":
+                                raw_item = event.item.raw_item
+                                call_id = raw_item.get("call_id") if isinstance(raw_item, dict) else None
+                                yield {"event": "tool_end", "data": {"call_id": call_id}}
+                            
+                                sources = []
+                                for record in results:
+                                    if record["link"] and record["link"] not in seen_urls:
+                                        seen_urls.add(record["link"])
+                                        sources.append({"title": record["title"], "url": record["link"]})
+                                if sources:
+                                    yield {"event": "sources", "data": {"sources": sources}}
+                finally:
+                    result.cancel()
+                
+                with labelled(agent=self.agent_type):
+                    record_run_usage(result.context_wrapper.usage, hooks.tool_calls)
+                structured_response = self._build_response(result, results)
+                
+                yield {"event": "done", "data": {
+                    "response": structured_response.model_dump(),
+                    "thread_id": thread_id
+                }}
+                
+            except Exception as e:
+                logger.error(f"Error in {self.__class__.__name__} chat stream: {e}")
+                yield {"event": "error", "data": {
+                    "detail": f"I encountered an error while processing your request: {str(e)}",
+                    "thread_id": thread_id
+                }}
+
+    async def run_once(self, message: str) -> PerplexityResponse:
+        """Run the agent without conversation history, raising on failure"""
+        if not self.agent:
+            self.create_agent()
+        
+        with labelled(agent=self.agent_type, endpoint="background"):
+            results = []
+            hooks = MetricsHooks()
+            sink_token = search_results_sink.set(results)
+            try:
+                result = await Runner.run(starting_agent=self.agent, input=message, hooks=hooks)
+            finally:
+                search_results_sink.reset(sink_token)
+            record_run_usage(result.context_wrapper.usage, hooks.tool_calls)
+            return self._build_response(result, results)
 
     async def get_initial_summary(self):
         """Get an initial summary - can be overridden by subclasses for custom prompts"""
-        return await self.chat("Give me a comprehensive overview of the latest news and updates in this domain.")
+        return await self.chat(self.summary_prompt)
     
     async def clear_conversation(self, thread_id: str):
         """Clear conversation history for a specific thread"""
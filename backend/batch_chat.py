@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from admission import retry_rejected
+from agent_registry import agent_registry
+from answer_cache import normalize_message
+from metrics import labelled, metrics
+from models import BatchChatItem
+from router import agent_router
+from search_cache import search_cache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+batch_items_total = metrics.counter(
+    "perplex_batch_items_total", "Batch chat items by outcome (answered, deduplicated, error)", ("agent", "outcome")
+)
+
+SEARCH_COUNTERS = ("hits", "coalesced", "misses", "shared_hits")
+
+
+class BatchChatRunner:
+    """
+    Answers many chat requests in one call, yielding each result as it finishes
+
+    Items go through the agents' usual chat path. Items of every batch share
+    max_concurrency slots, so however many batches run at once they can't take
+    more than that many admission slots from live traffic. Thread-less items
+    asking the same agent the same question are answered once. Items on the
+    same thread run in order. Searches share the search cache, which also
+    merges identical searches that are in flight at the same time.
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_items: int = 500, max_attempts: int = 3):
+        """
+        Args:
+            max_concurrency: Most batch items running at once across all batches; a batch may ask for fewer
+            max_items: Most items one batch may contain
+            max_attempts: Runs of an item turned away by admission control before it fails
+        """
+        self.max_concurrency = max_concurrency
+        self.max_items = max_items
+        self.max_attempts = max_attempts
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    async def _route(self, item: BatchChatItem) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """The item's agent type, and the routing decision if it was picked automatically"""
+        if item.agent != "auto":
+            return item.agent, None
+        decision = await agent_router.route(item.message, item.thread_id)
+        return decision.agent, decision.model_dump()
+
+    async def _answer(self, agent_type: str, item: BatchChatItem, routing: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        agent = agent_registry.get(agent_type)
+        with labelled(endpoint="batch"):
+            result = await retry_rejected(
+                lambda: agent.chat(message=item.message, thread_id=item.thread_id),
+                self.max_attempts
+            )
+        if result.get("error"):
+            raise RuntimeError(result["error"])
+        if routing:
+            await agent_router.remember(result["thread_id"], agent_type)
+        return result
+
+    async def run(self, items: List[BatchChatItem], concurrency: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answer a batch of chat requests
+
+        Args:
+            items: Chat requests, each with an agent type or "auto"
+            concurrency: Items of this batch to run at once, capped at max_concurrency
+
+        Yields:
+            A "result" record per item in completion order, each with its index in
+            items, then one "summary" record
+        """
+        started = time.perf_counter()
+        search_before = {name: getattr(search_cache, name) for name in SEARCH_COUNTERS}
+        semaphore = asyncio.Semaphore(max(1, min(concurrency or self.max_concurrency, self.max_concurrency)))
+        finished: asyncio.Queue = asyncio.Queue()
+
+        routes = await asyncio.gather(*(self._route(item) for item in items))
+
+        # Work is grouped into lanes: one per thread, whose items run in order, and
+        # one per distinct thread-less question, which runs once for all its items
+        lanes: Dict[Tuple[str, ...], List[int]] = {}
+        for index, item in enumerate(items):
+            agent_type = routes[index][0]
+            if item.thread_id:
+                key = ("thread", item.thread_id)
+            else:
+                key = ("question", agent_type, normalize_message(item.message))
+            lanes.setdefault(key, []).append(index)
+
+        def record(index: int, **fields: Any) -> Dict[str, Any]:
+            return {"type": "result", "index": index, "id": items[index].id, "agent": routes[index][0], **fields}
+
+        async def run_one(index: int) -> Optional[Dict[str, Any]]:
+            item_started = time.perf_counter()
+            agent_type, routing = routes[index]
+            try:
+                async with semaphore, self._slots:
+                    result = await self._answer(agent_type, items[index], routing)
+            except Exception as e:
+                logger.error(f"Batch item {index} ({agent_type}) failed: {e}")
+                batch_items_total.inc(agent=agent_type, outcome="error")
+                await finished.put(record(index, status="error", error=str(e)))
+                return None
+            batch_items_total.inc(agent=agent_type, outcome="answered")
+            await finished.put(record(
+                index,
+                status="ok",
+                response=result["response"].model_dump(),
+                thread_id=result["thread_id"],
+                cache=result.get("cache"),
+                deduplicated=False,
+                elapsed_ms=(time.perf_counter() - item_started) * 1000
+            ))
+            return result
+
+        async def run_lane(key: Tuple[str, ...], indices: List[int]) -> None:
+            if key[0] == "thread":
+                for index in indices:
+                    await run_one(index)
+                return
+            result = await run_one(indices[0])
+            for index in indices[1:]:
+                if result is None:
+                    await finished.put(record(index, status="error", error="The same question failed for an earlier item"))
+                    continue
+                batch_items_total.inc(agent=routes[index][0], outcome="deduplicated")
+                await finished.put(record(
+                    index,
+                    status="ok",
+                    response=result["response"].model_dump(),
+                    thread_id=result["thread_id"],
+                    cache=result.get("cache"),
+                    deduplicated=True,
+                    elapsed_ms=0.0
+                ))
+
+        tasks = [asyncio.ensure_future(run_lane(key, indices)) for key, indices in lanes.items()]
+        errors = 0
+        deduplicated = 0
+        try:
+            for _ in range(len(items)):
+                result = await finished.get()
+                errors += result["status"] == "error"
+                deduplicated += bool(result.get("deduplicated"))
+                yield result
+        finally:
+            # The client may disconnect mid-batch; don't keep answering for nobody
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        yield {
+            "type": "summary",
+            "items": len(items),
+            "runs": len(items) - deduplicated - errors,
+            "deduplicated": deduplicated,
+            "errors": errors,
+            "elapsed_ms": (time.perf_counter() - started) * 1000,
+            "search_cache": {name: getattr(search_cache, name) - search_before[name] for name in SEARCH_COUNTERS}
+        }
+
+
+# Global batch chat runner instance
+batch_runner = BatchChatRunner(
+    max_concurrency=int(os.getenv("BATCH_CONCURRENCY", 4)),
+    max_items=int(os.getenv("BATCH_MAX_ITEMS", 500))
+)
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Deterministic offline load test for the FastAPI backend
+
+Starts the app in-process with fake model and SerpAPI providers injected in
+place of Runner.run and the SerpAPI client, then drives each endpoint at the
+requested concurrency levels. Reports req/s, p50/p95/p99 latency, event-loop
+lag and RSS growth, and writes everything as JSON so runs can be compared.
+
+Usage (from the backend directory):
+    python benchmarks/load_test.py --concurrency 1 10 50 --requests 200 --output run.json
+    python benchmarks/load_test.py --baseline main.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+ENDPOINTS = {
+    "chat": ("POST", "/chat"),
+    "chat_sports": ("POST", "/chat/sports"),
+    "chat_finance": ("POST", "/chat/finance"),
+    "sports_summary": ("GET", "/chat/sports/summary"),
+    "finance_summary": ("GET", "/chat/finance/summary"),
+    "search": ("POST", "/search"),
+}
+
+
+class LatencyDistribution:
+    """
+    Seeded latency sampler parsed from a spec string
+
+    Specs: "fixed:0.5", "uniform:0.2,0.8" or "lognormal:<median>,<sigma>" (seconds).
+    """
+
+    def __init__(self, spec: str, rng: random.Random):
+        self.spec = spec
+        self.rng = rng
+        kind, _, params = spec.partition(":")
+        values = [float(value) for value in params.split(",") if value]
+        if kind == "fixed":
+            self._sample = lambda: values[0]
+        elif kind == "uniform":
+            self._sample = lambda: self.rng.uniform(values[0], values[1])
+        elif kind == "lognormal":
+            mu = math.log(values[0])
+            self._sample = lambda: self.rng.lognormvariate(mu, values[1])
+        else:
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self) -> float:
+        return self._sample()
+
+
+class FakeSerpClient:
+    """Stands in for AsyncSerpClient, returning canned SerpAPI payloads after a sampled delay"""
+
+    def __init__(self, latency: LatencyDistribution):
+        self.latency = latency
+        self.calls = 0
+
+    async def get_dict(self, params: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample())
+        query = params.get("q", "")
+        organic = [
+            {
+                "title": f"{query} result {i}",
+                "link": f"https://example.com/{zlib.crc32(query.encode())}/{i}",
+                "snippet": f"Snippet {i} about {query}. " * 8,
+                "displayed_link": "example.com",
+                "date": "1 day ago",
+            }
+            for i in range(5)
+        ]
+        if params.get("engine") == "google_finance":
+            return {"summary": {"title": query, "price": "$100.00", "price_change": "+1.2%"}, "organic_results": organic[:3]}
+        return {"organic_results": organic}
+
+    async def aclose(self) -> None:
+        pass
+
+
+def make_fake_runner(latency: LatencyDistribution):
+    """Build a stand-in for agents.Runner that calls the agent's search tool and writes the session"""
+    import tools
+    from agents.usage import Usage
+    from models import AgentAnswer
+
+    searches = {
+        "web_search": tools.execute_web_search_async,
+        "sports_search": tools.execute_sports_search_async,
+        "finance_search": tools.execute_finance_search_async,
+    }
+
+    class FakeRunResult:
+        def __init__(self, output: AgentAnswer, usage: Usage):
+            self.final_output = output
+            self.context_wrapper = type("FakeContext", (), {"usage": usage})()
+
+        def final_output_as(self, cls, raise_if_incorrect_type: bool = False):
+            return self.final_output
+
+    class FakeRunner:
+        @staticmethod
+        async def run(starting_agent, input, session=None, hooks=None, **kwargs):
+            history = await session.get_items() if session is not None else []
+
+            # First LLM turn decides to call the search tool, the second writes the answer
+            await asyncio.sleep(latency.sample())
+            tool = starting_agent.tools[0]
+            search = searches[tool.name]
+            # The agent sets the run's results sink; cite everything this search recorded
+            results = tools.search_results_sink.get()
+            first = len(results) + 1 if results is not None else 1
+            if hooks is not None:
+                await hooks.on_tool_start(None, starting_agent, tool)
+            tool_output = await search(f"{input} recent latest")
+            if hooks is not None:
+                await hooks.on_tool_end(None, starting_agent, tool, tool_output)
+            await asyncio.sleep(latency.sample())
+
+            last = len(results) if results is not None else 0
+            output = AgentAnswer(summary=f"Fake answer to: {input}", citations=list(range(first, last + 1)))
+            if session is not None:
+                await session.add_items([
+                    {"role": "user", "content": input},
+                    {"type": "function_call", "call_id": "call_fake", "name": starting_agent.tools[0].name, "arguments": "{}"},
+                    {"type": "function_call_output", "call_id": "call_fake", "output": tool_output},
+                    {"role": "assistant", "content": output.model_dump_json()},
+                ])
+
+            input_tokens = (len(json.dumps(history)) + len(tool_output)) // 4
+            usage = Usage(requests=2, input_tokens=input_tokens, output_tokens=len(output.model_dump_json()) // 4)
+            usage.total_tokens = usage.input_tokens + usage.output_tokens
+            return FakeRunResult(output, usage)
+
+    return FakeRunner
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class LoopLagMonitor:
+    """Measures how late a periodic timer fires, i.e. how long the event loop was blocked"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+
+    def __enter__(self):
+        self._task = asyncio.ensure_future(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+
+def request_factory(endpoint: str, rng: random.Random, distinct_queries: int, threads: int) -> Callable[[int], Dict[str, Any]]:
+    """Build per-request kwargs for an endpoint; a fraction of chats continue existing threads"""
+    topics = {
+        "chat": "latest AI research news",
+        "chat_sports": "lakers score last night",
+        "chat_finance": "AAPL stock outlook",
+        "search": "electric vehicle sales",
+    }
+
+    def build(index: int) -> Dict[str, Any]:
+        query = f"{topics.get(endpoint, '')} {rng.randrange(distinct_queries)}"
+        if endpoint == "search":
+            return {"params": {"query": query, "num_results": 5}}
+        if endpoint.endswith("summary"):
+            return {}
+        thread_id = f"bench-{endpoint}-{rng.randrange(threads)}" if threads else None
+        return {"json": {"message": query, "thread_id": thread_id}}
+
+    return build
+
+
+async def run_scenario(client, endpoint: str, concurrency: int, total: int, build) -> Dict[str, Any]:
+    method, path = ENDPOINTS[endpoint]
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            response = await client.request(method, path, **build(index))
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    with LoopLagMonitor() as monitor:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "req_per_s": total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "loop_lag_p99_ms": percentile(monitor.lags, 99) * 1000,
+        "loop_lag_max_ms": max(monitor.lags, default=0.0) * 1000,
+        "rss_growth_mb": rss_mb() - rss_before,
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, max_regression: float) -> List[str]:
+    """Return regressions in p95 latency or throughput beyond the tolerance"""
+    with open(baseline_path) as f:
+        baseline = {(r["endpoint"], r["concurrency"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get((result["endpoint"], result["concurrency"]))
+        if previous is None:
+            continue
+        if result["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+            regressions.append(
+                f"{result['endpoint']} @ {result['concurrency']}: p95 {previous['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms"
+            )
+        if result["req_per_s"] < previous["req_per_s"] * (1 - max_regression):
+            regressions.append(
+                f"{result['endpoint']} @ {result['concurrency']}: {previous['req_per_s']:.1f} -> {result['req_per_s']:.1f} req/s"
+            )
+    return regressions
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=list(ENDPOINTS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--llm-latency", default="lognormal:0.8,0.3", help="Latency of each fake LLM turn")
+    parser.add_argument("--serp-latency", default="lognormal:0.6,0.4", help="Latency of each fake SerpAPI call")
+    parser.add_argument(
+        "--search-providers", nargs="+", metavar="NAME=LATENCY",
+        help="Federate web search over local stand-in providers, e.g. fast=lognormal:0.3,0.3 slow=lognormal:0.8,0.6"
+    )
+    parser.add_argument("--federation-mode", default="first", choices=["first", "merge"])
+    parser.add_argument("--federation-fanout", type=int, default=2, help="Providers queried per federated search")
+    parser.add_argument("--distinct-queries", type=int, default=1000, help="Query variety; lower means more cache hits")
+    parser.add_argument("--threads", type=int, default=50, help="Conversation threads reused per chat endpoint; 0 starts a new thread per request")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a previous JSON run and exit non-zero on regression")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed fractional regression vs. the baseline")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+    workdir = tempfile.mkdtemp(prefix="perplex-bench-")
+    os.chdir(workdir)  # keep conversations.db out of the source tree
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+    # Every request comes from the same in-process client
+    os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "0")
+
+    import httpx
+    import base_agent
+    import main as app_module
+    from tools import WebSearchTool, set_web_search_tool
+    from search_providers import LocalSearchProvider, SearchFederation
+
+    fake_serp = FakeSerpClient(LatencyDistribution(args.serp_latency, rng))
+    federation = None
+    if args.search_providers:
+        providers = []
+        for provider in args.search_providers:
+            name, _, spec = provider.partition("=")
+            providers.append(LocalSearchProvider(name, LatencyDistribution(spec, rng).sample))
+        federation = SearchFederation(providers, mode=args.federation_mode, fanout=args.federation_fanout, rng=rng)
+    # Installed before the lifespan runs, which keeps it instead of building a real client
+    set_web_search_tool(WebSearchTool(client=fake_serp, federation=federation))
+    base_agent.Runner = make_fake_runner(LatencyDistribution(args.llm_latency, rng))
+
+    results = []
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with app_module.lifespan(app_module.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for endpoint in args.endpoints:
+                for concurrency in args.concurrency:
+                    build = request_factory(endpoint, rng, args.distinct_queries, args.threads)
+                    result = await run_scenario(client, endpoint, concurrency, args.requests, build)
+                    results.append(result)
+                    print(
+                        f"{endpoint:>16} c={concurrency:<4} {result['req_per_s']:8.1f} req/s  "
+                        f"p50 {result['p50_ms']:7.1f}  p95 {result['p95_ms']:7.1f}  p99 {result['p99_ms']:7.1f} ms  "
+                        f"loop lag p99 {result['loop_lag_p99_ms']:5.1f} ms  rss +{result['rss_growth_mb']:.1f} MB  "
+                        f"errors {result['errors']}"
+                    )
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "serp_calls": fake_serp.calls,
+        "federation": federation.stats() if federation else None,
+        "results": results,
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if baseline:
+        regressions = compare(results, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
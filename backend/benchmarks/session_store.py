@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark conversation store backends
+
+Measures write throughput and get_items latency for each session store under
+concurrent threads. The postgres backend is included when DATABASE_URL is set.
+
+Usage (from the backend directory):
+    python benchmarks/session_store.py --threads 50 --turns 20 --output results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_store import create_session_store
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def make_turn(thread, turn):
+    """A user message plus a tool output roughly the size of a formatted search result"""
+    return [
+        {"role": "user", "content": f"question {turn} in thread {thread}"},
+        {"type": "function_call_output", "call_id": f"call_{thread}_{turn}", "output": "x" * 1500},
+        {"role": "assistant", "content": json.dumps({"summary": "answer " * 50, "explore_more": []})},
+    ]
+
+
+async def bench_store(backend, db_path, threads, turns):
+    store = create_session_store(backend, db_path=db_path)
+    sessions = [await store.open_session(f"bench-{backend}-{i}") for i in range(threads)]
+    read_latencies = []
+
+    async def run_thread(index, session):
+        for turn in range(turns):
+            # Mirror a Runner turn: load history, then write the new items back
+            started = time.perf_counter()
+            await session.get_items()
+            read_latencies.append(time.perf_counter() - started)
+            await session.add_items(make_turn(index, turn))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_thread(i, s) for i, s in enumerate(sessions)))
+    elapsed = time.perf_counter() - started
+
+    for session in sessions:
+        await session.clear_session()
+        close = getattr(session, "close", None)
+        if close is not None:
+            close()
+    await store.close()
+
+    writes = threads * turns
+    return {
+        "backend": backend,
+        "threads": threads,
+        "turns": turns,
+        "elapsed_s": elapsed,
+        "writes_per_s": writes / elapsed,
+        "get_items_p50_ms": statistics.median(read_latencies) * 1000,
+        "get_items_p99_ms": percentile(read_latencies, 99) * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=50, help="Concurrent conversation threads")
+    parser.add_argument("--turns", type=int, default=20, help="Turns written per thread")
+    parser.add_argument("--backends", nargs="+", default=None, help="Backends to run (default: all available)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    backends = args.backends or ["sqlite", "pooled_sqlite"] + (["postgres"] if os.getenv("DATABASE_URL") else [])
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in backends:
+            result = await bench_store(backend, os.path.join(tmp, f"{backend}.db"), args.threads, args.turns)
+            results.append(result)
+            print(
+                f"{backend:>14}: {result['writes_per_s']:8.1f} writes/s  "
+                f"get_items p50 {result['get_items_p50_ms']:6.2f} ms  p99 {result['get_items_p99_ms']:6.2f} ms"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Import-time profile and cold-start benchmark for the FastAPI backend
+
+The import profile runs `python -X importtime -c "import main"` in a fresh
+interpreter with no API keys set, which also checks that the app imports
+without them. It reports the total import time and where it goes, grouped by
+top-level package, with the backend's own modules listed individually.
+
+The startup benchmark spawns uvicorn on a free port and times how long it
+takes from process start until GET /health answers: interpreter start,
+imports, the lifespan's startup work and the first request. Dummy keys are
+used and OpenAI and SerpAPI are pointed at an unreachable local address, so
+nothing leaves the machine.
+
+Usage (from the backend directory):
+    python benchmarks/startup.py --runs 5 --output startup.json
+    python benchmarks/startup.py --baseline startup.json --max-regression 0.2
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_MODULES = {name[:-3] for name in os.listdir(BACKEND_DIR) if name.endswith(".py")}
+
+# Where the app's clients are sent while benchmarking: a closed port on this machine
+UNREACHABLE_URL = "http://127.0.0.1:9"
+
+
+def app_env(with_keys: bool) -> Dict[str, str]:
+    """Environment for a child process; without keys, API keys are removed instead of faked"""
+    env = {key: value for key, value in os.environ.items() if key not in ("OPENAI_API_KEY", "SERP_API_KEY")}
+    if with_keys:
+        env.update({
+            "OPENAI_API_KEY": "bench",
+            "SERP_API_KEY": "bench",
+            "OPENAI_BASE_URL": f"{UNREACHABLE_URL}/v1",
+            "SERP_API_BASE_URL": UNREACHABLE_URL,
+            "OPENAI_AGENTS_DISABLE_TRACING": "1",
+        })
+    return env
+
+
+def profile_imports(top: int) -> Dict[str, Any]:
+    """Import main in a fresh interpreter and break the time down by package"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=tempfile.mkdtemp(prefix="perplex-startup-"),
+        env={**app_env(with_keys=False), "PYTHONPATH": BACKEND_DIR},
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing main failed:\n{completed.stderr[-2000:]}")
+
+    by_group: Dict[str, float] = {}
+    total_us = 0
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if not self_us.isdigit():
+            continue  # column header
+        if name == "main":
+            total_us = int(cumulative_us)
+        root = name.split(".")[0]
+        group = f"app:{root}" if root in APP_MODULES else root
+        by_group[group] = by_group.get(group, 0.0) + int(self_us)
+
+    ranked = sorted(by_group.items(), key=lambda item: item[1], reverse=True)
+    return {
+        "total_ms": total_us / 1000,
+        "app_ms": sum(value for group, value in by_group.items() if group.startswith("app:")) / 1000,
+        "top": [{"group": group, "ms": value / 1000} for group, value in ranked[:top]],
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_ready(timeout: float) -> float:
+    """Seconds from spawning a uvicorn worker until its first successful GET /health"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR,
+         "--port", str(port), "--log-level", "warning"],
+        cwd=tempfile.mkdtemp(prefix="perplex-startup-"),  # keep conversations.db out of the source tree
+        env=app_env(with_keys=True),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while time.perf_counter() - started < timeout:
+                if process.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited during startup:\n{process.stderr.read()[-2000:]}")
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+        raise RuntimeError(f"Not ready after {timeout:.0f}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def compare(report: Dict[str, Any], baseline_path: str, max_regression: float) -> List[str]:
+    """Return regressions in import time or median time to ready beyond the tolerance"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for key, label in (("import_ms", "import"), ("ready_ms_median", "time to ready")):
+        previous: Optional[float] = baseline.get("summary", {}).get(key)
+        current = report["summary"].get(key)
+        if previous and current and current > previous * (1 + max_regression):
+            regressions.append(f"{label}: {previous:.0f} -> {current:.0f} ms")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to time")
+    parser.add_argument("--top", type=int, default=15, help="Packages listed in the import profile")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds a start may take before it counts as failed")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a previous JSON run and exit non-zero on regression")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed fractional regression vs. the baseline")
+    args = parser.parse_args()
+
+    imports = profile_imports(args.top)
+    print(f"import main: {imports['total_ms']:.0f} ms ({imports['app_ms']:.0f} ms in backend modules)")
+    for entry in imports["top"]:
+        print(f"  {entry['group']:<32} {entry['ms']:8.1f} ms")
+
+    ready = [time_to_ready(args.timeout) * 1000 for _ in range(args.runs)]
+    print(
+        f"time to first ready request over {args.runs} starts: "
+        f"p50 {statistics.median(ready):.0f}  min {min(ready):.0f}  max {max(ready):.0f} ms"
+    )
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "imports": imports,
+        "ready_ms": ready,
+        "summary": {"import_ms": imports["total_ms"], "ready_ms_median": statistics.median(ready)},
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        regressions = compare(report, args.baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Compare prompt tokens and time-to-first-token for the compact and verbose tool output formats
+
+Offline (default), each agent holds a multi-turn conversation with one search
+per turn, using canned SerpAPI payloads, and the prompt the model would see
+for its answer is counted on every turn: instructions, the replayed history
+(compacted by the HISTORY_* policy, or in full with --no-compaction) and the
+new tool output. Verbose is counted against the instructions without
+SEARCH_RESULTS_GUIDE, as they were before compact output existed.
+
+With --live the same prompts run through the real agents against OpenAI and
+SerpAPI (OPENAI_API_KEY and SERP_API_KEY must be set), reporting the model's
+input tokens per turn and the time from the search result arriving to the
+first answer token.
+
+Usage (from the backend directory):
+    python benchmarks/tool_output_tokens.py --turns 6 --output tokens.json
+    python benchmarks/tool_output_tokens.py --live --agents general --turns 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Appended, not prepended: benchmarks/session_store.py would shadow the backend module
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+FORMATS = ("verbose", "compact")
+
+PROMPTS = {
+    "general": [
+        "What happened in AI research this week?",
+        "Which companies announced new language models?",
+        "How do their benchmark results compare?",
+        "What are regulators saying about them?",
+        "Any news on open-weight releases?",
+        "Summarize the most important development.",
+    ],
+    "sports": [
+        "How did the Lakers do last night?",
+        "Where are they in the Western Conference standings?",
+        "Who is their leading scorer this season?",
+        "When is their next game?",
+        "Any injury news for the team?",
+        "How did the Celtics do by comparison?",
+    ],
+    "finance": [
+        "AAPL stock",
+        "How did the Nasdaq close today?",
+        "What moved tech stocks this week?",
+        "NVDA stock",
+        "Any news on Federal Reserve rates?",
+        "What are analysts expecting from earnings season?",
+    ],
+}
+
+
+def agents_by_type() -> Dict[str, Any]:
+    from agent import perplexity_agent
+    from specialized_agents import sports_agent, finance_agent
+    return {"general": perplexity_agent, "sports": sports_agent, "finance": finance_agent}
+
+
+def instructions_for(agent, output_format: str) -> str:
+    """The agent's instructions, without the results guide for the verbose baseline"""
+    from tools import SEARCH_RESULTS_GUIDE
+    instructions = agent.create_agent().instructions
+    if output_format == "verbose":
+        instructions = instructions.replace(SEARCH_RESULTS_GUIDE, "")
+    return instructions
+
+
+async def offline_conversation(agent_type: str, agent, output_format: str, turns: int, store, policy) -> List[Dict[str, Any]]:
+    """Count the answer prompt on every turn of one conversation"""
+    import tools
+    from history_policy import CompactingSession, CompactionStats, count_tokens
+
+    tools.TOOL_OUTPUT_FORMAT = output_format
+    tool = agent.create_agent().tools[0]
+    search = {
+        "web_search": tools.execute_web_search_async,
+        "sports_search": tools.execute_sports_search_async,
+        "finance_search": tools.execute_finance_search_async,
+    }[tool.name]
+    instruction_tokens = count_tokens([{"role": "system", "content": instructions_for(agent, output_format)}])
+
+    thread_id = f"{agent_type}-{output_format}"
+    session = CompactingSession(
+        await store.open_session(thread_id), thread_id, policy, store, CompactionStats()
+    )
+    rows = []
+    for turn in range(turns):
+        prompt = PROMPTS[agent_type][turn % len(PROMPTS[agent_type])]
+        history = await session.get_items()
+        tool_output = await search(f"{prompt} recent latest")
+        answer = json.dumps({"summary": f"Answer to: {prompt} " * 20, "explore_more": []})
+        call = [
+            {"role": "user", "content": prompt},
+            {"type": "function_call", "call_id": f"call_{turn}", "name": tool.name, "arguments": json.dumps({"query": prompt})},
+            {"type": "function_call_output", "call_id": f"call_{turn}", "output": tool_output},
+        ]
+        rows.append({
+            "turn": turn + 1,
+            "tool_output_tokens": count_tokens([call[-1]]),
+            "history_tokens": count_tokens(history),
+            "input_tokens": instruction_tokens + count_tokens(history) + count_tokens(call),
+        })
+        await session.add_items(call + [{"role": "assistant", "content": answer}])
+    return rows
+
+
+async def live_conversation(agent_type: str, agent, output_format: str, turns: int) -> List[Dict[str, Any]]:
+    """Run one real conversation, timing the first answer token after each search"""
+    import tools
+    from agents import Runner, SQLiteSession
+    from openai.types.responses import ResponseTextDeltaEvent
+
+    tools.TOOL_OUTPUT_FORMAT = output_format
+    agent.agent = None
+    model_agent = agent.create_agent().clone(instructions=instructions_for(agent, output_format))
+    session = SQLiteSession(f"{agent_type}-{output_format}-{time.time_ns()}")
+
+    rows = []
+    for turn in range(turns):
+        prompt = PROMPTS[agent_type][turn % len(PROMPTS[agent_type])]
+        started = time.perf_counter()
+        tool_done = first_token = None
+        result = Runner.run_streamed(starting_agent=model_agent, input=prompt, session=session)
+        async for event in result.stream_events():
+            if event.type == "run_item_stream_event" and event.name == "tool_output":
+                tool_done = time.perf_counter()
+            elif (
+                event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent)
+                and first_token is None and tool_done is not None
+            ):
+                first_token = time.perf_counter()
+        usage = result.context_wrapper.usage
+        rows.append({
+            "turn": turn + 1,
+            "input_tokens": usage.input_tokens,
+            "output_tokens": usage.output_tokens,
+            "ttft_ms": (first_token - tool_done) * 1000 if first_token and tool_done else None,
+            "total_ms": (time.perf_counter() - started) * 1000,
+        })
+    return rows
+
+
+def summarize(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary = {
+        "turns": len(rows),
+        "input_tokens_total": sum(row["input_tokens"] for row in rows),
+        "input_tokens_last_turn": rows[-1]["input_tokens"] if rows else 0,
+    }
+    if rows and "tool_output_tokens" in rows[0]:
+        summary["tool_output_tokens_mean"] = statistics.mean(row["tool_output_tokens"] for row in rows)
+    ttfts = [row["ttft_ms"] for row in rows if row.get("ttft_ms") is not None]
+    if ttfts:
+        summary["ttft_ms_median"] = statistics.median(ttfts)
+    return summary
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", nargs="+", default=list(PROMPTS), choices=list(PROMPTS))
+    parser.add_argument("--turns", type=int, default=6, help="Turns per conversation")
+    parser.add_argument("--live", action="store_true", help="Call OpenAI and SerpAPI instead of counting offline")
+    parser.add_argument("--no-compaction", action="store_true", help="Replay the full history, as with HISTORY_MAX_TURNS=0")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="Write per-turn results as JSON to this file")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    workdir = tempfile.mkdtemp(prefix="perplex-tokens-")
+    os.chdir(workdir)  # keep conversations.db out of the source tree
+    if args.live:
+        from dotenv import load_dotenv
+        load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
+    else:
+        os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+    from tools import WebSearchTool, set_web_search_tool
+    from session_store import create_session_store
+    from history_policy import HistoryPolicy
+
+    store = None
+    if not args.live:
+        from load_test import FakeSerpClient, LatencyDistribution
+        set_web_search_tool(WebSearchTool(client=FakeSerpClient(LatencyDistribution("fixed:0", random.Random(args.seed)))))
+        store = create_session_store("sqlite", db_path=os.path.join(workdir, "conversations.db"))
+    policy = HistoryPolicy(max_turns=0, tool_output_turns=args.turns, summarize=False) if args.no_compaction else HistoryPolicy.from_env()
+
+    agents = agents_by_type()
+    report = {"config": {key: value for key, value in vars(args).items() if key != "output"}, "results": {}}
+    for agent_type in args.agents:
+        summaries = {}
+        for output_format in FORMATS:
+            if args.live:
+                rows = await live_conversation(agent_type, agents[agent_type], output_format, args.turns)
+            else:
+                rows = await offline_conversation(agent_type, agents[agent_type], output_format, args.turns, store, policy)
+            summaries[output_format] = summarize(rows)
+            report["results"].setdefault(agent_type, {})[output_format] = {"summary": summaries[output_format], "turns": rows}
+
+        verbose, compact = summaries["verbose"], summaries["compact"]
+        saved = 1 - compact["input_tokens_total"] / verbose["input_tokens_total"] if verbose["input_tokens_total"] else 0.0
+        line = (
+            f"{agent_type:>8}  input tokens over {args.turns} turns: verbose {verbose['input_tokens_total']:7d}  "
+            f"compact {compact['input_tokens_total']:7d}  ({saved:.1%} fewer)"
+        )
+        if "tool_output_tokens_mean" in compact:
+            line += f"  per tool output {verbose['tool_output_tokens_mean']:.0f} -> {compact['tool_output_tokens_mean']:.0f}"
+        if "ttft_ms_median" in compact and "ttft_ms_median" in verbose:
+            line += f"  ttft p50 {verbose['ttft_ms_median']:.0f} -> {compact['ttft_ms_median']:.0f} ms"
+        print(line)
+
+    if store is not None:
+        await store.close()
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,47 +1,173 @@
-from agents import SQLiteSession
-from typing import Dict
-import threading
+from agents import Session
+from collections import OrderedDict
+from typing import Dict, Any, Tuple
+import asyncio
 import os
+import time
+from session_store import SessionStore, create_session_store
+from history_policy import HistoryPolicy, CompactingSession, compaction_stats
+from state_backend import StateBackend, state_backend
+
 
 class ConversationManager:
     """Manages conversation sessions using OpenAI Agents SDK session management"""
-    
-    def __init__(self, db_path: str = "conversations.db"):
+
+    def __init__(
+        self,
+        db_path: str = "conversations.db",
+        max_sessions: int = 1000,
+        idle_timeout: float = 1800,
+        store: SessionStore = None,
+        history_policy: HistoryPolicy = None,
+        backend: StateBackend = None
+    ):
+        """
+        Args:
+            db_path: SQLite database file holding all conversation history
+            max_sessions: Maximum number of sessions kept open before LRU eviction
+            idle_timeout: Seconds a session may go unused before it is evicted
+            store: Storage backend; defaults to the one selected by CONVERSATION_STORE
+            history_policy: How much history is replayed per turn; defaults to the HISTORY_* settings
+            backend: State backend used to tell other workers to drop a thread's cached session
+        """
         self.db_path = db_path
-        self._sessions: Dict[str, SQLiteSession] = {}
-        self._lock = threading.Lock()
-        
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        # thread_id -> (session, last used), least recently used first
+        self._sessions: "OrderedDict[str, Tuple[Session, float]]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.idle_evictions = 0
+        self.invalidations = 0
+
         # Ensure the database directory exists
         db_dir = os.path.dirname(db_path) if os.path.dirname(db_path) else "."
         os.makedirs(db_dir, exist_ok=True)
-    
-    def get_session(self, thread_id: str) -> SQLiteSession:
+
+        self.store = store or create_session_store(db_path=db_path)
+        self.history_policy = history_policy or HistoryPolicy.from_env()
+
+        self.backend = backend
+        if backend is not None:
+            backend.subscribe("session_invalidate", self._invalidate)
+
+    async def _open(self, thread_id: str) -> Session:
+        """Open a thread's session from the store, replaying a compacted history"""
+        session = await self.store.open_session(thread_id)
+        return CompactingSession(session, thread_id, self.history_policy, self.store, compaction_stats)
+
+    async def get_session(self, thread_id: str) -> Session:
         """Get or create a session for a given thread_id"""
-        with self._lock:
-            if thread_id not in self._sessions:
-                # Create a new session for this thread_id
-                self._sessions[thread_id] = SQLiteSession(
-                    session_id=thread_id,
-                    db_path=self.db_path
-                )
-            return self._sessions[thread_id]
-    
+        async with self._lock:
+            now = time.monotonic()
+            self._evict_idle(now)
+
+            entry = self._sessions.get(thread_id)
+            if entry is not None:
+                self.hits += 1
+                session = entry[0]
+            else:
+                self.misses += 1
+                session = await self._open(thread_id)
+
+            self._sessions[thread_id] = (session, now)
+            self._sessions.move_to_end(thread_id)
+
+            while len(self._sessions) > self.max_sessions:
+                _, (evicted, _) = self._sessions.popitem(last=False)
+                self._close(evicted)
+                self.evictions += 1
+
+            return session
+
+    def _evict_idle(self, now: float) -> None:
+        """Evict sessions unused for longer than the idle timeout (caller holds the lock)"""
+        while self._sessions:
+            thread_id, (session, last_used) = next(iter(self._sessions.items()))
+            if now - last_used <= self.idle_timeout:
+                break
+            del self._sessions[thread_id]
+            self._close(session)
+            self.idle_evictions += 1
+
+    @staticmethod
+    def _close(session: Session) -> None:
+        """Release a session's connections, for stores whose sessions own any.
+
+        SQLiteSession.close() only reaches the calling thread's connection;
+        connections opened by worker threads are closed once the session's
+        thread-local storage is garbage collected with the session itself.
+        """
+        close = getattr(session, "close", None)
+        if close is not None:
+            close()
+
     async def clear_session(self, thread_id: str) -> None:
         """Clear a specific conversation session"""
-        with self._lock:
-            if thread_id in self._sessions:
-                # Clear the session data
-                session = self._sessions[thread_id]
-                await session.clear_session()
-                
-                # Remove from our cache
-                del self._sessions[thread_id]
-    
-    def close_session(self, thread_id: str) -> None:
+        async with self._lock:
+            entry = self._sessions.pop(thread_id, None)
+
+        # Clear outside the lock so other conversations are not blocked on this write;
+        # threads that were never loaded or already evicted still get cleared
+        if entry is not None:
+            session = entry[0]
+        else:
+            session = await self._open(thread_id)
+
+        await session.clear_session()
+        self._close(session)
+
+        # Other workers may hold this thread's session in their cache
+        if self.backend is not None:
+            await self.backend.publish("session_invalidate", thread_id)
+
+    def _invalidate(self, thread_id: str) -> None:
+        """Drop a cached session another worker cleared"""
+        entry = self._sessions.pop(thread_id, None)
+        if entry is not None:
+            self._close(entry[0])
+            self.invalidations += 1
+
+    async def close_session(self, thread_id: str) -> None:
         """Close and remove a session from the cache"""
-        with self._lock:
-            if thread_id in self._sessions:
-                del self._sessions[thread_id]
+        async with self._lock:
+            entry = self._sessions.pop(thread_id, None)
+        if entry is not None:
+            self._close(entry[0])
+
+    async def close(self) -> None:
+        """Close all cached sessions and the storage backend"""
+        async with self._lock:
+            while self._sessions:
+                _, (session, _) = self._sessions.popitem()
+                self._close(session)
+        await self.store.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Session cache occupancy and counters for monitoring"""
+        return {
+            "store": self.store.name,
+            "size": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "idle_timeout": self.idle_timeout,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "idle_evictions": self.idle_evictions,
+            "invalidations": self.invalidations,
+            "compaction": compaction_stats.totals()
+        }
+
+    def compaction_stats(self, thread_id: str) -> Dict[str, Any]:
+        """Token counts before and after history compaction for a thread"""
+        return compaction_stats.for_thread(thread_id)
 
 # Global conversation manager instance
-conversation_manager = ConversationManager() 
\ No newline at end of file
+conversation_manager = ConversationManager(
+    max_sessions=int(os.getenv("SESSION_CACHE_MAX_SESSIONS", 1000)),
+    idle_timeout=float(os.getenv("SESSION_CACHE_IDLE_TIMEOUT", 1800)),
+    backend=state_backend
+)
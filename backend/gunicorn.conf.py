@@ -0,0 +1,31 @@
+"""
+Gunicorn settings for production: preloaded app, uvicorn workers, graceful shutdown
+
+    poetry install -E server
+    poetry run gunicorn -c gunicorn.conf.py main:app
+
+The app is imported once in the master before forking, so workers share its
+memory pages and start taking traffic immediately. Connections are only
+opened inside the workers.
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 8000)}"
+
+# Job records live in the state backend; with per-process memory a poll reaching
+# another worker than the one that queued the job would get a 404
+shared_state = os.getenv("STATE_BACKEND", "memory").lower() != "memory"
+workers = int(os.getenv("WEB_CONCURRENCY", (os.cpu_count() or 1) if shared_state else 1))
+if workers > 1 and not shared_state:
+    raise SystemExit("Running more than one worker needs STATE_BACKEND=redis so every worker sees background jobs")
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+# Stopping workers get this long to drain in-flight requests and agent runs
+graceful_timeout = int(float(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", 30)))
+# Agent runs with several searches can take a while; only kill workers that stop heartbeating
+timeout = 120
+keepalive = 5
@@ -0,0 +1,255 @@
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from agents import Session
+from metrics import span
+
+
+# Loaded on first use: reading the encoding at import slows every worker's startup
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            # tiktoken is optional; fall back to the usual ~4 characters per token estimate
+            _encoding = None
+    return _encoding
+
+
+def count_tokens(items: List[Any]) -> int:
+    """Estimate the prompt tokens a list of input items costs"""
+    text = "".join(json.dumps(item) for item in items)
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return len(text) // 4
+
+
+class HistoryPolicy:
+    """How much stored history is replayed to the model on each turn"""
+
+    def __init__(
+        self,
+        max_turns: int = 6,
+        tool_output_turns: int = 1,
+        max_tool_output_chars: int = 300,
+        summarize: bool = True,
+        max_summary_chars: int = 2000
+    ):
+        """
+        Args:
+            max_turns: Most recent turns replayed verbatim; 0 replays the full history
+            tool_output_turns: Most recent turns whose tool outputs are kept in full
+            max_tool_output_chars: Length older tool outputs are truncated to
+            summarize: Fold turns outside the window into a rolling summary instead of dropping them
+            max_summary_chars: Upper bound on the rolling summary, oldest text dropped first
+        """
+        self.max_turns = max_turns
+        self.tool_output_turns = tool_output_turns
+        self.max_tool_output_chars = max_tool_output_chars
+        self.summarize = summarize
+        self.max_summary_chars = max_summary_chars
+
+    @classmethod
+    def from_env(cls) -> "HistoryPolicy":
+        return cls(
+            max_turns=int(os.getenv("HISTORY_MAX_TURNS", 6)),
+            tool_output_turns=int(os.getenv("HISTORY_TOOL_OUTPUT_TURNS", 1)),
+            max_tool_output_chars=int(os.getenv("HISTORY_TOOL_OUTPUT_CHARS", 300)),
+            summarize=os.getenv("HISTORY_SUMMARIZE", "true").lower() == "true",
+            max_summary_chars=int(os.getenv("HISTORY_SUMMARY_CHARS", 2000))
+        )
+
+
+def split_turns(items: List[Any]) -> List[List[Any]]:
+    """Group history items into turns, each starting at a user message"""
+    turns: List[List[Any]] = []
+    for item in items:
+        if not turns or (isinstance(item, dict) and item.get("role") == "user"):
+            turns.append([])
+        turns[-1].append(item)
+    return turns
+
+
+def _message_text(item: Dict[str, Any]) -> str:
+    """Plain text of a user or assistant message item"""
+    content = item.get("content", "")
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content)
+
+
+def summarize_turn(turn: List[Any]) -> str:
+    """One-line extractive summary of a turn: the question and the start of the answer"""
+    question, answer = "", ""
+    for item in turn:
+        if not isinstance(item, dict):
+            continue
+        if item.get("role") == "user":
+            question = _message_text(item)
+        elif item.get("role") == "assistant":
+            answer = _message_text(item)
+            # Agents answer with AgentAnswer (or cached PerplexityResponse) JSON; keep only the summary prose
+            try:
+                answer = json.loads(answer).get("summary", answer)
+            except (ValueError, AttributeError):
+                pass
+    return f"- User asked: {question[:200]} | Answer: {answer[:300]}"
+
+
+def _truncate_tool_outputs(turn: List[Any], max_chars: int) -> List[Any]:
+    """Copy a turn with its function call outputs cut to max_chars"""
+    compacted = []
+    for item in turn:
+        if isinstance(item, dict) and item.get("type") == "function_call_output":
+            output = str(item.get("output", ""))
+            if len(output) > max_chars:
+                item = {**item, "output": output[:max_chars] + " ...[truncated]"}
+        compacted.append(item)
+    return compacted
+
+
+class CompactionStats:
+    """Per-thread token counts before and after compaction"""
+
+    def __init__(self, max_threads: int = 1000):
+        self.max_threads = max_threads
+        self._threads: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.compactions = 0
+
+    def record(self, thread_id: str, before: int, after: int) -> None:
+        thread = self._threads.setdefault(
+            thread_id, {"turns": 0, "tokens_before": 0, "tokens_after": 0, "last_tokens_before": 0, "last_tokens_after": 0}
+        )
+        thread["turns"] += 1
+        thread["tokens_before"] += before
+        thread["tokens_after"] += after
+        thread["last_tokens_before"] = before
+        thread["last_tokens_after"] = after
+        self._threads.move_to_end(thread_id)
+        while len(self._threads) > self.max_threads:
+            self._threads.popitem(last=False)
+
+        self.tokens_before += before
+        self.tokens_after += after
+        if after < before:
+            self.compactions += 1
+
+    def for_thread(self, thread_id: str) -> Optional[Dict[str, int]]:
+        thread = self._threads.get(thread_id)
+        if thread is None:
+            return None
+        return {**thread, "tokens_saved": thread["tokens_before"] - thread["tokens_after"]}
+
+    def totals(self) -> Dict[str, int]:
+        return {
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": self.tokens_before - self.tokens_after,
+            "compactions": self.compactions
+        }
+
+
+class CompactingSession:
+    """
+    Session wrapper that replays a compacted view of the stored history
+
+    The underlying session keeps the full history; only what get_items hands
+    to the runner is windowed, tool-output-truncated and summarized.
+    """
+
+    def __init__(self, session: Session, thread_id: str, policy: HistoryPolicy, store, stats: CompactionStats):
+        """
+        Args:
+            session: Session holding the full history
+            thread_id: Conversation thread id
+            policy: History policy to apply
+            store: SessionStore persisting the rolling summary next to the session
+            stats: Where token counts before and after compaction are recorded
+        """
+        self.session = session
+        self.session_id = thread_id
+        self.policy = policy
+        self.store = store
+        self.stats = stats
+
+    async def get_items(self, limit: Optional[int] = None) -> List[Any]:
+        with span("session_load"):
+            items = await self.session.get_items(limit)
+        if limit is not None:
+            return items
+
+        with span("history_compaction"):
+            compacted = await self.compact(items)
+        self.stats.record(self.session_id, count_tokens(items), count_tokens(compacted))
+        return compacted
+
+    async def compact(self, items: List[Any]) -> List[Any]:
+        """Apply the history policy to the full stored history"""
+        policy = self.policy
+        turns = split_turns(items)
+
+        folded: List[List[Any]] = []
+        if policy.max_turns and len(turns) > policy.max_turns:
+            folded, turns = turns[:-policy.max_turns], turns[-policy.max_turns:]
+
+        keep_full = max(policy.tool_output_turns, 0)
+        recent = [
+            turn if index >= len(turns) - keep_full else _truncate_tool_outputs(turn, policy.max_tool_output_chars)
+            for index, turn in enumerate(turns)
+        ]
+
+        compacted: List[Any] = []
+        if folded and policy.summarize:
+            summary = await self._rolling_summary(folded)
+            compacted.append({"role": "system", "content": f"Summary of earlier conversation:\n{summary}"})
+        for turn in recent:
+            compacted.extend(turn)
+        return compacted
+
+    async def _rolling_summary(self, folded: List[List[Any]]) -> str:
+        """Extend the stored summary with turns folded since it was last written"""
+        stored = await self.store.get_summary(self.session_id)
+        summary, folded_turns = stored if stored else ("", 0)
+
+        # History shrank (pop_item / clear), so rebuild from scratch
+        if folded_turns > len(folded):
+            summary, folded_turns = "", 0
+
+        if folded_turns < len(folded):
+            lines = [summarize_turn(turn) for turn in folded[folded_turns:]]
+            summary = "\n".join(filter(None, [summary] + lines))
+            if len(summary) > self.policy.max_summary_chars:
+                summary = summary[-self.policy.max_summary_chars:]
+            await self.store.set_summary(self.session_id, summary, len(folded))
+        return summary
+
+    async def add_items(self, items: List[Any]) -> None:
+        with span("session_write"):
+            await self.session.add_items(items)
+
+    async def pop_item(self) -> Optional[Any]:
+        return await self.session.pop_item()
+
+    async def clear_session(self) -> None:
+        await self.session.clear_session()
+        await self.store.delete_summary(self.session_id)
+
+    def close(self) -> None:
+        close = getattr(self.session, "close", None)
+        if close is not None:
+            close()
+
+
+# Global compaction statistics
+compaction_stats = CompactionStats()
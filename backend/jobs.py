@@ -0,0 +1,320 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+from admission import AdmissionRejected, retry_rejected
+from agent_registry import agent_registry
+from metrics import labelled, metrics, tool_call_observer
+from router import agent_router
+from state_backend import InProcessStateBackend, StateBackend, state_backend
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+jobs_total = metrics.counter(
+    "perplex_jobs_total", "Background chat jobs by outcome (submitted, succeeded, failed, rejected)", ("agent", "outcome")
+)
+job_seconds = metrics.histogram(
+    "perplex_job_seconds", "Time background jobs spent queued and running", ("agent", "phase")
+)
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+class JobManager:
+    """
+    Runs chat requests in the background on a bounded pool of workers
+
+    POST /jobs returns as soon as a job is queued, so long research runs hold no
+    HTTP connection. Job records live in the state backend with a TTL: with a
+    shared backend any worker can answer GET /jobs/{id} (start.py and
+    gunicorn.conf.py refuse to run several workers without one), and polling or
+    retrying a request never runs the agent again. Status changes are published so event streams on every worker
+    see them.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_queue: int = 100,
+        result_ttl: float = 3600,
+        max_attempts: int = 3,
+        backend: StateBackend = None
+    ):
+        """
+        Args:
+            workers: Jobs run at once by this process
+            max_queue: Jobs waiting for a worker before submissions are rejected with a 503
+            result_ttl: Seconds a job record, and its result, is kept after its last update
+            max_attempts: Runs of a job turned away by admission control before it fails
+            backend: Where job records are stored and status changes published; defaults to this process
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self.max_attempts = max_attempts
+        self.backend = backend or InProcessStateBackend()
+        self._queue: asyncio.Queue = asyncio.Queue(max_queue)
+        # job ids waiting in this process, oldest first, for queue positions
+        self._pending: "OrderedDict[str, None]" = OrderedDict()
+        # Records of this process's unfinished jobs; the backend copy is what readers see
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._save_lock = asyncio.Lock()
+        self._watchers: Dict[str, List[asyncio.Event]] = {}
+        self._workers: List[asyncio.Task] = []
+        self._closing = False
+        self.backend.subscribe("jobs", self._on_message)
+
+        self.running = 0
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.rejected = 0
+        self.average_run_seconds = 0.0
+
+    async def submit(
+        self,
+        agent_type: str,
+        message: str,
+        thread_id: Optional[str] = None,
+        routing: Optional[Dict[str, Any]] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Queue a chat request
+
+        Args:
+            agent_type: Registered agent to run
+            message: User message
+            thread_id: Conversation to continue, if any
+            routing: Routing decision that picked the agent; the thread is remembered for it once the job is done
+            idempotency_key: Client-chosen key; submitting it again while the job is stored returns the same job
+
+        Returns:
+            The job record
+
+        Raises:
+            AdmissionRejected: The queue is full or the server is shutting down (503)
+        """
+        if idempotency_key:
+            job_id = await self.backend.get("job_keys", idempotency_key)
+            existing = await self.get(job_id) if job_id else None
+            if existing is not None:
+                return existing
+
+        if self._closing or self._queue.full():
+            self.rejected += 1
+            jobs_total.inc(agent=agent_type, outcome="rejected")
+            raise AdmissionRejected(503, "job_queue_full", self.retry_after())
+
+        record = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "agent": agent_type,
+            "routing": routing,
+            "message": message,
+            "thread_id": thread_id,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "tool_calls": 0,
+            "last_tool": None,
+            "result": None,
+            "error": None
+        }
+        job_id = record["job_id"]
+        self._records[job_id] = record
+        self._pending[job_id] = None
+        self._queue.put_nowait(job_id)
+        await self._save(job_id)
+        if idempotency_key:
+            await self.backend.set("job_keys", idempotency_key, job_id, ttl=self.result_ttl)
+
+        self.submitted += 1
+        jobs_total.inc(agent=agent_type, outcome="submitted")
+        return await self.get(job_id)
+
+    def retry_after(self) -> float:
+        """Rough seconds until a queue slot frees up"""
+        return max(1.0, self.average_run_seconds * max(1, self._queue.qsize()) / max(1, self.workers))
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """A job's record, with its queue position if it waits in this process, or None once expired"""
+        record = await self.backend.get("jobs", job_id)
+        if record is None:
+            return None
+        record = dict(record)
+        record.pop("message", None)
+        if job_id in self._pending:
+            record["queue_position"] = list(self._pending).index(job_id) + 1
+        return record
+
+    async def _save(self, job_id: str) -> None:
+        """Store and announce a job's current record"""
+        async with self._save_lock:
+            # Always the latest state, so a late progress save can't overwrite the result
+            record = self._records.get(job_id)
+            if record is None:
+                return
+            await self.backend.set("jobs", job_id, dict(record), ttl=self.result_ttl)
+            await self.backend.publish("jobs", job_id)
+
+    def _on_message(self, job_id: str) -> None:
+        """A job's record changed, in this process or another"""
+        for event in self._watchers.get(job_id, []):
+            event.set()
+
+    async def watch(self, job_id: str, heartbeat: float = 15) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        A job's record each time it changes, until it finishes or expires
+
+        Yields None after heartbeat seconds without a change, so streams can send keep-alives.
+        """
+        event = asyncio.Event()
+        self._watchers.setdefault(job_id, []).append(event)
+        try:
+            last = None
+            while True:
+                # Cleared before reading, so a change that lands while we wait isn't missed
+                event.clear()
+                record = await self.get(job_id)
+                if record is None:
+                    return
+                if record != last:
+                    yield record
+                    last = record
+                if record["status"] in TERMINAL_STATUSES:
+                    return
+                try:
+                    await asyncio.wait_for(event.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self._watchers[job_id].remove(event)
+            if not self._watchers[job_id]:
+                del self._watchers[job_id]
+
+    def _observe(self, job_id: str):
+        """Tool-call observer that records progress on a running job"""
+        def observe(event: str, tool_name: str) -> None:
+            record = self._records.get(job_id)
+            if record is None or event != "tool_start":
+                return
+            record["tool_calls"] += 1
+            record["last_tool"] = tool_name
+            asyncio.ensure_future(self._save(job_id))
+        return observe
+
+    async def _run(self, job_id: str) -> None:
+        record = self._records[job_id]
+        agent_type = record["agent"]
+        record["status"] = "running"
+        record["started_at"] = time.time()
+        job_seconds.observe(record["started_at"] - record["created_at"], agent=agent_type, phase="queued")
+        await self._save(job_id)
+
+        observer_token = tool_call_observer.set(self._observe(job_id))
+        try:
+            agent = agent_registry.get(agent_type)
+            with labelled(endpoint="jobs"):
+                result = await retry_rejected(
+                    lambda: agent.chat(message=record["message"], thread_id=record["thread_id"]),
+                    self.max_attempts
+                )
+            if result.get("error"):
+                raise RuntimeError(result["error"])
+            if record["routing"]:
+                await agent_router.remember(result["thread_id"], agent_type)
+            record["status"] = "succeeded"
+            record["result"] = {
+                "response": result["response"].model_dump(),
+                "thread_id": result["thread_id"]
+            }
+            self.succeeded += 1
+        except Exception as e:
+            logger.error(f"Job {job_id} ({agent_type}) failed: {e}")
+            record["status"] = "failed"
+            record["error"] = str(e)
+            self.failed += 1
+        finally:
+            tool_call_observer.reset(observer_token)
+
+        record["finished_at"] = time.time()
+        run_seconds = record["finished_at"] - record["started_at"]
+        self.average_run_seconds = 0.9 * self.average_run_seconds + 0.1 * run_seconds if self.average_run_seconds else run_seconds
+        job_seconds.observe(run_seconds, agent=agent_type, phase="running")
+        jobs_total.inc(agent=agent_type, outcome=record["status"])
+        await self._save(job_id)
+        self._records.pop(job_id, None)
+
+    async def _worker(self) -> None:
+        while not self._closing:
+            job_id = await self._queue.get()
+            self._pending.pop(job_id, None)
+            self.running += 1
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Error running job {job_id}: {e}")
+                self._records.pop(job_id, None)
+            finally:
+                self.running -= 1
+
+    def start(self) -> None:
+        """Start the worker pool"""
+        self._closing = False
+        while len(self._workers) < self.workers:
+            self._workers.append(asyncio.ensure_future(self._worker()))
+
+    async def stop(self, timeout: float) -> None:
+        """
+        Stop taking jobs, give running ones up to timeout seconds, then cancel them
+
+        Jobs that were still queued or got cancelled are marked failed, so clients resubmit them.
+        """
+        self._closing = True
+        deadline = time.monotonic() + timeout
+        while self.running and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+        for job_id, record in list(self._records.items()):
+            record["status"] = "failed"
+            record["error"] = "The server shut down before the job finished; submit it again"
+            record["finished_at"] = time.time()
+            await self._save(job_id)
+        self._records.clear()
+        self._pending.clear()
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and job counters for monitoring"""
+        return {
+            "backend": self.backend.name,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "result_ttl": self.result_ttl,
+            "queued": self._queue.qsize(),
+            "running": self.running,
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "average_run_seconds": self.average_run_seconds
+        }
+
+
+# Global job manager instance
+job_manager = JobManager(
+    workers=int(os.getenv("JOB_WORKERS", 4)),
+    max_queue=int(os.getenv("JOB_MAX_QUEUE", 100)),
+    result_ttl=float(os.getenv("JOB_RESULT_TTL", 3600)),
+    backend=state_backend
+)
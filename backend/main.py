@@ -2,41 +2,92 @@
 """
 Startup script for the Perplexity AI Clone
 """
-import uvicorn
+import asyncio
+import json
+import logging
 import os
+import uuid
+from contextlib import asynccontextmanager
+from typing import Optional
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+
+# Load .env once, before the modules below read their settings
+load_dotenv()
+
+from agents import set_default_openai_client
+from openai import AsyncOpenAI
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from agent import perplexity_agent
 from specialized_agents import sports_agent, finance_agent
-from models import ChatRequest, ChatResponse, HealthResponse
+from models import ChatRequest, ChatResponse, HealthResponse, AutoChatResponse, QuoteBatchRequest, QuoteBatchResponse, JobRequest, JobStatus, BatchChatRequest
 from conversation_storage import conversation_manager
+from tools import get_web_search_tool, set_web_search_tool
+from search_cache import search_cache
+from summary_cache import summary_scheduler
+from streaming import format_sse
+from answer_cache import OpenAIEmbedder, answer_cache
+from metrics import metrics, MetricsMiddleware
+from state_backend import state_backend
+from base_agent import inflight_runs
+from agent_registry import agent_registry
+from router import agent_router
+from admission import AdmissionRejected, admission_controller, charge_rate_limit, enforce_rate_limit
+from resilience import UpstreamUnavailable, resilient_fetcher
+from quotes import quote_service
+from scoreboard import scoreboard_poller
+from jobs import TERMINAL_STATUSES, job_manager
+from batch_chat import batch_runner
+from result_index import result_index
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
-def check_environment():
-    """Check if required environment variables are set"""
-    required_vars = ["OPENAI_API_KEY", "SERP_API_KEY"]
-    missing_vars = []
-    
-    for var in required_vars:
-        if not os.getenv(var):
-            missing_vars.append(var)
-    
-    if missing_vars:
-        print("Missing required environment variables:")
-        for var in missing_vars:
-            print(f"   - {var}")
-        print("\nPlease create a .env file with these variables or set them in your environment.")
-        return False
-    
-    print("All required environment variables are set!")
-    return True
+# Seconds shutdown waits for in-flight agent runs before closing their sessions
+GRACEFUL_SHUTDOWN_TIMEOUT = float(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", 30))
+# Seconds between keep-alive comments on idle scoreboard and job streams
+SCOREBOARD_HEARTBEAT = float(os.getenv("SCOREBOARD_HEARTBEAT", 15))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown hooks"""
+    # Clients are created here rather than at import, so importing the app needs no API keys.
+    # A search tool installed beforehand, e.g. with a fake client, is kept
+    search_tool = get_web_search_tool()
+    model_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    set_default_openai_client(model_client)
+    if isinstance(answer_cache.embedder, OpenAIEmbedder):
+        answer_cache.embedder.client = model_client
+    # Build the agents once, before this worker takes traffic, so every request shares their prompt prefix
+    agent_registry.build()
+    await state_backend.start()
+    # Precompute landing page summaries and keep them fresh in the background
+    summary_scheduler.start()
+    # Keep the tracked teams' scoreboards current for the sports agent and stream subscribers
+    scoreboard_poller.start()
+    # Run background chat jobs
+    job_manager.start()
+    yield
+    # Running jobs get the same grace period as requests; unfinished ones are marked failed
+    await job_manager.stop(GRACEFUL_SHUTDOWN_TIMEOUT)
+    if not await inflight_runs.drain(GRACEFUL_SHUTDOWN_TIMEOUT):
+        logger.warning(f"Shutting down with {inflight_runs.active} agent runs still in flight")
+    await summary_scheduler.stop()
+    await scoreboard_poller.stop()
+    await conversation_manager.close()
+    # Release pooled SerpAPI and OpenAI connections
+    await result_index.close()
+    await search_tool.client.aclose()
+    set_web_search_tool(None)
+    await model_client.close()
+    await state_backend.close()
 
 app = FastAPI(
     title="Perplexity AI Clone",
     description="A Perplexity AI clone using OpenAI Agents SDK with web search capabilities",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -46,6 +97,66 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+
+def cache_stats_gauge():
+    """Numeric cache counters exported as gauges on /metrics"""
+    values = {}
+    for cache, stats in [
+        ("search", search_cache.stats()),
+        ("answer", answer_cache.stats()),
+        ("session", conversation_manager.stats())
+    ]:
+        for stat, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                values[(cache, stat)] = value
+    return values
+
+metrics.gauge_callback("perplex_cache_stat", "Cache occupancy and hit/miss counters", ("cache", "stat"), cache_stats_gauge)
+
+def set_answer_cache_headers(response: Response, result: dict) -> None:
+    """Report whether a chat answer came from the semantic answer cache or a fast path"""
+    response.headers["X-Answer-Cache"] = result.get("cache", "bypass")
+    if "similarity" in result:
+        response.headers["X-Answer-Cache-Similarity"] = f"{result['similarity']:.3f}"
+    if "fast_path" in result:
+        response.headers["X-Fast-Path"] = result["fast_path"]
+
+async def stream_chat_response(agent, request: ChatRequest) -> StreamingResponse:
+    """Wrap an agent's chat_stream events in a server-sent events response
+    
+    A saturated server with a full queue answers with a 503 before the
+    response starts. The admission slot itself is taken inside the stream and
+    held until it ends, so a response whose body is never iterated (e.g. the
+    client disconnected first) holds no slot; a queue wait that times out
+    ends the stream with an error event.
+    """
+    admission_controller.check(agent.agent_type)
+    
+    async def event_stream():
+        try:
+            async with admission_controller.slot(agent.agent_type):
+                async for event in agent.chat_stream(
+                    message=request.message,
+                    thread_id=request.thread_id
+                ):
+                    yield format_sse(event["event"], event["data"])
+        except AdmissionRejected as e:
+            yield format_sse("error", {
+                "detail": e.detail,
+                "retry_after": e.retry_after,
+                "thread_id": request.thread_id
+            })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Disable proxy buffering so tokens reach the client as they are produced
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Agents /chat/auto can dispatch to, by routing decision
+ROUTED_AGENTS = agent_registry.agents
 
 @app.get("/", response_model=HealthResponse)
 async def root():
@@ -64,8 +175,8 @@ async def health_check():
         message="API is running properly"
     )
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+@app.post("/chat", response_model=ChatResponse, dependencies=[Depends(enforce_rate_limit)])
+async def chat(request: ChatRequest, response: Response):
     """
     Chat endpoint that processes user messages and returns AI responses
     with web search capabilities
@@ -76,20 +187,108 @@ async def chat(request: ChatRequest):
             message=request.message,
             thread_id=request.thread_id
         )
+        set_answer_cache_headers(response, result)
         
         return ChatResponse(
             response=result["response"],
             thread_id=result["thread_id"]
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error processing chat request: {str(e)}"
         )
 
-@app.post("/chat/sports", response_model=ChatResponse)
-async def chat_sports(request: ChatRequest):
+@app.post("/chat/stream", dependencies=[Depends(enforce_rate_limit)])
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming variant of /chat that sends tool calls, sources and summary
+    tokens as server-sent events while the agent runs
+    """
+    return await stream_chat_response(perplexity_agent, request)
+
+@app.post("/chat/auto", response_model=AutoChatResponse, dependencies=[Depends(enforce_rate_limit)])
+async def chat_auto(request: ChatRequest, response: Response):
+    """
+    Chat endpoint that picks the general, sports or finance agent for the
+    message with a local classifier and reports the routing decision
+    """
+    try:
+        decision = await agent_router.route(request.message, request.thread_id)
+        result = await ROUTED_AGENTS[decision.agent].chat(
+            message=request.message,
+            thread_id=request.thread_id
+        )
+        await agent_router.remember(result["thread_id"], decision.agent)
+        set_answer_cache_headers(response, result)
+        response.headers["X-Routed-Agent"] = decision.agent
+        
+        return AutoChatResponse(
+            response=result["response"],
+            thread_id=result["thread_id"],
+            routing=decision
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing auto-routed chat request: {str(e)}"
+        )
+
+@app.post("/chat/auto/stream", dependencies=[Depends(enforce_rate_limit)])
+async def chat_auto_stream(request: ChatRequest):
+    """
+    Streaming variant of /chat/auto; the routing decision is sent in the
+    X-Routed-Agent header
+    """
+    decision = await agent_router.route(request.message, request.thread_id)
+    # Assign the thread here so its routing can be remembered before the stream starts
+    if not request.thread_id:
+        request.thread_id = str(uuid.uuid4())
+    await agent_router.remember(request.thread_id, decision.agent)
+    streaming_response = await stream_chat_response(ROUTED_AGENTS[decision.agent], request)
+    streaming_response.headers["X-Routed-Agent"] = decision.agent
+    return streaming_response
+
+@app.post("/chat/batch")
+async def chat_batch(request: BatchChatRequest, http_request: Request):
+    """
+    Answer many chat requests in one call, streamed back as newline-delimited
+    JSON: a "result" line per item as soon as it finishes, in completion order
+    and tagged with the item's index and id, then a "summary" line
+
+    Each item counts against the caller's rate limit as one chat request.
+    """
+    if len(request.items) > batch_runner.max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {batch_runner.max_items} items may be sent in one batch"
+        )
+    unknown = sorted({item.agent for item in request.items if item.agent != "auto" and item.agent not in agent_registry.agents})
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown agent {unknown[0]!r}; use auto or one of {', '.join(agent_registry.agents)}"
+        )
+    charge_rate_limit(http_request, len(request.items))
+    
+    async def result_lines():
+        async for record in batch_runner.run(request.items, request.concurrency):
+            yield json.dumps(record) + "\n"
+    
+    return StreamingResponse(
+        result_lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/chat/sports", response_model=ChatResponse, dependencies=[Depends(enforce_rate_limit)])
+async def chat_sports(request: ChatRequest, response: Response):
     """
     Sports specialist chat endpoint that processes sports-related queries
     """
@@ -98,25 +297,37 @@ async def chat_sports(request: ChatRequest):
             message=request.message,
             thread_id=request.thread_id
         )
+        set_answer_cache_headers(response, result)
         
         return ChatResponse(
             response=result["response"],
             thread_id=result["thread_id"]
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error processing sports chat request: {str(e)}"
         )
 
+@app.post("/chat/sports/stream", dependencies=[Depends(enforce_rate_limit)])
+async def chat_sports_stream(request: ChatRequest):
+    """
+    Streaming variant of /chat/sports using server-sent events
+    """
+    return await stream_chat_response(sports_agent, request)
+
 @app.get("/chat/sports/summary", response_model=ChatResponse)
-async def sports_initial_summary():
+async def sports_initial_summary(response: Response):
     """
-    Get initial sports summary for the sports landing page
+    Get initial sports summary for the sports landing page, served from the
+    background-refreshed summary cache
     """
     try:
-        result = await sports_agent.get_initial_summary()
+        result = await summary_scheduler.get_summary("sports")
+        response.headers["X-Summary-Age"] = f"{result['age']:.0f}"
         
         return ChatResponse(
             response=result["response"],
@@ -129,8 +340,52 @@ async def sports_initial_summary():
             detail=f"Error generating sports summary: {str(e)}"
         )
 
-@app.post("/chat/finance", response_model=ChatResponse)
-async def chat_finance(request: ChatRequest):
+@app.get("/sports/scoreboard")
+async def sports_scoreboard():
+    """
+    Current scoreboard for every team and league tracked by the background
+    poller (SCOREBOARD_TARGETS)
+    """
+    return scoreboard_poller.snapshot()
+
+@app.get("/sports/scoreboard/stream")
+async def sports_scoreboard_stream():
+    """
+    Live scoreboard over server-sent events: a "snapshot" event, then a "diff"
+    event with the added, updated and removed games whenever a poll changes
+    something. Diffs whose version is not above the snapshot's are already in it.
+    """
+    async def event_stream():
+        # Subscribed once the body is read, so a client that never reads it holds no queue,
+        # and before taking the snapshot so no change falls between the two
+        queue = scoreboard_poller.subscribe()
+        try:
+            yield format_sse("snapshot", scoreboard_poller.snapshot())
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), SCOREBOARD_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield format_sse("diff", event)
+        finally:
+            scoreboard_poller.unsubscribe(queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/sports/scoreboard/stats")
+async def get_scoreboard_stats():
+    """Get poll counters, per-target freshness and subscriber counts for the scoreboard poller"""
+    return scoreboard_poller.stats()
+
+@app.post("/chat/finance", response_model=ChatResponse, dependencies=[Depends(enforce_rate_limit)])
+async def chat_finance(request: ChatRequest, response: Response):
     """
     Finance specialist chat endpoint that processes finance-related queries
     """
@@ -139,25 +394,37 @@ async def chat_finance(request: ChatRequest):
             message=request.message,
             thread_id=request.thread_id
         )
+        set_answer_cache_headers(response, result)
         
         return ChatResponse(
             response=result["response"],
             thread_id=result["thread_id"]
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error processing finance chat request: {str(e)}"
         )
 
+@app.post("/chat/finance/stream", dependencies=[Depends(enforce_rate_limit)])
+async def chat_finance_stream(request: ChatRequest):
+    """
+    Streaming variant of /chat/finance using server-sent events
+    """
+    return await stream_chat_response(finance_agent, request)
+
 @app.get("/chat/finance/summary", response_model=ChatResponse)
-async def finance_initial_summary():
+async def finance_initial_summary(response: Response):
     """
-    Get initial finance summary for the finance landing page
+    Get initial finance summary for the finance landing page, served from the
+    background-refreshed summary cache
     """
     try:
-        result = await finance_agent.get_initial_summary()
+        result = await summary_scheduler.get_summary("finance")
+        response.headers["X-Summary-Age"] = f"{result['age']:.0f}"
         
         return ChatResponse(
             response=result["response"],
@@ -170,6 +437,130 @@ async def finance_initial_summary():
             detail=f"Error generating finance summary: {str(e)}"
         )
 
+@app.post("/finance/quotes", response_model=QuoteBatchResponse, dependencies=[Depends(enforce_rate_limit)])
+async def finance_quotes(request: QuoteBatchRequest):
+    """
+    Look up quotes for many tickers at once, straight from Google Finance
+    without an agent run
+    """
+    if len(request.symbols) > quote_service.max_batch:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {quote_service.max_batch} symbols may be requested at once"
+        )
+    try:
+        quotes, missing, failed = await quote_service.get_quotes(request.symbols)
+        return QuoteBatchResponse(quotes=quotes, missing=missing, failed=failed)
+        
+    except UpstreamUnavailable as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(resilient_fetcher.reset_timeout))}
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=502,
+            detail=f"Error looking up quotes: {str(e)}"
+        )
+
+@app.post("/jobs", response_model=JobStatus, status_code=202, dependencies=[Depends(enforce_rate_limit)])
+async def submit_job(request: JobRequest, response: Response, idempotency_key: Optional[str] = Header(None)):
+    """
+    Queue a chat request and return at once; poll GET /jobs/{job_id} or
+    follow /jobs/{job_id}/events for its status and result. Resending the same
+    Idempotency-Key returns the existing job instead of running another.
+    """
+    routing = None
+    agent_type = request.agent
+    if agent_type == "auto":
+        decision = await agent_router.route(request.message, request.thread_id)
+        agent_type = decision.agent
+        routing = decision.model_dump()
+    elif agent_type not in agent_registry.agents:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown agent {agent_type!r}; use auto or one of {', '.join(agent_registry.agents)}"
+        )
+    
+    job = await job_manager.submit(
+        agent_type,
+        request.message,
+        thread_id=request.thread_id,
+        routing=routing,
+        idempotency_key=idempotency_key
+    )
+    response.headers["Location"] = f"/jobs/{job['job_id']}"
+    return JobStatus(**job)
+
+@app.get("/jobs/stats")
+async def get_job_stats():
+    """Get queue depth, worker count and outcome counters for background jobs"""
+    return job_manager.stats()
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str, response: Response):
+    """
+    Get a background job's status, progress and, once it has succeeded, its
+    ChatResponse. Succeeded jobs may be cached by clients until they expire.
+    """
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    
+    if job["status"] == "succeeded":
+        response.headers["Cache-Control"] = f"private, max-age={int(job_manager.result_ttl)}"
+    else:
+        response.headers["Cache-Control"] = "no-store"
+    if job["status"] not in TERMINAL_STATUSES:
+        # Polling hint for clients that don't follow the event stream
+        response.headers["Retry-After"] = "1"
+    return JobStatus(**job)
+
+@app.get("/jobs/{job_id}/events")
+async def get_job_events(job_id: str):
+    """
+    Background job status over server-sent events: a "status" event on every
+    change (queued, running, each tool call), then "done" with the final record
+    """
+    if await job_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    
+    async def event_stream():
+        async for job in job_manager.watch(job_id, heartbeat=SCOREBOARD_HEARTBEAT):
+            if job is None:
+                yield ": keep-alive\n\n"
+                continue
+            status = JobStatus(**job).model_dump()
+            yield format_sse("done" if job["status"] in TERMINAL_STATUSES else "status", status)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/summaries/stats")
+async def get_summary_stats():
+    """Get freshness and refresh counters for the precomputed landing summaries"""
+    return summary_scheduler.stats()
+
+@app.get("/conversations/stats")
+async def get_conversation_stats():
+    """Get occupancy and eviction counters for the in-memory session cache"""
+    return conversation_manager.stats()
+
+@app.get("/conversations/{thread_id}/compaction")
+async def get_conversation_compaction(thread_id: str):
+    """Get prompt token counts before and after history compaction for a thread"""
+    stats = conversation_manager.compaction_stats(thread_id)
+    if stats is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No compaction data for conversation {thread_id}"
+        )
+    return {"thread_id": thread_id, **stats}
+
 @app.delete("/conversations/{thread_id}")
 async def clear_conversation(thread_id: str):
     """
@@ -185,71 +576,94 @@ async def clear_conversation(thread_id: str):
             detail=f"Error clearing conversation: {str(e)}"
         )
 
-@app.post("/search")
+@app.post("/search", dependencies=[Depends(enforce_rate_limit)])
 async def direct_search(query: str, num_results: int = 5):
     """
     Direct web search endpoint for testing the search functionality
     """
     try:
-        from tools import execute_web_search
-        results = execute_web_search(query, num_results)
+        from tools import execute_web_search_async
+        results = await execute_web_search_async(query, num_results)
         return {"query": query, "results": results}
         
+    except HTTPException:
+        raise
+    except UpstreamUnavailable as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(resilient_fetcher.reset_timeout))}
+        )
     except Exception as e:
         raise HTTPException(
-            status_code=500,
+            status_code=502,
             detail=f"Error performing search: {str(e)}"
         )
 
+@app.get("/search/cache/stats")
+async def get_search_cache_stats():
+    """Get hit/miss/eviction counters for the search result cache"""
+    return search_cache.stats()
+
+@app.get("/search/upstream/stats")
+async def get_search_upstream_stats():
+    """Get circuit breaker state, timeouts and latency percentiles per SerpAPI engine"""
+    return resilient_fetcher.stats()
+
+@app.get("/search/providers/stats")
+async def get_search_provider_stats():
+    """Get per-provider latency, empty and error rates and the current ranking of federated web search"""
+    federation = get_web_search_tool().federation
+    if federation is None:
+        return {"enabled": False}
+    return {"enabled": True, **federation.stats()}
+
+@app.get("/search/index/stats")
+async def get_search_index_stats():
+    """Get size, lookup outcomes and write counters for the local index of seen search results"""
+    return await result_index.stats()
+
+@app.get("/answers/cache/stats")
+async def get_answer_cache_stats():
+    """Get hit/miss counters for the semantic answer cache"""
+    return answer_cache.stats()
+
+@app.get("/admission/stats")
+async def get_admission_stats():
+    """Get concurrency, queue depth and rejection counters for agent runs"""
+    return admission_controller.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics: request latency breakdown, token usage and tool calls"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/agent/info")
 async def get_agent_info():
     """Get information about the current agent"""
     try:
-        agent = perplexity_agent.create_agent()
-        return {
-            "name": agent.name,
-            "model": agent.model,
-            "tools": [tool.__name__ for tool in agent.tools] if agent.tools else []
-        }
+        return agent_registry.describe("general")
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error getting agent info: {str(e)}"
         )
 
+# Chat endpoints of each agent, listed by /agents/info
+AGENT_ENDPOINTS = {
+    "general": {"endpoint": "/chat"},
+    "sports": {"endpoint": "/chat/sports", "summary_endpoint": "/chat/sports/summary"},
+    "finance": {"endpoint": "/chat/finance", "summary_endpoint": "/chat/finance/summary"}
+}
+
 @app.get("/agents/info")
 async def get_all_agents_info():
     """Get information about all available agents"""
     try:
-        general_agent = perplexity_agent.create_agent()
-        sports_agent_info = sports_agent.create_agent()
-        finance_agent_info = finance_agent.create_agent()
-        
         return {
             "agents": [
-                {
-                    "type": "general",
-                    "name": general_agent.name,
-                    "model": general_agent.model,
-                    "endpoint": "/chat",
-                    "tools": [tool.__name__ for tool in general_agent.tools] if general_agent.tools else []
-                },
-                {
-                    "type": "sports",
-                    "name": sports_agent_info.name,
-                    "model": sports_agent_info.model,
-                    "endpoint": "/chat/sports",
-                    "summary_endpoint": "/chat/sports/summary",
-                    "tools": [tool.__name__ for tool in sports_agent_info.tools] if sports_agent_info.tools else []
-                },
-                {
-                    "type": "finance",
-                    "name": finance_agent_info.name,
-                    "model": finance_agent_info.model,
-                    "endpoint": "/chat/finance",
-                    "summary_endpoint": "/chat/finance/summary",
-                    "tools": [tool.__name__ for tool in finance_agent_info.tools] if finance_agent_info.tools else []
-                }
+                {**agent_registry.describe(agent_type), **AGENT_ENDPOINTS.get(agent_type, {})}
+                for agent_type in agent_registry.agents
             ]
         }
     except Exception as e:
@@ -258,20 +672,14 @@ async def get_all_agents_info():
             detail=f"Error getting agents info: {str(e)}"
         )
 
+@app.get("/agents/prompt-cache/stats")
+async def get_prompt_cache_stats():
+    """Get each agent's prompt prefix fingerprint and the share of its input tokens served from the prompt cache"""
+    return agent_registry.stats()
+
 def main():
-    print("Starting Perplexity AI Clone...")
-    
-    if not check_environment():
-        return
-    
-    print("Starting FastAPI server...")
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
+    from start import main as start_server
+    start_server()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,303 @@
+import bisect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from agents import RunHooks
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Labels applied to every span recorded while handling a request: the matched
+# endpoint (set by MetricsMiddleware) and the agent serving it (set by BaseAgent)
+request_labels: ContextVar[Dict[str, str]] = ContextVar("request_labels", default={})
+
+# Told about every tool call ("tool_start" or "tool_end", tool name) of agent runs in
+# this context, e.g. to report a background job's progress
+tool_call_observer: ContextVar[Optional[Callable[[str, str], None]]] = ContextVar("tool_call_observer", default=None)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def total(self, **labels: str) -> float:
+        """Sum of the series matching the given labels; labels left out match any value"""
+        wanted = {self.labelnames.index(name): value for name, value in labels.items()}
+        return sum(
+            value for key, value in self._values.items()
+            if all(key[index] == expected for index, expected in wanted.items())
+        )
+
+    def collect(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in self._values.items()
+        ]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts, sum, count)
+        self._values: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        series = self._values.get(key)
+        if series is None:
+            series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def collect(self) -> List[str]:
+        lines = []
+        for key, (bucket_counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class GaugeCallback:
+    """Gauge whose values are read from a callback at scrape time"""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...], callback: Callable[[], Dict[LabelValues, float]]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.callback = callback
+
+    def collect(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in self.callback().items()
+        ]
+
+
+class MetricsRegistry:
+    """Holds all metrics and renders them in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(self, name: str, documentation: str, labelnames: Tuple[str, ...], callback: Callable[[], Dict[LabelValues, float]]) -> GaugeCallback:
+        return self._register(GaugeCallback(name, documentation, labelnames, callback))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            return self._metrics[metric.name]
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+# Global metrics registry and the metrics recorded across the backend
+metrics = MetricsRegistry()
+
+http_request_seconds = metrics.histogram(
+    "perplex_http_request_seconds", "HTTP request latency", ("method", "endpoint", "status")
+)
+span_seconds = metrics.histogram(
+    "perplex_span_seconds",
+    "Time spent in each stage of a request (session_load, llm_turn, serpapi, format, parse_output, session_write, ...)",
+    ("span", "agent", "endpoint")
+)
+tool_call_seconds = metrics.histogram(
+    "perplex_tool_call_seconds", "Tool call latency as seen by the agent run", ("tool", "agent", "endpoint")
+)
+tokens_total = metrics.counter(
+    "perplex_tokens_total", "LLM tokens used, by kind (input, cached_input, output)", ("kind", "agent", "endpoint")
+)
+llm_requests_total = metrics.counter(
+    "perplex_llm_requests_total", "LLM API requests made by agent runs", ("agent", "endpoint")
+)
+tool_calls_per_request = metrics.histogram(
+    "perplex_tool_calls_per_request", "Tool calls made per agent run", ("agent", "endpoint"),
+    buckets=(0, 1, 2, 3, 4, 5, 8, 13)
+)
+
+
+def _labels(**overrides: str) -> Dict[str, str]:
+    labels = {"agent": "", "endpoint": "", **request_labels.get()}
+    labels.update(overrides)
+    return labels
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a block and record it under the current request's labels"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        span_seconds.observe(time.perf_counter() - started, span=name, **_labels())
+
+
+@contextmanager
+def labelled(**labels: str) -> Iterator[None]:
+    """Add labels to every span recorded inside the block"""
+    token = request_labels.set({**request_labels.get(), **labels})
+    try:
+        yield
+    finally:
+        request_labels.reset(token)
+
+
+def record_run_usage(usage, tool_calls: int) -> None:
+    """Record token usage and tool-call count for a finished agent run"""
+    labels = _labels()
+    tokens_total.inc(usage.input_tokens, kind="input", **labels)
+    tokens_total.inc(usage.output_tokens, kind="output", **labels)
+    cached = getattr(getattr(usage, "input_tokens_details", None), "cached_tokens", 0) or 0
+    tokens_total.inc(cached, kind="cached_input", **labels)
+    llm_requests_total.inc(usage.requests, **labels)
+    tool_calls_per_request.observe(tool_calls, **labels)
+
+
+class MetricsHooks(RunHooks):
+    """
+    Run hooks that time tool calls and LLM turns
+
+    An LLM turn is measured from the start of the run, or from the moment the
+    last outstanding tool call finished, until the model hands back tool calls
+    or the final output.
+    """
+
+    def __init__(self):
+        self.tool_calls = 0
+        self._turn_started: Optional[float] = None
+        # tool name -> start times of its calls still running (parallel calls share a tool)
+        self._tool_started: Dict[str, List[float]] = {}
+
+    def _end_turn(self) -> None:
+        if self._turn_started is not None:
+            span_seconds.observe(time.perf_counter() - self._turn_started, span="llm_turn", **_labels())
+            self._turn_started = None
+
+    async def on_agent_start(self, context, agent) -> None:
+        self._turn_started = time.perf_counter()
+
+    async def on_tool_start(self, context, agent, tool) -> None:
+        self._end_turn()
+        self.tool_calls += 1
+        self._tool_started.setdefault(tool.name, []).append(time.perf_counter())
+        observer = tool_call_observer.get()
+        if observer is not None:
+            observer("tool_start", tool.name)
+
+    async def on_tool_end(self, context, agent, tool, result) -> None:
+        running = self._tool_started.get(tool.name)
+        if running:
+            tool_call_seconds.observe(time.perf_counter() - running.pop(0), tool=tool.name, **_labels())
+            if not running:
+                del self._tool_started[tool.name]
+        if not self._tool_started:
+            self._turn_started = time.perf_counter()
+        observer = tool_call_observer.get()
+        if observer is not None:
+            observer("tool_end", tool.name)
+
+    async def on_agent_end(self, context, agent, output) -> None:
+        self._end_turn()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency and labelling spans with the matched endpoint"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = self._match_endpoint(scope)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        token = request_labels.set({"endpoint": endpoint})
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_labels.reset(token)
+            http_request_seconds.observe(
+                time.perf_counter() - started,
+                method=scope["method"], endpoint=endpoint, status=str(status["code"])
+            )
+
+    @staticmethod
+    def _match_endpoint(scope) -> str:
+        """Route path template for the request, so path parameters don't explode label cardinality"""
+        from starlette.routing import Match
+        for route in scope["app"].routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", "unmatched")
+        return "unmatched"
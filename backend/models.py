@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 # Core data models
 class Source(BaseModel):
@@ -12,6 +12,12 @@ class PerplexityResponse(BaseModel):
     summary: str
     explore_more: List[Source]
 
+class AgentAnswer(BaseModel):
+    """What the agents generate; explore_more is built from the run's recorded search results"""
+    summary: str
+    # Numbers of the [n] search results the summary draws on, most important first
+    citations: List[int]
+
 # API request/response models
 class ChatRequest(BaseModel):
     message: str
@@ -23,4 +29,63 @@ class ChatResponse(BaseModel):
 
 class HealthResponse(BaseModel):
     status: str
-    message: str 
\ No newline at end of file
+    message: str 
+
+class RoutingDecision(BaseModel):
+    """Which agent /chat/auto sent a message to, and why"""
+    agent: str
+    reason: str
+    scores: Dict[str, float]
+    matched: List[str]
+
+class AutoChatResponse(ChatResponse):
+    routing: RoutingDecision
+
+class Quote(BaseModel):
+    """A google_finance price quote"""
+    symbol: str
+    name: str
+    price: Optional[str] = None
+    change: Optional[str] = None
+    exchange: Optional[str] = None
+    url: str
+
+class QuoteBatchRequest(BaseModel):
+    symbols: List[str]
+
+class QuoteBatchResponse(BaseModel):
+    quotes: List[Quote]
+    # Symbols google_finance has no quote for
+    missing: List[str]
+    # Symbols whose lookup failed; worth retrying
+    failed: List[str] = []
+
+class JobRequest(ChatRequest):
+    # "general", "sports", "finance", or "auto" to route like /chat/auto
+    agent: str = "auto"
+
+class JobStatus(BaseModel):
+    """A background chat job; result is set once it has succeeded"""
+    job_id: str
+    # queued, running, succeeded or failed
+    status: str
+    agent: str
+    routing: Optional[RoutingDecision] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # Place in this worker's queue while queued, 1 being next
+    queue_position: Optional[int] = None
+    tool_calls: int = 0
+    last_tool: Optional[str] = None
+    result: Optional[ChatResponse] = None
+    error: Optional[str] = None
+
+class BatchChatItem(JobRequest):
+    # Echoed back on the item's result line
+    id: Optional[str] = None
+
+class BatchChatRequest(BaseModel):
+    items: List[BatchChatItem]
+    # Items to run at once; capped by the server's BATCH_CONCURRENCY
+    concurrency: Optional[int] = None
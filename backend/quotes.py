@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from models import PerplexityResponse, Quote, Source
+from router import KNOWN_TICKERS
+from search_cache import DEFAULT_QUOTE_TTL
+from tools import WebSearchTool, finance_quote_url, get_web_search_tool
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+quote_fast_path_total = metrics.counter(
+    "perplex_quote_fast_path_total",
+    "Finance messages answered by a direct quote lookup (answered) or handed to the agent after one (fallback)",
+    ("outcome",)
+)
+
+# Words that mark a message as asking for a price
+QUOTE_KEYWORDS = {"price", "prices", "quote", "quotes", "stock", "stocks", "shares", "trading"}
+# Words that may surround the tickers in a plain lookup, e.g. "what's the AAPL stock price today?"
+QUOTE_FILLER_WORDS = {
+    "what", "what's", "whats", "is", "are", "the", "a", "an", "of", "for", "and", "vs", "versus", "at", "on",
+    "current", "currently", "today", "today's", "now", "right", "latest", "live", "real", "time", "how", "much",
+    "doing", "get", "show", "me", "check", "give", "please", "per", "share", "ticker", "symbol", "worth",
+}
+# Capitalised words and index names that read like tickers but aren't asking for one;
+# a message containing one goes to the agent unless it is written as a cashtag
+NOT_TICKERS = {
+    "AI", "US", "USA", "UK", "EU", "EV", "EVS", "ETF", "ETFS", "IPO", "IPOS", "CEO", "CFO", "CTO", "SEC", "FED",
+    "GDP", "CPI", "PPI", "EPS", "PE", "ATH", "YTD", "USD", "EUR", "GBP", "JPY", "BTC", "ETH", "REIT", "SPAC",
+    "S", "P", "SP", "DOW", "DJIA", "NYSE", "NDX", "SPX", "VIX", "RUT", "FTSE", "DAX", "I", "A", "OK", "IT", "TV",
+}
+
+_TOKEN = re.compile(r"\$?[A-Za-z]+(?:\.[A-Za-z]+)?(?:'[a-z]+)?")
+_SYMBOL = re.compile(r"[A-Z]{1,5}(?:\.[A-Z])?")
+# What may be left of a plain lookup once its words are removed
+_LEFTOVER = re.compile(r"[\s?!.,&/-]*")
+
+
+def parse_quote_lookup(message: str, max_symbols: int = 5) -> Optional[List[str]]:
+    """
+    Tickers in a message that asks for nothing but their quotes
+
+    "AAPL price", "$nvda and $amd" and "what's MSFT trading at?" are lookups;
+    "why did AAPL drop?" is not, so it still reaches the agent. Symbols outside
+    KNOWN_TICKERS are only accepted as cashtags, since any capitalised word
+    ("HOT stocks", "SELL AAPL stock") reads like one; known symbols of one or
+    two letters also need a quote keyword. Words in NOT_TICKERS ("AI stocks",
+    "the S&P price") are never taken for tickers unless written as cashtags.
+
+    Args:
+        message: User message
+        max_symbols: Most tickers a single lookup may ask for
+
+    Returns:
+        Upper-cased symbols in the order asked, or None if the message needs the agent
+    """
+    if len(message) > 120 or not _LEFTOVER.fullmatch(_TOKEN.sub("", message)):
+        return None
+
+    symbols: List[str] = []
+    has_keyword = False
+    needs_keyword = False
+    for token in _TOKEN.findall(message):
+        lower = token.lower()
+        if token.startswith("$"):
+            symbol = token[1:].upper()
+            if not _SYMBOL.fullmatch(symbol):
+                return None
+            symbols.append(symbol)
+            has_keyword = True
+        elif lower in QUOTE_KEYWORDS:
+            has_keyword = True
+        elif lower in QUOTE_FILLER_WORDS:
+            continue
+        elif token.upper() in NOT_TICKERS:
+            return None
+        elif token in KNOWN_TICKERS or (len(token) >= 3 and token.upper() in KNOWN_TICKERS):
+            symbols.append(token.upper())
+            needs_keyword = needs_keyword or len(token) <= 2
+        else:
+            return None
+
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols or len(symbols) > max_symbols or (needs_keyword and not has_keyword):
+        return None
+    return symbols
+
+
+def to_quote(symbol: str, summary: Dict[str, Any]) -> Quote:
+    """Normalize a google_finance summary block"""
+    change = summary.get("price_change")
+    movement = summary.get("price_movement")
+    if not change and movement:
+        direction = str(movement.get("movement", "")).lower()
+        sign = "+" if direction == "up" else "-" if direction == "down" else ""
+        change = f"{sign}{movement.get('value')} ({sign}{movement.get('percentage')}%)"
+
+    stock = summary.get("stock") or symbol.split(":")[0]
+    exchange = summary.get("exchange")
+    return Quote(
+        symbol=stock,
+        name=summary.get("title") or stock,
+        price=str(summary["price"]) if summary.get("price") is not None else None,
+        change=str(change) if change else None,
+        exchange=exchange,
+        url=finance_quote_url(stock, exchange)
+    )
+
+
+def _label(quote: Quote) -> str:
+    return f"{quote.name} ({quote.symbol})" if quote.name != quote.symbol else quote.symbol
+
+
+def render_quotes(quotes: List[Quote], missing: List[str], failed: Optional[List[str]] = None) -> PerplexityResponse:
+    """Templated answer for a quote lookup"""
+    lines = []
+    for quote in quotes:
+        line = f"{_label(quote)} is at {quote.price or 'an unavailable price'}"
+        if quote.change:
+            line += f", {quote.change} on the day"
+        if quote.exchange:
+            line += f" on {quote.exchange}"
+        lines.append(line + ".")
+    if missing:
+        lines.append(f"No quote was found for {', '.join(missing)}.")
+    if failed:
+        lines.append(f"Quotes for {', '.join(failed)} could not be fetched right now; try again shortly.")
+    lines.append(f"Prices are from Google Finance and may be up to {DEFAULT_QUOTE_TTL:.0f} seconds old.")
+
+    return PerplexityResponse(
+        summary=" ".join(lines),
+        explore_more=[Source(title=f"{_label(quote)} - Google Finance", url=quote.url) for quote in quotes]
+    )
+
+
+class QuoteService:
+    """
+    Answers plain ticker lookups straight from the google_finance engine
+
+    A lookup costs one cached upstream request per ticker instead of an agent
+    run with its LLM round trips.
+    """
+
+    def __init__(self, search_tool: Optional[WebSearchTool] = None, enabled: bool = True, max_concurrency: int = 8, max_batch: int = 50):
+        """
+        Args:
+            search_tool: Search tool whose cache and resilience policy the lookups share; defaults to the shared one
+            enabled: Whether chat messages may be answered by the fast path
+            max_concurrency: Lookups in flight at once for one batch
+            max_batch: Most symbols a batch request may ask for
+        """
+        self._search_tool = search_tool
+        self.enabled = enabled
+        self.max_concurrency = max_concurrency
+        self.max_batch = max_batch
+
+    @property
+    def search_tool(self) -> WebSearchTool:
+        return self._search_tool or get_web_search_tool()
+
+    async def get_quote(self, symbol: str) -> Optional[Quote]:
+        """Quote for one symbol, or None if google_finance doesn't know it"""
+        summary = await self.search_tool.quote(symbol)
+        return to_quote(symbol, summary) if summary else None
+
+    async def get_quotes(self, symbols: List[str]) -> Tuple[List[Quote], List[str], List[str]]:
+        """
+        Look up several symbols concurrently
+
+        Args:
+            symbols: Ticker symbols; duplicates are looked up once
+
+        Returns:
+            Quotes found, in request order, the symbols google_finance has no quote
+            for, and the symbols whose lookup failed
+
+        Raises:
+            Exception: Every lookup failed; the first error is raised
+        """
+        unique = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols if symbol.strip()))
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def lookup(symbol: str) -> Optional[Quote]:
+            async with semaphore:
+                return await self.get_quote(symbol)
+
+        results = await asyncio.gather(*(lookup(symbol) for symbol in unique), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors and len(errors) == len(unique):
+            raise errors[0]
+
+        quotes = [result for result in results if isinstance(result, Quote)]
+        missing = [symbol for symbol, result in zip(unique, results) if result is None]
+        failed = [symbol for symbol, result in zip(unique, results) if isinstance(result, Exception)]
+        return quotes, missing, failed
+
+    async def answer(self, message: str) -> Optional[PerplexityResponse]:
+        """
+        Answer a chat message if it is a plain quote lookup
+
+        Returns:
+            The templated response, or None if the message should go to the agent
+        """
+        if not self.enabled:
+            return None
+        symbols = parse_quote_lookup(message)
+        if not symbols:
+            return None
+
+        try:
+            quotes, missing, failed = await self.get_quotes(symbols)
+        except Exception as e:
+            logger.warning(f"Quote lookup for {symbols} failed, falling back to the agent: {e}")
+            quotes, missing, failed = [], symbols, []
+        if not quotes:
+            quote_fast_path_total.inc(outcome="fallback")
+            return None
+
+        quote_fast_path_total.inc(outcome="answered")
+        return render_quotes(quotes, missing, failed)
+
+
+# Global quote service instance
+quote_service = QuoteService(
+    enabled=os.getenv("QUOTE_FAST_PATH_ENABLED", "true").lower() == "true",
+    max_concurrency=int(os.getenv("QUOTE_BATCH_CONCURRENCY", 8)),
+    max_batch=int(os.getenv("QUOTE_BATCH_MAX", 50))
+)
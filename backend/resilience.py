@@ -0,0 +1,337 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+import httpx
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+upstream_attempts_total = metrics.counter(
+    "perplex_upstream_attempts_total",
+    "Upstream search requests by outcome (success, timeout, error)",
+    ("engine", "outcome")
+)
+upstream_retries_total = metrics.counter(
+    "perplex_upstream_retries_total", "Upstream search requests retried after a failure", ("engine",)
+)
+upstream_hedges_total = metrics.counter(
+    "perplex_upstream_hedges_total",
+    "Hedged duplicate requests sent after the p95 delay, by which request answered first (hedge, primary)",
+    ("engine", "winner")
+)
+circuit_rejections_total = metrics.counter(
+    "perplex_circuit_rejections_total", "Upstream requests failed fast by an open circuit breaker", ("engine",)
+)
+circuit_transitions_total = metrics.counter(
+    "perplex_circuit_transitions_total", "Circuit breaker state changes", ("engine", "state")
+)
+
+
+class UpstreamUnavailable(Exception):
+    """Raised without calling upstream while the engine's circuit breaker is open"""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, connection failures, 429s and 5xx responses are worth retrying"""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+
+class RetryPolicy:
+    """Bounded retries with exponential backoff and full jitter"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 2.0):
+        """
+        Args:
+            max_attempts: Total attempts including the first
+            base_delay: Backoff cap before the first retry, doubled for each later one
+            max_delay: Upper bound on any single backoff
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number attempt (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class LatencyTracker:
+    """Rolling window of request latencies for one engine"""
+
+    def __init__(self, window: int = 200):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class CircuitBreaker:
+    """
+    Opens after consecutive failures and fails fast until a cool-down passes
+
+    After the cool-down one trial request is let through (half-open); its
+    success closes the circuit and its failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, engine: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        """
+        Args:
+            engine: Engine name used in logs and metrics
+            failure_threshold: Consecutive failed requests that open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial request
+        """
+        self.engine = engine
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+
+    def _transition(self, state: str) -> None:
+        if state != self.state:
+            logger.warning(f"SerpAPI {self.engine} circuit {self.state} -> {state}")
+            self.state = state
+            circuit_transitions_total.inc(engine=self.engine, state=state)
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._transition(self.HALF_OPEN)
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def is_open(self) -> bool:
+        """Whether requests are being failed fast right now, without using up the half-open trial"""
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._trial_running = False
+        self._transition(self.CLOSED)
+
+    def abandon(self) -> None:
+        """A request was cancelled before it finished; let another trial through"""
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_running = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._transition(self.OPEN)
+
+
+class ResilientFetcher:
+    """
+    Wraps upstream search requests with per-engine timeouts, retries, hedging and a circuit breaker
+
+    Hedging sends a duplicate request when the first has not answered within
+    the engine's recent p95 latency and uses whichever answers first.
+    """
+
+    def __init__(
+        self,
+        timeouts: Dict[str, float] = None,
+        default_timeout: float = 10.0,
+        retry: RetryPolicy = None,
+        hedge: bool = False,
+        hedge_percentile: float = 95,
+        hedge_min_samples: int = 20,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30
+    ):
+        """
+        Args:
+            timeouts: Mapping of engine to per-attempt timeout in seconds
+            default_timeout: Timeout for engines without their own
+            retry: Retry policy; defaults to 3 attempts
+            hedge: Send a duplicate request when the first is slower than the hedge percentile
+            hedge_percentile: Latency percentile after which the duplicate is sent
+            hedge_min_samples: Latency samples needed before hedging starts
+            failure_threshold: Consecutive failures that open an engine's circuit
+            reset_timeout: Seconds an open circuit waits before a trial request
+        """
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self.retry = retry or RetryPolicy()
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latency: Dict[str, LatencyTracker] = {}
+
+    def breaker(self, engine: str) -> CircuitBreaker:
+        if engine not in self._breakers:
+            self._breakers[engine] = CircuitBreaker(engine, self.failure_threshold, self.reset_timeout)
+        return self._breakers[engine]
+
+    def _tracker(self, engine: str) -> LatencyTracker:
+        return self._latency.setdefault(engine, LatencyTracker())
+
+    async def call(self, engine: str, request: Callable[[float], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Run an upstream request for an engine under the resilience policy
+
+        Args:
+            engine: SerpAPI engine, e.g. "google" or "google_finance"
+            request: Coroutine factory taking the per-attempt timeout
+
+        Returns:
+            The upstream response
+
+        Raises:
+            UpstreamUnavailable: The engine's circuit is open
+            Exception: The last error once retries are exhausted, or a non-retryable error
+        """
+        breaker = self.breaker(engine)
+        if not breaker.allow():
+            circuit_rejections_total.inc(engine=engine)
+            raise UpstreamUnavailable(f"SerpAPI {engine} is unavailable (circuit open), try again shortly")
+
+        timeout = self.timeouts.get(engine, self.default_timeout)
+        attempt = 1
+        while True:
+            try:
+                result = await self._attempt(engine, request, timeout)
+            except asyncio.CancelledError:
+                breaker.abandon()
+                raise
+            except Exception as e:
+                retry = is_retryable(e) and attempt < self.retry.max_attempts
+                if not retry:
+                    breaker.record_failure()
+                    raise
+                upstream_retries_total.inc(engine=engine)
+                delay = self.retry.backoff(attempt)
+                logger.warning(f"SerpAPI {engine} attempt {attempt} failed ({e!r}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            breaker.record_success()
+            return result
+
+    async def _attempt(self, engine: str, request: Callable[[float], Awaitable[Dict[str, Any]]], timeout: float) -> Dict[str, Any]:
+        """One attempt, hedged with a duplicate request if the first is slow"""
+        hedge_delay = None
+        tracker = self._tracker(engine)
+        if self.hedge and len(tracker.samples) >= self.hedge_min_samples:
+            hedge_delay = tracker.percentile(self.hedge_percentile)
+
+        primary = asyncio.ensure_future(self._timed(engine, request, timeout))
+        if hedge_delay is None or hedge_delay >= timeout:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        hedge = asyncio.ensure_future(self._timed(engine, request, timeout))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        upstream_hedges_total.inc(engine=engine, winner="hedge" if task is hedge else "primary")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _timed(self, engine: str, request: Callable[[float], Awaitable[Dict[str, Any]]], timeout: float) -> Dict[str, Any]:
+        """Run one request under its timeout and record its latency and outcome"""
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(request(timeout), timeout)
+        except (asyncio.TimeoutError, httpx.TimeoutException) as e:
+            upstream_attempts_total.inc(engine=engine, outcome="timeout")
+            raise asyncio.TimeoutError(f"SerpAPI {engine} request timed out after {timeout:.1f}s") from e
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            upstream_attempts_total.inc(engine=engine, outcome="error")
+            raise
+        self._tracker(engine).record(time.perf_counter() - started)
+        upstream_attempts_total.inc(engine=engine, outcome="success")
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Circuit state and latency percentiles per engine"""
+        engines = set(self._breakers) | set(self._latency)
+        return {
+            engine: {
+                "circuit": self.breaker(engine).state,
+                "consecutive_failures": self.breaker(engine).failures,
+                "timeout": self.timeouts.get(engine, self.default_timeout),
+                "p50": self._tracker(engine).percentile(50),
+                "p95": self._tracker(engine).percentile(95),
+                "samples": len(self._tracker(engine).samples)
+            }
+            for engine in sorted(engines)
+        }
+
+    def gauge(self) -> Dict[tuple, float]:
+        """1 for each engine's current circuit state, for /metrics"""
+        return {
+            (engine, state): 1.0 if breaker.state == state else 0.0
+            for engine, breaker in self._breakers.items()
+            for state in (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN)
+        }
+
+
+def create_resilient_fetcher() -> ResilientFetcher:
+    """Build the fetcher from SERP_* resilience settings"""
+    default_timeout = float(os.getenv("SERP_API_TIMEOUT", 10))
+    return ResilientFetcher(
+        timeouts={
+            "google": float(os.getenv("SERP_TIMEOUT_GOOGLE", default_timeout)),
+            "google_finance": float(os.getenv("SERP_TIMEOUT_GOOGLE_FINANCE", min(default_timeout, 5))),
+        },
+        default_timeout=default_timeout,
+        retry=RetryPolicy(
+            max_attempts=int(os.getenv("SERP_RETRY_ATTEMPTS", 3)),
+            base_delay=float(os.getenv("SERP_RETRY_BASE_DELAY", 0.2)),
+            max_delay=float(os.getenv("SERP_RETRY_MAX_DELAY", 2.0))
+        ),
+        hedge=os.getenv("SERP_HEDGE_ENABLED", "false").lower() == "true",
+        hedge_percentile=float(os.getenv("SERP_HEDGE_PERCENTILE", 95)),
+        failure_threshold=int(os.getenv("SERP_CIRCUIT_FAILURES", 5)),
+        reset_timeout=float(os.getenv("SERP_CIRCUIT_RESET", 30))
+    )
+
+
+# Global resilient fetcher instance
+resilient_fetcher = create_resilient_fetcher()
+
+metrics.gauge_callback(
+    "perplex_circuit_state", "SerpAPI circuit breaker state per engine (1 = current state)", ("engine", "state"),
+    resilient_fetcher.gauge
+)
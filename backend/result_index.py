@@ -0,0 +1,385 @@
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+local_search_total = metrics.counter(
+    "perplex_local_search_total",
+    "local_search lookups by outcome (local, stale, low_recall)",
+    ("outcome",)
+)
+
+RESULTS_TABLE = "search_results"
+FTS_TABLE = "search_results_fts"
+
+SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS {RESULTS_TABLE} (
+        id INTEGER PRIMARY KEY,
+        link TEXT NOT NULL UNIQUE,
+        title TEXT NOT NULL,
+        snippet TEXT NOT NULL,
+        displayed_link TEXT NOT NULL DEFAULT '',
+        date TEXT NOT NULL DEFAULT '',
+        type TEXT NOT NULL DEFAULT '',
+        query TEXT NOT NULL DEFAULT '',
+        first_seen REAL NOT NULL,
+        last_seen REAL NOT NULL,
+        seen INTEGER NOT NULL DEFAULT 1
+    );
+    CREATE INDEX IF NOT EXISTS idx_{RESULTS_TABLE}_last_seen ON {RESULTS_TABLE} (last_seen);
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, snippet, query, content='{RESULTS_TABLE}', content_rowid='id', tokenize='porter unicode61'
+    );
+    CREATE TRIGGER IF NOT EXISTS {RESULTS_TABLE}_ai AFTER INSERT ON {RESULTS_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, title, snippet, query) VALUES (new.id, new.title, new.snippet, new.query);
+    END;
+    CREATE TRIGGER IF NOT EXISTS {RESULTS_TABLE}_ad AFTER DELETE ON {RESULTS_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, snippet, query) VALUES ('delete', old.id, old.title, old.snippet, old.query);
+    END;
+    CREATE TRIGGER IF NOT EXISTS {RESULTS_TABLE}_au AFTER UPDATE ON {RESULTS_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, snippet, query) VALUES ('delete', old.id, old.title, old.snippet, old.query);
+        INSERT INTO {FTS_TABLE} (rowid, title, snippet, query) VALUES (new.id, new.title, new.snippet, new.query);
+    END;
+"""
+
+# One row per URL: seeing it again refreshes its text and last_seen
+UPSERT_RESULT = f"""
+    INSERT INTO {RESULTS_TABLE} (link, title, snippet, displayed_link, date, type, query, first_seen, last_seen)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (link) DO UPDATE SET
+        title = excluded.title,
+        snippet = excluded.snippet,
+        displayed_link = excluded.displayed_link,
+        date = excluded.date,
+        type = excluded.type,
+        query = excluded.query,
+        last_seen = excluded.last_seen,
+        seen = seen + 1
+"""
+
+# Title matches count most, then the query that found the result, then the snippet
+SEARCH_RESULTS = f"""
+    SELECT r.link, r.title, r.snippet, r.displayed_link, r.date, r.type, r.last_seen
+    FROM {FTS_TABLE} JOIN {RESULTS_TABLE} r ON r.id = {FTS_TABLE}.rowid
+    WHERE {FTS_TABLE} MATCH ?
+    ORDER BY bm25({FTS_TABLE}, 4.0, 1.0, 2.0)
+    LIMIT ?
+"""
+
+# Live snapshots (scoreboards, quote summaries) are stale within minutes, so they aren't kept
+UNINDEXED_TYPES = ("sports_data", "finance_data")
+
+# Words that say nothing about what a result should contain
+STOPWORDS = {
+    "the", "and", "for", "with", "about", "what", "who", "how", "why", "when", "where", "which",
+    "are", "was", "were", "is", "did", "does", "has", "have", "this", "that", "from", "into",
+    "recent", "latest", "news", "today", "current", "now"
+}
+
+
+def query_terms(query: str) -> List[str]:
+    """Distinct lower-case words of a query that a result should mention"""
+    words = re.findall(r"\w+", query.lower())
+    return list(dict.fromkeys(word for word in words if len(word) > 2 and word not in STOPWORDS))
+
+
+def _stem(word: str) -> str:
+    """Crude suffix stripping, so "games" and "game", or "matches" and "match", count as the same term"""
+    if word.endswith("ss"):
+        return word
+    if word.endswith(("sses", "ches", "shes", "xes")):
+        return word[:-2]
+    for suffix in ("ing", "ed", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def _as_of(date: str, last_seen: float) -> str:
+    """A stored result date; relative ones ("3 hours ago") get the day they were relative to"""
+    if "ago" in date:
+        return f"{date} as of {time.strftime('%b %d, %Y', time.localtime(last_seen))}"
+    return date
+
+
+class ResultIndex:
+    """
+    Full-text index of search results seen before, in its own SQLite file
+
+    Every result WebSearchTool returns is stored once per URL, with the query
+    that found it and when it was first and last seen. local_search answers
+    from the index when enough recent results mention the query's terms, so
+    popular topics need no SerpAPI request. Results not seen for max_age
+    seconds are pruned.
+
+    Writes are queued and committed in batches off the event loop, so storing
+    results never delays the search that produced them.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "search_index.db",
+        enabled: bool = True,
+        max_age: float = 30 * 86400,
+        fresh_age: float = 86400,
+        min_results: int = 3,
+        min_coverage: float = 0.8,
+        prune_interval: float = 3600
+    ):
+        """
+        Args:
+            db_path: SQLite file for the index, separate from the conversation database
+            enabled: Whether results are stored and local_search is offered
+            max_age: Seconds after a URL was last seen before it is pruned
+            fresh_age: Seconds a result counts as fresh enough to answer from
+            min_results: Fresh matching results needed to answer without SerpAPI
+            min_coverage: Share of the query's terms each of those results must mention
+            prune_interval: Seconds between pruning passes
+        """
+        self.db_path = db_path
+        self.enabled = enabled
+        self.max_age = max_age
+        self.fresh_age = fresh_age
+        self.min_results = min_results
+        self.min_coverage = min_coverage
+        self.prune_interval = prune_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = os.getpid()
+        self._open_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[Any, ...]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_prune = 0.0
+
+        self.indexed = 0
+        self.pruned = 0
+        self.local = 0
+        self.stale = 0
+        self.low_recall = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database and schema on first use, and again in a forked worker"""
+        with self._open_lock:
+            if self._conn is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._lock = threading.Lock()
+                conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("PRAGMA busy_timeout=30000")
+                conn.executescript(SCHEMA)
+                conn.commit()
+                self._conn = conn
+            return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        conn = self._connection()
+        with self._lock:
+            rows = conn.execute(sql, params).fetchall()
+            conn.commit()
+            return rows
+
+    def remember(self, results: List[Dict[str, Any]], query: str) -> None:
+        """
+        Queue search results for storage without waiting for the write
+
+        Args:
+            results: Result records with title, link, snippet and optionally displayed_link, date and type
+            query: Query the results were found for
+        """
+        if not self.enabled:
+            return
+        now = time.time()
+        for result in results:
+            if not result.get("link") or result.get("type") in UNINDEXED_TYPES:
+                continue
+            self._pending.append((
+                result["link"],
+                result.get("title", ""),
+                result.get("snippet", ""),
+                result.get("displayed_link", ""),
+                result.get("date", ""),
+                result.get("type", ""),
+                query,
+                now,
+                now
+            ))
+        if self._pending and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.ensure_future(self._flush())
+
+    async def _flush(self) -> None:
+        """Commit queued results in batches until the queue drains, pruning now and then"""
+        while self._pending:
+            batch = self._pending
+            self._pending = []
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+                self.indexed += len(batch)
+            except Exception as e:
+                logger.warning(f"Error indexing {len(batch)} search results: {e}")
+        if time.time() - self._last_prune >= self.prune_interval:
+            await self.prune()
+
+    def _write_batch(self, batch: List[Tuple[Any, ...]]) -> None:
+        conn = self._connection()
+        with self._lock:
+            try:
+                conn.executemany(UPSERT_RESULT, batch)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    async def prune(self) -> int:
+        """Delete results not seen for max_age seconds and return how many were removed"""
+        self._last_prune = time.time()
+        cutoff = self._last_prune - self.max_age
+        try:
+            rows = await asyncio.to_thread(
+                self._execute, f"DELETE FROM {RESULTS_TABLE} WHERE last_seen < ? RETURNING id", (cutoff,)
+            )
+        except Exception as e:
+            logger.warning(f"Error pruning the search result index: {e}")
+            return 0
+        self.pruned += len(rows)
+        if rows:
+            logger.info(f"Pruned {len(rows)} search results not seen for {self.max_age:.0f}s")
+        return len(rows)
+
+    async def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Indexed results matching any of the query's terms, best match first
+
+        Returns:
+            Result records with title, link, snippet, displayed_link, date, type and last_seen
+        """
+        terms = query_terms(query)
+        if not self.enabled or not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        try:
+            rows = await asyncio.to_thread(self._execute, SEARCH_RESULTS, (match, limit))
+        except Exception as e:
+            logger.warning(f"Error searching the search result index: {e}")
+            return []
+        return [
+            {
+                "link": link,
+                "title": title,
+                "snippet": snippet,
+                "displayed_link": displayed_link,
+                "date": _as_of(date, last_seen),
+                "type": result_type or "organic",
+                "last_seen": last_seen
+            }
+            for link, title, snippet, displayed_link, date, result_type, last_seen in rows
+        ]
+
+    def coverage(self, query: str, results: List[Dict[str, Any]]) -> float:
+        """
+        Share of the query's terms mentioned by at least one of the results
+
+        Terms are compared as stemmed whole words, so "war" isn't found in "software".
+        """
+        terms = query_terms(query)
+        if not terms:
+            return 0.0
+        words = {
+            _stem(word)
+            for result in results
+            for word in re.findall(r"\w+", f"{result['title']} {result['snippet']}".lower())
+        }
+        return sum(_stem(term) in words for term in terms) / len(terms)
+
+    async def lookup(self, query: str, num_results: int = 5) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Decide whether the index can answer a query on its own
+
+        Args:
+            query: Search query
+            num_results: Results wanted
+
+        Returns:
+            The outcome and the fresh relevant results: "local" when at least min_results
+            fresh results each cover the query's terms, "stale" when only older ones do,
+            and "low_recall" when too few results match
+        """
+        matches = await self.search(query, max(num_results, self.min_results) * 3)
+        # Judged one result at a time, so results each matching a different term
+        # ("Apple iPhone", "Microsoft earnings") don't add up to an answer
+        relevant = [result for result in matches if self.coverage(query, [result]) >= self.min_coverage]
+        cutoff = time.time() - self.fresh_age
+        fresh = [result for result in relevant if result["last_seen"] >= cutoff]
+
+        if len(fresh) >= self.min_results:
+            outcome = "local"
+            self.local += 1
+        elif len(relevant) >= self.min_results:
+            outcome = "stale"
+            self.stale += 1
+        else:
+            outcome = "low_recall"
+            self.low_recall += 1
+        local_search_total.inc(outcome=outcome)
+        return outcome, fresh[:num_results]
+
+    async def close(self) -> None:
+        """Write out queued results and close the database"""
+        if self._flush_task is not None:
+            await self._flush_task
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _count(self) -> Tuple[int, int]:
+        """Indexed rows and database size in bytes; blocking, run in a worker thread"""
+        if not os.path.exists(self.db_path):
+            return 0, 0
+        rows = 0
+        if self.enabled:
+            try:
+                rows = self._execute(f"SELECT COUNT(*) FROM {RESULTS_TABLE}")[0][0]
+            except Exception as e:
+                logger.warning(f"Error reading search result index stats: {e}")
+        return rows, os.path.getsize(self.db_path)
+
+    async def stats(self) -> Dict[str, Any]:
+        """Index size, lookup outcomes and write counters for monitoring"""
+        # The count waits on the same lock as index writes, so it stays off the event loop
+        rows, size = await asyncio.to_thread(self._count)
+        lookups = self.local + self.stale + self.low_recall
+        return {
+            "enabled": self.enabled,
+            "path": self.db_path,
+            "results": rows,
+            "size_bytes": size,
+            "indexed": self.indexed,
+            "pending": len(self._pending),
+            "pruned": self.pruned,
+            "lookups": lookups,
+            "local": self.local,
+            "stale": self.stale,
+            "low_recall": self.low_recall,
+            "local_ratio": self.local / lookups if lookups else 0.0,
+            "max_age": self.max_age,
+            "fresh_age": self.fresh_age
+        }
+
+
+# Global search result index instance; the database is opened on first use
+result_index = ResultIndex(
+    db_path=os.getenv("SEARCH_INDEX_PATH", "search_index.db"),
+    enabled=os.getenv("SEARCH_INDEX_ENABLED", "true").lower() == "true",
+    max_age=float(os.getenv("SEARCH_INDEX_MAX_AGE", 30 * 86400)),
+    fresh_age=float(os.getenv("LOCAL_SEARCH_MAX_AGE", 86400)),
+    min_results=int(os.getenv("LOCAL_SEARCH_MIN_RESULTS", 3)),
+    min_coverage=float(os.getenv("LOCAL_SEARCH_MIN_COVERAGE", 0.8))
+)
@@ -0,0 +1,210 @@
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+from metrics import metrics
+from models import RoutingDecision
+from state_backend import StateBackend, state_backend
+
+
+# Phrase -> weight. Multi-word phrases are matched before their words, and
+# words that are also everyday English (e.g. "heat", "magic") weigh less.
+SPORTS_TERMS: Dict[str, float] = {
+    # Leagues and competitions
+    "nba": 2, "nfl": 2, "mlb": 2, "nhl": 2, "mls": 2, "wnba": 2, "ncaa": 2, "ufc": 2, "pga": 2, "atp": 2,
+    "wta": 2, "f1": 2, "formula 1": 2, "formula one": 2, "premier league": 2, "champions league": 2,
+    "la liga": 2, "serie a": 2, "bundesliga": 2, "ligue 1": 2, "world cup": 2, "super bowl": 2,
+    "world series": 2, "stanley cup": 2, "march madness": 2, "wimbledon": 2, "us open": 1, "olympics": 2,
+    "grand slam": 1, "nascar": 2, "euro 2024": 2, "copa america": 2,
+    # Sports vocabulary
+    "score": 1, "scores": 1, "final score": 2, "game": 0.5, "games": 0.5, "match": 1, "matches": 1,
+    "playoff": 2, "playoffs": 2, "standings": 2, "fixtures": 2, "fixture": 2, "roster": 1.5, "lineup": 1.5,
+    "season": 0.5, "coach": 1, "quarterback": 2, "touchdown": 2, "home run": 2, "innings": 2, "inning": 2,
+    "hat trick": 2, "goalkeeper": 2, "striker": 1.5, "midfielder": 2, "rebounds": 2, "assists": 1,
+    "mvp": 2, "draft pick": 2, "free agent": 2, "free agency": 2, "injury report": 2, "box score": 2,
+    "tournament": 1, "championship": 1, "league": 1, "tennis": 2, "golf": 2, "soccer": 2, "football": 2,
+    "basketball": 2, "baseball": 2, "hockey": 2, "cricket": 1.5, "rugby": 2, "boxing": 1.5, "racing": 1,
+    "sports": 2, "sport": 1.5, "athlete": 1.5, "player": 1, "players": 1, "team": 0.5, "teams": 0.5,
+    "transfer window": 2, "relegation": 2, "kickoff": 2, "tip off": 2, "overtime": 1,
+    # NBA
+    "lakers": 2, "celtics": 2, "warriors": 2, "knicks": 2, "nets": 1, "bucks": 1, "76ers": 2, "sixers": 2,
+    "raptors": 2, "cavaliers": 2, "cavs": 2, "pistons": 2, "pacers": 2, "hawks": 1, "hornets": 2,
+    "heat": 0.5, "magic": 0.5, "wizards": 1, "nuggets": 2, "timberwolves": 2, "thunder": 0.5,
+    "trail blazers": 2, "blazers": 1.5, "jazz": 0.5, "clippers": 2, "suns": 1, "kings": 0.5,
+    "mavericks": 2, "mavs": 2, "rockets": 1, "grizzlies": 2, "pelicans": 2, "spurs": 1.5,
+    # NFL
+    "chiefs": 1.5, "eagles": 1, "cowboys": 1.5, "patriots": 1.5, "packers": 2, "steelers": 2, "49ers": 2,
+    "niners": 2, "ravens": 1.5, "bills": 0.5, "dolphins": 1, "jets": 1, "giants": 1, "commanders": 1,
+    "bears": 0.5, "lions": 1, "vikings": 1, "buccaneers": 2, "bucs": 2, "saints": 1, "falcons": 1.5,
+    "panthers": 1, "rams": 1.5, "seahawks": 2, "cardinals": 1, "broncos": 2, "raiders": 1.5,
+    "chargers": 1.5, "bengals": 2, "browns": 1, "texans": 1.5, "colts": 2, "jaguars": 1, "titans": 1,
+    # MLB
+    "yankees": 2, "red sox": 2, "dodgers": 2, "mets": 2, "cubs": 2, "white sox": 2, "astros": 2,
+    "braves": 2, "phillies": 2, "padres": 2, "mariners": 2, "orioles": 2, "blue jays": 2, "rays": 1,
+    "guardians": 1, "tigers": 1, "twins": 1, "royals": 1, "athletics": 1, "angels": 1, "rangers": 1,
+    "brewers": 2, "reds": 1, "pirates": 1, "marlins": 2, "rockies": 2, "diamondbacks": 2, "nationals": 1,
+    # NHL
+    "maple leafs": 2, "canadiens": 2, "bruins": 2, "oilers": 2, "flames": 1, "canucks": 2, "penguins": 1.5,
+    "flyers": 1.5, "blackhawks": 2, "red wings": 2, "avalanche": 1, "golden knights": 2, "islanders": 1.5,
+    "capitals": 1, "hurricanes": 1, "predators": 1, "sabres": 2, "senators": 0.5, "kraken": 1.5,
+    "lightning": 0.5, "stars": 0.5, "blues": 0.5, "wild": 0.5, "ducks": 1, "sharks": 1, "devils": 1,
+    # Football clubs
+    "manchester united": 2, "man united": 2, "man utd": 2, "manchester city": 2, "man city": 2,
+    "liverpool": 1.5, "arsenal": 2, "chelsea": 1.5, "tottenham": 2, "real madrid": 2, "barcelona": 1.5,
+    "barca": 2, "atletico madrid": 2, "bayern munich": 2, "bayern": 2, "juventus": 2, "inter milan": 2,
+    "ac milan": 2, "psg": 2, "paris saint germain": 2, "borussia dortmund": 2, "dortmund": 2,
+    "inter miami": 2, "messi": 2, "ronaldo": 2, "lebron": 2, "mahomes": 2, "ohtani": 2,
+}
+
+FINANCE_TERMS: Dict[str, float] = {
+    # Markets and instruments
+    "stock": 2, "stocks": 2, "share price": 2, "shares": 1.5, "stock price": 2, "market cap": 2,
+    "stock market": 2, "market": 0.5, "markets": 1, "nasdaq": 2, "nyse": 2, "dow": 1.5, "dow jones": 2,
+    "s&p": 2, "s&p 500": 2, "sp500": 2, "russell 2000": 2, "ftse": 2, "nikkei": 2, "dax": 2,
+    "index fund": 2, "etf": 2, "etfs": 2, "mutual fund": 2, "bond": 1.5, "bonds": 1.5, "treasury": 1.5,
+    "treasuries": 2, "yield": 1, "yields": 1, "bond yields": 2, "futures": 1.5, "options": 0.5,
+    "forex": 2, "exchange rate": 2, "currency": 1, "commodities": 2, "gold price": 2, "oil price": 2,
+    "oil prices": 2, "crude": 1.5, "crypto": 2, "cryptocurrency": 2, "bitcoin": 2, "btc": 2,
+    "ethereum": 2, "eth": 1.5, "solana": 1.5, "dogecoin": 2,
+    # Company and investing vocabulary
+    "earnings": 2, "earnings call": 2, "revenue": 1.5, "profit": 1, "guidance": 1, "eps": 2,
+    "dividend": 2, "dividends": 2, "ipo": 2, "valuation": 1.5, "market share": 1, "buyback": 2,
+    "quarterly results": 2, "analyst": 1, "analysts": 1, "price target": 2, "downgrade": 1.5,
+    "upgrade": 0.5, "invest": 1.5, "investing": 1.5, "investment": 1.5, "investor": 1.5,
+    "investors": 1.5, "portfolio": 1.5, "trading": 1, "trader": 1.5, "hedge fund": 2, "bull market": 2,
+    "bear market": 2, "rally": 1, "sell off": 2, "selloff": 2, "stock split": 2, "short interest": 2,
+    "pe ratio": 2, "p/e": 2, "ticker": 2,
+    # Economy
+    "economy": 1.5, "economic": 1.5, "inflation": 2, "cpi": 2, "gdp": 2, "recession": 2,
+    "interest rate": 2, "interest rates": 2, "rate cut": 2, "rate hike": 2, "fed": 1.5,
+    "federal reserve": 2, "fomc": 2, "jobs report": 2, "unemployment": 1.5, "tariffs": 1, "mortgage rates": 2,
+    # Large caps by name
+    "apple": 0.5, "microsoft": 1, "nvidia": 1.5, "tesla": 1, "amazon": 0.5, "alphabet": 1.5,
+    "google": 0.5, "meta": 0.5, "berkshire hathaway": 2, "jpmorgan": 1.5, "goldman sachs": 1.5,
+    "netflix": 0.5, "amd": 1, "intel": 1, "broadcom": 1.5, "palantir": 1.5, "coinbase": 1.5,
+}
+
+# Symbols recognised when written in capitals; cashtags ($XYZ) are recognised for any symbol
+KNOWN_TICKERS = {
+    "AAPL", "MSFT", "NVDA", "GOOG", "GOOGL", "AMZN", "META", "TSLA", "BRK.A", "BRK.B", "AVGO", "JPM",
+    "LLY", "V", "UNH", "XOM", "MA", "JNJ", "PG", "HD", "COST", "ORCL", "MRK", "ABBV", "CVX", "KO", "PEP",
+    "BAC", "WMT", "NFLX", "CRM", "AMD", "INTC", "ADBE", "DIS", "CSCO", "QCOM", "TXN", "IBM", "GS", "MS",
+    "PLTR", "COIN", "UBER", "SHOP", "SQ", "PYPL", "BA", "GE", "F", "GM", "NKE", "SBUX", "MCD", "T", "VZ",
+    "SPY", "QQQ", "DIA", "IWM", "VOO", "VTI", "ARKK", "TLT", "GLD", "SMCI", "ARM", "MU", "SNOW",
+}
+TICKER_WEIGHT = 2.0
+CASHTAG_WEIGHT = 3.0
+
+_WORD = re.compile(r"[a-z0-9&/.]+(?:'[a-z]+)?")
+_CASHTAG = re.compile(r"\$([A-Za-z]{1,5}(?:\.[A-Za-z])?)\b")
+_CAPS_TOKEN = re.compile(r"\b[A-Z]{1,5}(?:\.[A-Z])?\b")
+
+route_total = metrics.counter(
+    "perplex_route_total", "Messages routed by /chat/auto, by agent and reason", ("agent", "reason")
+)
+
+
+class AgentRouter:
+    """
+    Keyword, ticker and team-name classifier choosing the agent for a message
+
+    Scores every n-gram of the message against per-domain phrase weights; no
+    model call is involved, so classification takes microseconds. Follow-ups
+    in a routed thread stay with the thread's agent unless the new message
+    clearly belongs to another domain.
+    """
+
+    def __init__(
+        self,
+        min_score: float = 2.0,
+        margin: float = 1.0,
+        backend: StateBackend = None,
+        thread_ttl: float = 1800
+    ):
+        """
+        Args:
+            min_score: Lowest domain score that routes away from the general agent
+            margin: How far the winning domain must lead the runner-up
+            backend: Where each thread's routed agent is remembered
+            thread_ttl: Seconds a thread's routing is remembered after its last message
+        """
+        self.min_score = min_score
+        self.margin = margin
+        self.backend = backend
+        self.thread_ttl = thread_ttl
+        self._terms = {"sports": SPORTS_TERMS, "finance": FINANCE_TERMS}
+        self._max_words = max(len(term.split()) for terms in self._terms.values() for term in terms)
+
+    def score(self, message: str) -> Tuple[Dict[str, float], List[str]]:
+        """Per-domain scores for a message and the phrases that matched"""
+        scores = {domain: 0.0 for domain in self._terms}
+        matched: List[str] = []
+
+        for symbol in _CASHTAG.findall(message):
+            scores["finance"] += CASHTAG_WEIGHT
+            matched.append(f"${symbol.upper()}")
+        for token in _CAPS_TOKEN.findall(message):
+            if token in KNOWN_TICKERS and f"${token}" not in matched:
+                scores["finance"] += TICKER_WEIGHT
+                matched.append(token)
+
+        words = _WORD.findall(message.lower())
+        index = 0
+        while index < len(words):
+            # Longest phrase starting here wins, so "red sox" is not also scored as "sox"
+            for size in range(min(self._max_words, len(words) - index), 0, -1):
+                phrase = " ".join(words[index:index + size])
+                hits = [(domain, terms[phrase]) for domain, terms in self._terms.items() if phrase in terms]
+                if hits:
+                    for domain, weight in hits:
+                        scores[domain] += weight
+                    matched.append(phrase)
+                    index += size
+                    break
+            else:
+                index += 1
+
+        return scores, matched
+
+    def classify(self, message: str) -> RoutingDecision:
+        """Choose an agent for a message on its own"""
+        scores, matched = self.score(message)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        (best, best_score), (_, runner_up) = ranked[0], ranked[1]
+
+        if best_score >= self.min_score and best_score - runner_up >= self.margin:
+            return RoutingDecision(agent=best, reason="classified", scores=scores, matched=matched)
+        return RoutingDecision(agent="general", reason="default", scores=scores, matched=matched)
+
+    async def route(self, message: str, thread_id: Optional[str] = None) -> RoutingDecision:
+        """
+        Choose an agent for a message, keeping follow-ups with their thread's agent
+
+        Args:
+            message: The user's message
+            thread_id: Conversation thread, if the message continues one
+
+        Returns:
+            The routing decision
+        """
+        decision = self.classify(message)
+        if thread_id and self.backend is not None:
+            previous = await self.backend.get("route", thread_id)
+            if previous and decision.reason == "default":
+                decision = RoutingDecision(
+                    agent=previous, reason="thread", scores=decision.scores, matched=decision.matched
+                )
+        route_total.inc(agent=decision.agent, reason=decision.reason)
+        return decision
+
+    async def remember(self, thread_id: str, agent: str) -> None:
+        """Record the agent a thread was routed to"""
+        if self.backend is not None:
+            await self.backend.set("route", thread_id, agent, self.thread_ttl)
+
+
+# Global agent router instance
+agent_router = AgentRouter(
+    min_score=float(os.getenv("ROUTER_MIN_SCORE", 2.0)),
+    backend=state_backend,
+    thread_ttl=float(os.getenv("SESSION_CACHE_IDLE_TIMEOUT", 1800))
+)
@@ -0,0 +1,300 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote_plus
+from state_backend import InProcessStateBackend, StateBackend, state_backend
+from tools import WebSearchTool, get_web_search_tool, describe_game, format_search_results, parse_sports_results, record_results
+from metrics import metrics, span
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+scoreboard_polls_total = metrics.counter(
+    "perplex_scoreboard_polls_total", "Scoreboard polls by outcome (updated, unchanged, error)", ("outcome",)
+)
+
+# Statuses of games that are over or not happening; any other status means the game is on
+FINISHED_STATUSES = ("final", "ft", "full time", "postponed", "canceled", "cancelled", "abandoned")
+
+
+def is_live(game: Dict[str, Any]) -> bool:
+    """Whether a game is in progress; scheduled games carry no status yet"""
+    status = game.get("status", "").lower()
+    return bool(status) and not status.startswith(FINISHED_STATUSES)
+
+
+class ScoreboardPoller:
+    """
+    Polls SerpAPI sports results for tracked teams and leagues and keeps the scoreboard in memory
+
+    Every change is pushed to subscribers as a diff of added, updated and removed
+    games. Targets with a game in progress are polled more often. With a shared
+    state backend one worker polls each target per interval, under a lease, and
+    publishes the new state; every worker then applies it and notifies its own
+    subscribers.
+    """
+
+    def __init__(
+        self,
+        targets: List[str],
+        search_tool: Optional[WebSearchTool] = None,
+        interval: float = 60,
+        live_interval: float = 20,
+        backend: StateBackend = None,
+        max_queue: int = 100
+    ):
+        """
+        Args:
+            targets: Team or league names to track, each polled as its own Google query
+            search_tool: Search tool whose client and resilience policy the polls use; defaults to the shared one
+            interval: Seconds between polls of a target with no game in progress
+            live_interval: Seconds between polls of a target with a game in progress
+            backend: Where polled state is shared between workers; defaults to this process
+            max_queue: Diffs buffered per subscriber before a slow one is disconnected
+        """
+        self.targets = targets
+        self._search_tool = search_tool
+        self.interval = interval
+        self.live_interval = live_interval
+        self.backend = backend or InProcessStateBackend()
+        self.max_queue = max_queue
+        # target -> {"target", "title", "updated_at", "games"}
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._subscribers: List[asyncio.Queue] = []
+        self._loops: Dict[str, asyncio.Task] = {}
+        self.backend.subscribe("scoreboard", self._on_message)
+
+        self.version = 0
+        self.polls = 0
+        self.poll_failures = 0
+        self.updates = 0
+        self.dropped_subscribers = 0
+
+    @property
+    def search_tool(self) -> WebSearchTool:
+        return self._search_tool or get_web_search_tool()
+
+    def _has_live_game(self, target: str) -> bool:
+        state = self._state.get(target)
+        return state is not None and any(is_live(game) for game in state["games"])
+
+    async def poll(self, target: str) -> None:
+        """Fetch a target's scoreboard and apply it, unless another worker holds its lease"""
+        if self.backend.shared:
+            lease_ttl = 0.9 * (self.live_interval if self._has_live_game(target) else self.interval)
+            if not await self.backend.acquire(f"scoreboard:{target}", lease_ttl):
+                # Another worker polls this target; its published state reaches us as a message
+                if target not in self._state:
+                    await self._sync(target)
+                return
+
+        self.polls += 1
+        try:
+            with span("scoreboard_poll"):
+                sports_results = await self.search_tool.sports_scoreboard(target)
+        except Exception as e:
+            self.poll_failures += 1
+            scoreboard_polls_total.inc(outcome="error")
+            logger.error(f"Error polling scoreboard for {target}: {e}")
+            raise
+
+        state = {
+            "target": target,
+            "title": sports_results.get("title", target),
+            "updated_at": time.time(),
+            "games": parse_sports_results(sports_results)
+        }
+        if self.backend.shared:
+            await self.backend.set("scoreboard", target, state)
+            await self.backend.publish("scoreboard", target)
+        else:
+            self._apply(state)
+
+    def _on_message(self, target: str) -> None:
+        """A worker published a new state for target"""
+        asyncio.ensure_future(self._sync(target))
+
+    async def _sync(self, target: str) -> None:
+        """Adopt the shared state for a target"""
+        state = await self.backend.get("scoreboard", target)
+        if state is not None:
+            self._apply(state)
+
+    def _apply(self, state: Dict[str, Any]) -> None:
+        """Replace a target's state and push the differences to subscribers"""
+        target = state["target"]
+        previous = self._state.get(target)
+        if previous is not None and previous["updated_at"] > state["updated_at"]:
+            return
+        self._state[target] = state
+
+        old_games = {game["id"]: game for game in previous["games"]} if previous else {}
+        new_games = {game["id"]: game for game in state["games"]}
+        added = [game for game_id, game in new_games.items() if game_id not in old_games]
+        updated = [game for game_id, game in new_games.items() if game_id in old_games and old_games[game_id] != game]
+        removed = [game_id for game_id in old_games if game_id not in new_games]
+
+        if not (added or updated or removed):
+            scoreboard_polls_total.inc(outcome="unchanged")
+            return
+        scoreboard_polls_total.inc(outcome="updated")
+        self.version += 1
+        self.updates += 1
+        self._broadcast({
+            "version": self.version,
+            "target": target,
+            "title": state["title"],
+            "updated_at": state["updated_at"],
+            "added": added,
+            "updated": updated,
+            "removed": removed
+        })
+
+    def _broadcast(self, event: Dict[str, Any]) -> None:
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A subscriber that can't keep up is cut off; it resubscribes for a fresh snapshot
+                self.dropped_subscribers += 1
+                self._end(queue)
+
+    def _end(self, queue: asyncio.Queue) -> None:
+        """Unsubscribe a queue and tell its reader, dropping diffs it hasn't read"""
+        self.unsubscribe(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Queue receiving every diff from now on
+
+        A None item means the subscription ended, because the subscriber fell
+        behind or the poller stopped.
+        """
+        queue = asyncio.Queue(self.max_queue)
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Every tracked target's scoreboard; diffs with a version up to this one are already included"""
+        now = time.time()
+        return {
+            "version": self.version,
+            "targets": {
+                target: {**state, "age": now - state["updated_at"]}
+                for target, state in self._state.items()
+            }
+        }
+
+    def find_games(self, query: str) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Tracked games matching a team or league name
+
+        Returns:
+            (target state, game) pairs: every game of a matching target, plus games
+            whose team or league names match. A game tracked under several targets
+            is returned once, from the most recently polled.
+        """
+        needle = query.lower().strip()
+        if not needle:
+            return []
+        matches = []
+        seen_ids = set()
+        for target, state in sorted(self._state.items(), key=lambda item: item[1]["updated_at"], reverse=True):
+            name = target.lower()
+            target_matches = needle in name or name in needle
+            for game in state["games"]:
+                if game["id"] in seen_ids:
+                    continue
+                names = [team["name"].lower() for team in game["teams"]] + [game["league"].lower()]
+                if target_matches or any(candidate and (needle in candidate or candidate in needle) for candidate in names):
+                    seen_ids.add(game["id"])
+                    matches.append((state, game))
+        return matches
+
+    async def _poll_loop(self, target: str) -> None:
+        """Poll a target, faster while one of its games is in progress"""
+        while True:
+            try:
+                await self.poll(target)
+            except Exception:
+                # Keep serving the previous state; the next tick retries
+                pass
+            await asyncio.sleep(self.live_interval if self._has_live_game(target) else self.interval)
+
+    def start(self) -> None:
+        """Start a background poll loop for every tracked target"""
+        for target in self.targets:
+            if target not in self._loops:
+                self._loops[target] = asyncio.ensure_future(self._poll_loop(target))
+
+    async def stop(self) -> None:
+        """Cancel the poll loops and end every subscription"""
+        tasks = list(self._loops.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loops.clear()
+        for queue in list(self._subscribers):
+            self._end(queue)
+
+    def stats(self) -> Dict[str, Any]:
+        """Poll counters and per-target freshness for monitoring"""
+        now = time.time()
+        return {
+            "backend": self.backend.name,
+            "interval": self.interval,
+            "live_interval": self.live_interval,
+            "targets": {
+                target: {
+                    "age": now - self._state[target]["updated_at"] if target in self._state else None,
+                    "games": len(self._state[target]["games"]) if target in self._state else 0,
+                    "live": self._has_live_game(target)
+                }
+                for target in self.targets
+            },
+            "version": self.version,
+            "polls": self.polls,
+            "poll_failures": self.poll_failures,
+            "updates": self.updates,
+            "subscribers": len(self._subscribers),
+            "dropped_subscribers": self.dropped_subscribers
+        }
+
+
+async def execute_live_scores_async(query: str) -> str:
+    """Read tracked games for a team or league from the in-memory scoreboard and return formatted results"""
+    now = time.time()
+    results = []
+    for state, game in scoreboard_poller.find_games(query):
+        names = " vs ".join(team["name"] for team in game["teams"])
+        results.append({
+            "title": describe_game(game),
+            "link": "https://www.google.com/search?q=" + quote_plus(f"{names} {game['date']}".strip()),
+            "snippet": f"{state['title']} scoreboard, updated {now - state['updated_at']:.0f}s ago"
+                       + (f", at {game['venue']}" if game["venue"] else ""),
+            "displayed_link": "google.com/sports",
+            "type": "sports_data",
+            "date": game["date"]
+        })
+    start = record_results(results)
+
+    with span("format"):
+        return format_search_results("scores", [query], [(query, result) for result in results], start=start)
+
+
+# Global scoreboard poller instance; nothing is polled unless SCOREBOARD_TARGETS is set
+scoreboard_poller = ScoreboardPoller(
+    targets=[target.strip() for target in os.getenv("SCOREBOARD_TARGETS", "").split(",") if target.strip()],
+    interval=float(os.getenv("SCOREBOARD_INTERVAL", 60)),
+    live_interval=float(os.getenv("SCOREBOARD_LIVE_INTERVAL", 20)),
+    backend=state_backend
+)
@@ -0,0 +1,230 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Tuple, Callable, Awaitable, Optional
+from state_backend import StateBackend, state_backend
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+CacheKey = Tuple[str, str, str, int]
+
+# Freshness window (SerpAPI "tbs") -> seconds a cached response stays valid.
+# Tighter windows mean the data moves faster, so they get shorter TTLs.
+DEFAULT_TTLS = {
+    "qdr:w": float(os.getenv("SEARCH_CACHE_TTL_FINANCE", 120)),   # finance
+    "qdr:m": float(os.getenv("SEARCH_CACHE_TTL_SPORTS", 300)),    # sports
+    "qdr:y": float(os.getenv("SEARCH_CACHE_TTL_GENERAL", 1800)),  # general
+}
+# google_finance quotes carry no tbs window and are the most time-sensitive
+DEFAULT_QUOTE_TTL = float(os.getenv("SEARCH_CACHE_TTL_QUOTE", 60))
+# Engines whose answers are wrong once outdated, so they are never served stale
+FRESH_ONLY_ENGINES = ("google_finance",)
+
+
+class SearchCache:
+    """
+    TTL + LRU cache for SerpAPI responses with single-flight request coalescing
+
+    With a shared state backend the in-process entries act as a first level in
+    front of the shared cache, so a response fetched by one worker is reused
+    by the others until its TTL runs out.
+
+    Expired responses are kept for up to max_stale seconds so they can be
+    served when the upstream request fails, except for fresh_only_engines.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttls: Dict[str, float] = None,
+        default_ttl: float = DEFAULT_QUOTE_TTL,
+        backend: StateBackend = None,
+        max_stale: float = 3600,
+        fresh_only_engines: Tuple[str, ...] = FRESH_ONLY_ENGINES
+    ):
+        """
+        Args:
+            max_entries: Maximum number of cached responses before LRU eviction
+            ttls: Mapping of tbs freshness window to TTL in seconds
+            default_ttl: TTL for requests without a known tbs window
+            backend: State backend consulted on local misses when it is shared between workers
+            max_stale: Seconds past expiry a response may still be served if upstream fails
+            fresh_only_engines: Engines whose expired responses are never served, e.g. live quotes
+        """
+        self.max_entries = max_entries
+        self.ttls = ttls if ttls is not None else dict(DEFAULT_TTLS)
+        self.default_ttl = default_ttl
+        self.backend = backend
+        self.max_stale = max_stale
+        self.fresh_only_engines = fresh_only_engines
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Task] = {}
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_served = 0
+
+    @staticmethod
+    def make_key(params: Dict[str, Any]) -> CacheKey:
+        """Build a cache key from the normalized query, engine, tbs window and result count"""
+        query = " ".join(str(params.get("q", "")).lower().split())
+        return (
+            query,
+            params.get("engine", "google"),
+            params.get("tbs", ""),
+            int(params.get("num", 0) or 0),
+        )
+
+    def ttl_for(self, params: Dict[str, Any]) -> float:
+        """TTL in seconds for a request, derived from its freshness window"""
+        return self.ttls.get(params.get("tbs", ""), self.default_ttl)
+
+    def get(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        """Return a fresh cached response or None, refreshing its LRU position"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            # Past the stale window nothing can use it any more
+            if expires_at + self.max_stale <= now:
+                del self._entries[key]
+            self.expirations += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def get_stale(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        """Return a response even if expired, as long as it is within the stale window"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at + self.max_stale <= time.monotonic():
+            return None
+        return value
+
+    def set(self, key: CacheKey, value: Dict[str, Any], ttl: float) -> None:
+        """Store a response and evict the least recently used entries beyond capacity"""
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_fetch(
+        self,
+        params: Dict[str, Any],
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """
+        Return the cached response for params, or fetch it once for all concurrent callers
+
+        Args:
+            params: SerpAPI query parameters used to derive the cache key and TTL
+            fetch: Coroutine factory performing the upstream request on a miss
+
+        Returns:
+            The SerpAPI response dictionary
+        """
+        key = self.make_key(params)
+
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._fetch(key, params, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_fetch_done(key, t))
+
+        # Shield so one cancelled caller doesn't cancel the shared upstream request
+        value, _ = await asyncio.shield(task)
+        return value
+
+    async def _fetch(
+        self,
+        key: CacheKey,
+        params: Dict[str, Any],
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Tuple[Dict[str, Any], float]:
+        """Fetch from the shared cache or upstream, returning the response and its remaining TTL"""
+        shared = self.backend is not None and self.backend.shared
+        shared_key = json.dumps(key)
+        if shared:
+            entry = await self.backend.get("search", shared_key)
+            if entry is not None:
+                self.shared_hits += 1
+                return entry["value"], entry["expires_at"] - time.time()
+
+        ttl = self.ttl_for(params)
+        try:
+            value = await fetch()
+        except Exception as e:
+            stale = None if key[1] in self.fresh_only_engines else self.get_stale(key)
+            if stale is None:
+                raise
+            # Upstream is failing; an outdated answer beats none (TTL 0 keeps it from being re-cached)
+            self.stale_served += 1
+            logger.warning(f"Serving stale search results for {key[0]!r}: {e}")
+            return stale, 0
+        if shared:
+            await self.backend.set("search", shared_key, {"expires_at": time.time() + ttl, "value": value}, ttl)
+        return value, ttl
+
+    def _on_fetch_done(self, key: CacheKey, task: asyncio.Task) -> None:
+        """Store a successful fetch and release the in-flight slot; failures are not cached"""
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        value, ttl = task.result()
+        if ttl > 0:
+            self.set(key, value, ttl)
+
+    def clear(self) -> None:
+        """Drop all cached responses"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for monitoring"""
+        lookups = self.hits + self.coalesced + self.misses
+        return {
+            "backend": self.backend.name if self.backend is not None else None,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "stale_served": self.stale_served,
+            "max_stale": self.max_stale,
+            "hit_ratio": (self.hits + self.coalesced + self.shared_hits) / lookups if lookups else 0.0,
+            "ttls": {**self.ttls, "default": self.default_ttl},
+        }
+
+
+# Global search cache instance
+search_cache = SearchCache(
+    max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 512)),
+    backend=state_backend,
+    max_stale=float(os.getenv("SEARCH_CACHE_MAX_STALE", 3600))
+)
@@ -0,0 +1,412 @@
+import asyncio
+import logging
+import os
+import random
+import time
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Union
+from metrics import metrics, span
+from resilience import ResilientFetcher, resilient_fetcher
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+provider_requests_total = metrics.counter(
+    "perplex_search_provider_requests_total",
+    "Federated search requests per provider by outcome (results, empty, error, cancelled)",
+    ("provider", "outcome")
+)
+provider_seconds = metrics.histogram(
+    "perplex_search_provider_seconds", "Latency of federated search requests that finished", ("provider",)
+)
+federated_searches_total = metrics.counter(
+    "perplex_federated_searches_total",
+    "Federated web searches by how they were answered (first, merged, empty)",
+    ("outcome",)
+)
+
+# Date filters per SerpAPI engine that keep web searches to roughly the past year;
+# engines left out are searched without one
+RECENCY_PARAMS = {
+    "google": {"tbs": "qdr:y", "sort": "date"},
+    "duckduckgo": {"df": "y"},
+}
+
+
+class SearchProvider(ABC):
+    """
+    A source of web search results for SearchFederation
+
+    Providers return organic results in SerpAPI's shape (title, link, snippet,
+    displayed_link, date), so WebSearchTool formats them the same way whichever
+    provider answered.
+    """
+
+    name = "provider"
+
+    def available(self) -> bool:
+        """Whether the provider should be queried now; False while its circuit is open"""
+        return True
+
+    @abstractmethod
+    async def search(self, query: str, num_results: int) -> List[Dict[str, Any]]:
+        """Up to num_results organic results for a query"""
+
+
+class SerpApiProvider(SearchProvider):
+    """Organic results from one SerpAPI engine, e.g. google, bing or duckduckgo"""
+
+    def __init__(self, engine: str, client, fetcher: ResilientFetcher = None):
+        """
+        Args:
+            engine: SerpAPI engine name
+            client: AsyncSerpClient, shared with the rest of WebSearchTool
+            fetcher: Resilience policy; each engine has its own circuit breaker
+        """
+        self.name = engine
+        self.engine = engine
+        self.client = client
+        self.fetcher = fetcher or resilient_fetcher
+
+    def available(self) -> bool:
+        return not self.fetcher.breaker(self.engine).is_open()
+
+    async def search(self, query: str, num_results: int) -> List[Dict[str, Any]]:
+        params = {"q": query, "num": num_results, "engine": self.engine, **RECENCY_PARAMS.get(self.engine, {})}
+        with span("serpapi"):
+            results = await self.fetcher.call(
+                self.engine,
+                lambda timeout: self.client.get_dict(params, timeout=timeout)
+            )
+        return results.get("organic_results", [])[:num_results]
+
+
+class LocalSearchProvider(SearchProvider):
+    """
+    In-process stand-in for a search provider, for tests and offline benchmarks
+
+    Answers after a fixed or sampled delay with canned results, no results, or an error.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        latency: Union[float, Callable[[], float]] = 0.0,
+        results: Optional[Callable[[str, int], List[Dict[str, Any]]]] = None,
+        error: Optional[Exception] = None
+    ):
+        """
+        Args:
+            name: Provider name used in stats and metrics
+            latency: Seconds before answering, or a function returning them for each request
+            results: Function of (query, num_results) returning the results; defaults to generated ones
+            error: Raised instead of answering, after the delay
+        """
+        self.name = name
+        self.latency = latency
+        self.results = results or self._generated
+        self.error = error
+        self.calls = 0
+
+    def _generated(self, query: str, num_results: int) -> List[Dict[str, Any]]:
+        return [
+            {
+                "title": f"{query} result {i} from {self.name}",
+                "link": f"https://{self.name}.example.com/{zlib.crc32(query.encode())}/{i}",
+                "snippet": f"Snippet {i} about {query}.",
+                "displayed_link": f"{self.name}.example.com",
+                "date": "1 day ago",
+            }
+            for i in range(num_results)
+        ]
+
+    async def search(self, query: str, num_results: int) -> List[Dict[str, Any]]:
+        self.calls += 1
+        await asyncio.sleep(self.latency() if callable(self.latency) else self.latency)
+        if self.error is not None:
+            raise self.error
+        return self.results(query, num_results)
+
+
+class ProviderStats:
+    """Exponentially weighted latency, and empty and error rates, of one provider"""
+
+    def __init__(self, alpha: float = 0.2):
+        """
+        Args:
+            alpha: Weight of each new observation in the moving averages
+        """
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.empty_rate = 0.0
+        self.error_rate = 0.0
+        self.requests = 0
+        self.wins = 0
+        self.cancelled = 0
+
+    def _average(self, current: float, value: float) -> float:
+        return current + self.alpha * (value - current)
+
+    def record(self, outcome: str, seconds: float) -> None:
+        """A request finished with outcome "results", "empty" or "error" after seconds"""
+        self.requests += 1
+        self.latency = seconds if self.latency is None else self._average(self.latency, seconds)
+        self.empty_rate = self._average(self.empty_rate, 1.0 if outcome == "empty" else 0.0)
+        self.error_rate = self._average(self.error_rate, 1.0 if outcome == "error" else 0.0)
+
+    def record_cancelled(self, seconds: float) -> None:
+        """
+        A request was cancelled after seconds because another provider answered first
+
+        Its latency is only known to be above seconds, so the estimate is raised to
+        that if it was lower and left alone otherwise.
+        """
+        self.cancelled += 1
+        if self.latency is None or self.latency < seconds:
+            self.latency = seconds
+
+    def expected_seconds(self) -> float:
+        """Expected wait for usable results: latency inflated by how often the provider comes back empty or fails"""
+        useful = max(0.05, 1.0 - self.empty_rate - self.error_rate)
+        return (self.latency or 0.0) / useful
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "latency": self.latency,
+            "empty_rate": self.empty_rate,
+            "error_rate": self.error_rate,
+            "expected_seconds": self.expected_seconds(),
+            "requests": self.requests,
+            "wins": self.wins,
+            "cancelled": self.cancelled
+        }
+
+
+class SearchFederation:
+    """
+    Web search over several providers, routed by their observed latency and hit rate
+
+    Each query goes to the fanout providers with the lowest expected wait among
+    those whose circuits are closed; providers without any requests yet count
+    as fastest so they get measured. In "first" mode the first result set with
+    at least min_results results answers and the slower requests are
+    cancelled. When no provider is sufficient, whatever came back is merged.
+    In "merge" mode every selected provider is awaited and their results are
+    interleaved. Duplicate URLs are removed in both modes.
+    """
+
+    def __init__(
+        self,
+        providers: List[SearchProvider],
+        mode: str = "first",
+        fanout: int = 2,
+        min_results: int = 3,
+        stagger: float = 0.0,
+        explore_rate: float = 0.05,
+        rng: random.Random = None
+    ):
+        """
+        Args:
+            providers: Providers to choose from; at least one
+            mode: "first" to answer from the first sufficient result set, "merge" to combine all selected providers
+            fanout: Providers queried per search
+            min_results: Results a provider must return to answer on its own in "first" mode
+            stagger: In "first" mode, seconds to wait for a provider before also querying the next; 0 queries them together
+            explore_rate: Share of searches that also query one provider outside the fanout, to keep its stats current
+            rng: Random source for exploration
+        """
+        if not providers:
+            raise ValueError("SearchFederation needs at least one provider")
+        if mode not in ("first", "merge"):
+            raise ValueError(f"Unknown federation mode: {mode}")
+        self.providers = providers
+        self.mode = mode
+        self.fanout = max(1, fanout)
+        self.min_results = min_results
+        self.stagger = stagger
+        self.explore_rate = explore_rate
+        self.rng = rng or random.Random()
+        self._stats: Dict[str, ProviderStats] = {provider.name: ProviderStats() for provider in providers}
+
+        self.searches = 0
+        self.answered_first = 0
+        self.merged = 0
+        self.empty = 0
+
+    @property
+    def name(self) -> str:
+        """Provider names, for cache keys and logs"""
+        return "+".join(provider.name for provider in self.providers)
+
+    def rank(self) -> List[SearchProvider]:
+        """Available providers, lowest expected wait first; every provider if none is available"""
+        available = [provider for provider in self.providers if provider.available()] or self.providers
+        return sorted(available, key=lambda provider: self._stats[provider.name].expected_seconds())
+
+    def select(self) -> List[SearchProvider]:
+        """Providers to query for the next search, in the order they are tried"""
+        ranked = self.rank()
+        selected = ranked[:self.fanout]
+        if len(ranked) > self.fanout and self.rng.random() < self.explore_rate:
+            selected.append(self.rng.choice(ranked[self.fanout:]))
+        return selected
+
+    async def _query(self, provider: SearchProvider, query: str, num_results: int) -> List[Dict[str, Any]]:
+        """One provider's results, with its latency and outcome recorded"""
+        stats = self._stats[provider.name]
+        started = time.perf_counter()
+        try:
+            results = await provider.search(query, num_results)
+        except asyncio.CancelledError:
+            stats.record_cancelled(time.perf_counter() - started)
+            provider_requests_total.inc(provider=provider.name, outcome="cancelled")
+            raise
+        except Exception as e:
+            stats.record("error", time.perf_counter() - started)
+            provider_requests_total.inc(provider=provider.name, outcome="error")
+            logger.warning(f"Search provider {provider.name} failed for {query!r}: {e}")
+            raise
+        elapsed = time.perf_counter() - started
+        outcome = "results" if results else "empty"
+        stats.record(outcome, elapsed)
+        provider_requests_total.inc(provider=provider.name, outcome=outcome)
+        provider_seconds.observe(elapsed, provider=provider.name)
+        return results
+
+    def _merge(self, result_sets: List[List[Dict[str, Any]]], num_results: int) -> List[Dict[str, Any]]:
+        """Interleave result sets, best-ranked first, keeping the first occurrence of each URL"""
+        merged = []
+        seen_links = set()
+        for position in range(max((len(results) for results in result_sets), default=0)):
+            for results in result_sets:
+                if position < len(results) and results[position].get("link") not in seen_links:
+                    seen_links.add(results[position].get("link"))
+                    merged.append(results[position])
+        return merged[:num_results]
+
+    async def search(self, query: str, num_results: int = 5) -> Dict[str, Any]:
+        """
+        Search the selected providers
+
+        Args:
+            query: Search query
+            num_results: Number of results to return
+
+        Returns:
+            A SerpAPI-shaped response: organic_results, plus search_metadata naming
+            the providers queried and the ones whose results were used
+
+        Raises:
+            Exception: Every selected provider failed
+        """
+        self.searches += 1
+        selected = self.select()
+        together = self.mode == "merge" or self.stagger <= 0
+        pending: Dict[asyncio.Future, SearchProvider] = {}
+        launched = 0
+
+        def launch() -> None:
+            nonlocal launched
+            provider = selected[launched]
+            launched += 1
+            pending[asyncio.ensure_future(self._query(provider, query, num_results))] = provider
+
+        # Result sets by provider position in selected, so merging follows the ranking
+        collected: Dict[int, List[Dict[str, Any]]] = {}
+        errors: List[Exception] = []
+        winner: Optional[SearchProvider] = None
+        try:
+            launch()
+            while together and launched < len(selected):
+                launch()
+            while pending:
+                timeout = self.stagger if launched < len(selected) else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch()
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    results = task.result()
+                    collected[selected.index(provider)] = results
+                    if self.mode == "first" and winner is None and len(results) >= min(self.min_results, num_results):
+                        winner = provider
+                if winner is not None:
+                    break
+                # A provider failed or fell short; don't wait out the stagger for the next one
+                if not pending and launched < len(selected):
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        if winner is not None:
+            self._stats[winner.name].wins += 1
+            self.answered_first += 1
+            federated_searches_total.inc(outcome="first")
+            return {
+                "organic_results": self._merge([collected[selected.index(winner)]], num_results),
+                "search_metadata": {"providers": [p.name for p in selected], "answered_by": [winner.name]}
+            }
+
+        if not collected:
+            raise errors[0] if errors else RuntimeError(f"No search provider answered for {query!r}")
+
+        used = [selected[position] for position in sorted(collected) if collected[position]]
+        merged = self._merge([collected[position] for position in sorted(collected)], num_results)
+        if merged:
+            self.merged += 1
+            federated_searches_total.inc(outcome="merged")
+        else:
+            self.empty += 1
+            federated_searches_total.inc(outcome="empty")
+        for provider in used:
+            self._stats[provider.name].wins += 1
+        return {
+            "organic_results": merged,
+            "search_metadata": {"providers": [p.name for p in selected], "answered_by": [p.name for p in used]}
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Routing settings, per-provider estimates and how searches were answered"""
+        ranking = [provider.name for provider in self.rank()]
+        return {
+            "mode": self.mode,
+            "fanout": self.fanout,
+            "min_results": self.min_results,
+            "stagger": self.stagger,
+            "ranking": ranking,
+            "searches": self.searches,
+            "answered_first": self.answered_first,
+            "merged": self.merged,
+            "empty": self.empty,
+            "providers": {
+                provider.name: {"available": provider.available(), **self._stats[provider.name].snapshot()}
+                for provider in self.providers
+            }
+        }
+
+
+def create_search_federation(client, fetcher: ResilientFetcher = None) -> Optional[SearchFederation]:
+    """
+    Build the federation from SEARCH_PROVIDERS, a comma-separated list of SerpAPI engines
+
+    Returns:
+        None when fewer than two providers are configured, so web search calls Google directly
+    """
+    engines = [engine.strip() for engine in os.getenv("SEARCH_PROVIDERS", "google").split(",") if engine.strip()]
+    if len(engines) < 2:
+        return None
+    return SearchFederation(
+        [SerpApiProvider(engine, client, fetcher) for engine in engines],
+        mode=os.getenv("SEARCH_FEDERATION_MODE", "first").lower(),
+        fanout=int(os.getenv("SEARCH_FEDERATION_FANOUT", 2)),
+        min_results=int(os.getenv("SEARCH_FEDERATION_MIN_RESULTS", 3)),
+        stagger=float(os.getenv("SEARCH_FEDERATION_STAGGER", 0))
+    )
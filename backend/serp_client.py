@@ -0,0 +1,81 @@
+import os
+from typing import Dict, Any, Optional
+import httpx
+
+
+DEFAULT_BASE_URL = "https://serpapi.com"
+DEFAULT_TIMEOUT = 10.0
+
+# SerpAPI reports an empty result page through its "error" key; that is not a failure
+NO_RESULTS_ERROR = "hasn't returned any results"
+
+
+class SerpAPIError(Exception):
+    """Raised when SerpAPI returns an error payload or an unsuccessful status"""
+
+
+class AsyncSerpClient:
+    """Asyncio-native SerpAPI client backed by a pooled keep-alive HTTP connection"""
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+    ):
+        """
+        Args:
+            api_key: SerpAPI key sent with every request
+            base_url: SerpAPI root URL, overridable to point at a local fake server
+            timeout: Default per-request timeout in seconds
+            max_connections: Upper bound on concurrent connections in the pool
+            max_keepalive_connections: Idle connections kept open for reuse
+        """
+        self.api_key = api_key
+        self.base_url = (base_url or os.getenv("SERP_API_BASE_URL", DEFAULT_BASE_URL)).rstrip("/")
+        self.timeout = timeout if timeout is not None else float(os.getenv("SERP_API_TIMEOUT", DEFAULT_TIMEOUT))
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Create the pooled HTTP client on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=self._limits,
+                timeout=self.timeout,
+            )
+        return self._client
+
+    async def get_dict(self, params: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Run a SerpAPI search and return the decoded JSON response
+
+        Args:
+            params: SerpAPI query parameters (engine, q, tbs, ...), without the api key
+            timeout: Overrides the client's default timeout for this request only
+
+        Returns:
+            The SerpAPI response as a dictionary
+        """
+        request_params = {**params, "api_key": self.api_key, "output": "json"}
+        kwargs = {"timeout": timeout} if timeout is not None else {}
+
+        response = await self._get_client().get("/search.json", params=request_params, **kwargs)
+        response.raise_for_status()
+
+        results = response.json()
+        if results.get("error") and NO_RESULTS_ERROR not in results["error"]:
+            raise SerpAPIError(results["error"])
+        return results
+
+    async def aclose(self) -> None:
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,492 @@
+import asyncio
+import json
+import os
+import queue
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, List, Optional, Tuple
+from agents import Session, SQLiteSession
+
+
+# Table layout shared with the SDK's SQLiteSession so existing databases keep working
+SESSIONS_TABLE = "agent_sessions"
+MESSAGES_TABLE = "agent_messages"
+# Rolling history summaries written by CompactingSession
+SUMMARIES_TABLE = "conversation_summaries"
+
+SQLITE_SUMMARIES_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS {SUMMARIES_TABLE} (
+        session_id TEXT PRIMARY KEY,
+        summary TEXT NOT NULL,
+        folded_turns INTEGER NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+SQLITE_UPSERT_SUMMARY = f"""
+    INSERT INTO {SUMMARIES_TABLE} (session_id, summary, folded_turns) VALUES (?, ?, ?)
+    ON CONFLICT (session_id) DO UPDATE SET
+        summary = excluded.summary,
+        folded_turns = excluded.folded_turns,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+
+class SessionStore(ABC):
+    """Storage backend that hands out conversation sessions for ConversationManager"""
+
+    name = "base"
+
+    @abstractmethod
+    async def open_session(self, thread_id: str) -> Session:
+        """Return a session implementing the Agents SDK Session protocol for a thread"""
+
+    @abstractmethod
+    async def get_summary(self, thread_id: str) -> Optional[Tuple[str, int]]:
+        """Return a thread's rolling history summary and how many turns it covers"""
+
+    @abstractmethod
+    async def set_summary(self, thread_id: str, summary: str, folded_turns: int) -> None:
+        """Store a thread's rolling history summary"""
+
+    @abstractmethod
+    async def delete_summary(self, thread_id: str) -> None:
+        """Remove a thread's rolling history summary"""
+
+    async def close(self) -> None:
+        """Release any shared resources held by the store"""
+
+
+class SQLiteSessionStore(SessionStore):
+    """One SDK SQLiteSession per thread, each with its own connections"""
+
+    name = "sqlite"
+
+    def __init__(self, db_path: str = "conversations.db"):
+        self.db_path = db_path
+        self._summaries_ready = False
+
+    async def open_session(self, thread_id: str) -> Session:
+        # Session creation initializes the schema on disk, keep it off the event loop
+        return await asyncio.to_thread(SQLiteSession, session_id=thread_id, db_path=self.db_path)
+
+    async def _execute(self, sql: str, params: tuple) -> List[tuple]:
+        """Run a statement on a short-lived connection in a worker thread"""
+        def _run():
+            conn = sqlite3.connect(self.db_path)
+            try:
+                if not self._summaries_ready:
+                    conn.execute(SQLITE_SUMMARIES_SCHEMA)
+                    self._summaries_ready = True
+                rows = conn.execute(sql, params).fetchall()
+                conn.commit()
+                return rows
+            finally:
+                conn.close()
+        return await asyncio.to_thread(_run)
+
+    async def get_summary(self, thread_id: str) -> Optional[Tuple[str, int]]:
+        rows = await self._execute(
+            f"SELECT summary, folded_turns FROM {SUMMARIES_TABLE} WHERE session_id = ?", (thread_id,)
+        )
+        return rows[0] if rows else None
+
+    async def set_summary(self, thread_id: str, summary: str, folded_turns: int) -> None:
+        await self._execute(SQLITE_UPSERT_SUMMARY, (thread_id, summary, folded_turns))
+
+    async def delete_summary(self, thread_id: str) -> None:
+        await self._execute(f"DELETE FROM {SUMMARIES_TABLE} WHERE session_id = ?", (thread_id,))
+
+
+class PooledSQLiteSessionStore(SessionStore):
+    """
+    SQLite store with a shared connection pool and group-committed writes
+
+    All sessions share a fixed pool of reader connections, and writes from
+    every thread are funneled through one writer that commits whatever has
+    queued up in a single transaction. WAL with synchronous=NORMAL keeps
+    readers from blocking on the writer.
+    """
+
+    name = "pooled_sqlite"
+
+    def __init__(self, db_path: str = "conversations.db", pool_size: int = 4, max_batch: int = 256):
+        """
+        Args:
+            db_path: SQLite database file
+            pool_size: Number of pooled reader connections
+            max_batch: Maximum queued writes committed in one transaction
+        """
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.max_batch = max_batch
+        self._pid = os.getpid()
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._writer = self._connect()
+        self._writer_lock = threading.Lock()
+        self._pending: List[Tuple[str, List[Any], asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self._init_schema(self._writer)
+        for _ in range(pool_size):
+            self._readers.put(self._connect())
+
+    def _check_fork(self) -> None:
+        """Open fresh connections in a forked worker; SQLite connections must not cross a fork"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._writer = self._connect()
+        self._writer_lock = threading.Lock()
+        self._readers = queue.Queue()
+        for _ in range(self.pool_size):
+            self._readers.put(self._connect())
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute("PRAGMA cache_size=-16000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @staticmethod
+    def _init_schema(conn: sqlite3.Connection) -> None:
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {SESSIONS_TABLE} (
+                session_id TEXT PRIMARY KEY,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {MESSAGES_TABLE} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                message_data TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (session_id) REFERENCES {SESSIONS_TABLE} (session_id)
+                    ON DELETE CASCADE
+            )
+        """)
+        conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{MESSAGES_TABLE}_session_id
+            ON {MESSAGES_TABLE} (session_id, created_at)
+        """)
+        conn.execute(SQLITE_SUMMARIES_SCHEMA)
+        conn.commit()
+
+    async def open_session(self, thread_id: str) -> Session:
+        return PooledSQLiteSession(thread_id, self)
+
+    async def get_summary(self, thread_id: str) -> Optional[Tuple[str, int]]:
+        rows = await self.read(
+            f"SELECT summary, folded_turns FROM {SUMMARIES_TABLE} WHERE session_id = ?", (thread_id,)
+        )
+        return rows[0] if rows else None
+
+    async def set_summary(self, thread_id: str, summary: str, folded_turns: int) -> None:
+        await self.write(SQLITE_UPSERT_SUMMARY, (thread_id, summary, folded_turns))
+
+    async def delete_summary(self, thread_id: str) -> None:
+        await self.write(f"DELETE FROM {SUMMARIES_TABLE} WHERE session_id = ?", (thread_id,))
+
+    async def read(self, sql: str, params: tuple) -> List[tuple]:
+        """Run a query on a pooled reader connection"""
+        self._check_fork()
+        def _read():
+            conn = self._readers.get()
+            try:
+                return conn.execute(sql, params).fetchall()
+            finally:
+                self._readers.put(conn)
+        return await asyncio.to_thread(_read)
+
+    async def write(self, sql: str, params: tuple) -> List[tuple]:
+        """Run a statement on the writer connection in its own transaction"""
+        self._check_fork()
+        def _write():
+            with self._writer_lock:
+                rows = self._writer.execute(sql, params).fetchall()
+                self._writer.commit()
+                return rows
+        return await asyncio.to_thread(_write)
+
+    async def append(self, session_id: str, items: List[Any]) -> None:
+        """Queue items for the next group commit and wait until they are durable"""
+        self._check_fork()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((session_id, items, future))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush())
+        await future
+
+    async def _flush(self) -> None:
+        """Commit queued writes in batches until the queue drains"""
+        while self._pending:
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    def _write_batch(self, batch: List[Tuple[str, List[Any], asyncio.Future]]) -> None:
+        session_ids = [(session_id,) for session_id in {session_id for session_id, _, _ in batch}]
+        rows = [
+            (session_id, json.dumps(item))
+            for session_id, items, _ in batch
+            for item in items
+        ]
+        with self._writer_lock:
+            try:
+                self._writer.executemany(
+                    f"INSERT OR IGNORE INTO {SESSIONS_TABLE} (session_id) VALUES (?)", session_ids
+                )
+                self._writer.executemany(
+                    f"INSERT INTO {MESSAGES_TABLE} (session_id, message_data) VALUES (?, ?)", rows
+                )
+                self._writer.executemany(
+                    f"UPDATE {SESSIONS_TABLE} SET updated_at = CURRENT_TIMESTAMP WHERE session_id = ?",
+                    session_ids
+                )
+                self._writer.commit()
+            except Exception:
+                self._writer.rollback()
+                raise
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+        self._writer.close()
+
+
+class PooledSQLiteSession:
+    """Session backed by a PooledSQLiteSessionStore"""
+
+    def __init__(self, session_id: str, store: PooledSQLiteSessionStore):
+        self.session_id = session_id
+        self.store = store
+
+    async def get_items(self, limit: Optional[int] = None) -> List[Any]:
+        if limit is None:
+            rows = await self.store.read(
+                f"SELECT message_data FROM {MESSAGES_TABLE} WHERE session_id = ? ORDER BY id ASC",
+                (self.session_id,)
+            )
+        else:
+            rows = await self.store.read(
+                f"SELECT message_data FROM {MESSAGES_TABLE} WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (self.session_id, limit)
+            )
+            rows.reverse()
+        return _decode_rows(rows)
+
+    async def add_items(self, items: List[Any]) -> None:
+        if items:
+            await self.store.append(self.session_id, items)
+
+    async def pop_item(self) -> Optional[Any]:
+        rows = await self.store.write(
+            f"""
+            DELETE FROM {MESSAGES_TABLE}
+            WHERE id = (SELECT id FROM {MESSAGES_TABLE} WHERE session_id = ? ORDER BY id DESC LIMIT 1)
+            RETURNING message_data
+            """,
+            (self.session_id,)
+        )
+        items = _decode_rows(rows)
+        return items[0] if items else None
+
+    async def clear_session(self) -> None:
+        await self.store.write(f"DELETE FROM {MESSAGES_TABLE} WHERE session_id = ?", (self.session_id,))
+        await self.store.write(f"DELETE FROM {SESSIONS_TABLE} WHERE session_id = ?", (self.session_id,))
+
+
+class PostgresSessionStore(SessionStore):
+    """
+    Server database store so several workers or nodes can share history
+
+    Requires the optional asyncpg dependency (``poetry install -E postgres``).
+    """
+
+    name = "postgres"
+
+    def __init__(self, dsn: str, min_size: int = 2, max_size: int = 10):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+
+    async def pool(self):
+        """Create the connection pool and schema on first use"""
+        async with self._pool_lock:
+            if self._pool is None:
+                try:
+                    import asyncpg
+                except ImportError as e:
+                    raise RuntimeError(
+                        "The postgres conversation store requires asyncpg: poetry install -E postgres"
+                    ) from e
+                self._pool = await asyncpg.create_pool(self.dsn, min_size=self.min_size, max_size=self.max_size)
+                async with self._pool.acquire() as conn:
+                    await conn.execute(f"""
+                        CREATE TABLE IF NOT EXISTS {SESSIONS_TABLE} (
+                            session_id TEXT PRIMARY KEY,
+                            created_at TIMESTAMPTZ DEFAULT now(),
+                            updated_at TIMESTAMPTZ DEFAULT now()
+                        );
+                        CREATE TABLE IF NOT EXISTS {MESSAGES_TABLE} (
+                            id BIGSERIAL PRIMARY KEY,
+                            session_id TEXT NOT NULL REFERENCES {SESSIONS_TABLE} (session_id) ON DELETE CASCADE,
+                            message_data TEXT NOT NULL,
+                            created_at TIMESTAMPTZ DEFAULT now()
+                        );
+                        CREATE INDEX IF NOT EXISTS idx_{MESSAGES_TABLE}_session_id
+                            ON {MESSAGES_TABLE} (session_id, id);
+                        CREATE TABLE IF NOT EXISTS {SUMMARIES_TABLE} (
+                            session_id TEXT PRIMARY KEY,
+                            summary TEXT NOT NULL,
+                            folded_turns INTEGER NOT NULL,
+                            updated_at TIMESTAMPTZ DEFAULT now()
+                        );
+                    """)
+            return self._pool
+
+    async def open_session(self, thread_id: str) -> Session:
+        return PostgresSession(thread_id, self)
+
+    async def get_summary(self, thread_id: str) -> Optional[Tuple[str, int]]:
+        pool = await self.pool()
+        row = await pool.fetchrow(
+            f"SELECT summary, folded_turns FROM {SUMMARIES_TABLE} WHERE session_id = $1", thread_id
+        )
+        return tuple(row) if row else None
+
+    async def set_summary(self, thread_id: str, summary: str, folded_turns: int) -> None:
+        pool = await self.pool()
+        await pool.execute(
+            f"""
+            INSERT INTO {SUMMARIES_TABLE} (session_id, summary, folded_turns) VALUES ($1, $2, $3)
+            ON CONFLICT (session_id) DO UPDATE SET
+                summary = excluded.summary,
+                folded_turns = excluded.folded_turns,
+                updated_at = now()
+            """,
+            thread_id, summary, folded_turns
+        )
+
+    async def delete_summary(self, thread_id: str) -> None:
+        pool = await self.pool()
+        await pool.execute(f"DELETE FROM {SUMMARIES_TABLE} WHERE session_id = $1", thread_id)
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+class PostgresSession:
+    """Session backed by a PostgresSessionStore"""
+
+    def __init__(self, session_id: str, store: PostgresSessionStore):
+        self.session_id = session_id
+        self.store = store
+
+    async def get_items(self, limit: Optional[int] = None) -> List[Any]:
+        pool = await self.store.pool()
+        if limit is None:
+            rows = await pool.fetch(
+                f"SELECT message_data FROM {MESSAGES_TABLE} WHERE session_id = $1 ORDER BY id ASC",
+                self.session_id
+            )
+        else:
+            rows = await pool.fetch(
+                f"SELECT message_data FROM {MESSAGES_TABLE} WHERE session_id = $1 ORDER BY id DESC LIMIT $2",
+                self.session_id, limit
+            )
+            rows = list(reversed(rows))
+        return _decode_rows([tuple(row) for row in rows])
+
+    async def add_items(self, items: List[Any]) -> None:
+        if not items:
+            return
+        pool = await self.store.pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    f"""
+                    INSERT INTO {SESSIONS_TABLE} (session_id) VALUES ($1)
+                    ON CONFLICT (session_id) DO UPDATE SET updated_at = now()
+                    """,
+                    self.session_id
+                )
+                await conn.executemany(
+                    f"INSERT INTO {MESSAGES_TABLE} (session_id, message_data) VALUES ($1, $2)",
+                    [(self.session_id, json.dumps(item)) for item in items]
+                )
+
+    async def pop_item(self) -> Optional[Any]:
+        pool = await self.store.pool()
+        rows = await pool.fetch(
+            f"""
+            DELETE FROM {MESSAGES_TABLE}
+            WHERE id = (SELECT id FROM {MESSAGES_TABLE} WHERE session_id = $1 ORDER BY id DESC LIMIT 1)
+            RETURNING message_data
+            """,
+            self.session_id
+        )
+        items = _decode_rows([tuple(row) for row in rows])
+        return items[0] if items else None
+
+    async def clear_session(self) -> None:
+        pool = await self.store.pool()
+        await pool.execute(f"DELETE FROM {SESSIONS_TABLE} WHERE session_id = $1", self.session_id)
+
+
+def _decode_rows(rows: List[tuple]) -> List[Any]:
+    """Decode stored message rows, skipping corrupted entries"""
+    items = []
+    for (message_data,) in rows:
+        try:
+            items.append(json.loads(message_data))
+        except json.JSONDecodeError:
+            continue
+    return items
+
+
+def create_session_store(backend: str = None, db_path: str = "conversations.db") -> SessionStore:
+    """
+    Build the session store selected by CONVERSATION_STORE
+
+    Args:
+        backend: "sqlite" (default), "pooled_sqlite" or "postgres"
+        db_path: SQLite database file for the SQLite-based stores
+
+    Returns:
+        The configured SessionStore
+    """
+    backend = backend or os.getenv("CONVERSATION_STORE", "sqlite")
+    if backend == "sqlite":
+        return SQLiteSessionStore(db_path)
+    if backend == "pooled_sqlite":
+        return PooledSQLiteSessionStore(
+            db_path,
+            pool_size=int(os.getenv("CONVERSATION_STORE_POOL_SIZE", 4))
+        )
+    if backend == "postgres":
+        dsn = os.getenv("DATABASE_URL")
+        if not dsn:
+            raise ValueError("DATABASE_URL environment variable is required for the postgres conversation store")
+        return PostgresSessionStore(dsn, max_size=int(os.getenv("CONVERSATION_STORE_POOL_SIZE", 10)))
+    raise ValueError(f"Unknown conversation store backend: {backend}")
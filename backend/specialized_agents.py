@@ -1,42 +1,78 @@
 from agents import function_tool
-from dotenv import load_dotenv
-import os
-from tools import execute_sports_search, execute_finance_search
+import uuid
+from typing import Any, AsyncIterator, Dict, List
+from tools import execute_sports_search_async, execute_finance_search_async, execute_batch_search_async, search_tool_error, SEARCH_RESULTS_GUIDE
 import logging
-from models import PerplexityResponse
-from base_agent import BaseAgent
+from models import AgentAnswer, PerplexityResponse
+from base_agent import BaseAgent, build_instructions
+from agent_registry import agent_registry
+from summary_cache import summary_scheduler
+from conversation_storage import conversation_manager
+from quotes import quote_service
+from scoreboard import execute_live_scores_async, scoreboard_poller
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
-load_dotenv()
 
 # Sports Agent Tools
-@function_tool
-def sports_search(query: str = "latest sports news") -> str:
+@function_tool(failure_error_function=search_tool_error)
+async def sports_search(query: str = "latest sports news") -> str:
     """Search for sports information, scores, schedules, and news"""
     # Add subtle current context to search queries (less aggressive)
     enhanced_query = f"{query} recent latest"
-    return execute_sports_search(enhanced_query)
+    return await execute_sports_search_async(enhanced_query)
+
+@function_tool(failure_error_function=search_tool_error)
+async def sports_search_batch(queries: List[str]) -> str:
+    """Search sports information for several teams, players or leagues at once and get merged results"""
+    enhanced_queries = [f"{query} recent latest" for query in queries]
+    return await execute_batch_search_async(enhanced_queries, "sports")
+
+@function_tool(failure_error_function=search_tool_error)
+async def live_scores(team_or_league: str) -> str:
+    """Current scores, results and upcoming games for a tracked team or league, read from the live scoreboard without a web search"""
+    return await execute_live_scores_async(team_or_league)
 
 # Finance Agent Tools
-@function_tool
-def finance_search(query: str = "market news") -> str:
+@function_tool(failure_error_function=search_tool_error)
+async def finance_search(query: str = "market news") -> str:
     """Search for financial information, stock prices, market news, and economic data"""
     # Add subtle current context to search queries (less aggressive)  
     enhanced_query = f"{query} recent latest"
-    return execute_finance_search(enhanced_query)
+    return await execute_finance_search_async(enhanced_query)
+
+@function_tool(failure_error_function=search_tool_error)
+async def finance_search_batch(queries: List[str]) -> str:
+    """Search financial information for several tickers, companies or markets at once and get merged results"""
+    enhanced_queries = [f"{query} recent latest" for query in queries]
+    return await execute_batch_search_async(enhanced_queries, "finance")
 
 
 class SportsAgent(BaseAgent):
     """Specialized agent for sports queries and information"""
+    
+    agent_type = "sports"
+    summary_prompt = "Give me a comprehensive overview of today's top sports stories, including recent major league games, current scores, and trending sports news."
         
     def create_agent(self):
         """Create the sports specialist agent"""
         if not self.agent:
             from agents import Agent
+            # The scoreboard tool is only offered when the poller tracks something; it and its
+            # guide go last so the rest of the prompt prefix is the same either way
+            tools = [sports_search, sports_search_batch]
+            live_scores_guide = ""
+            if scoreboard_poller.targets:
+                tools.append(live_scores)
+                live_scores_guide = (
+                    f"For scores, results and upcoming games involving {', '.join(scoreboard_poller.targets)}, "
+                    "call live_scores first: it reads a continuously updated scoreboard and needs no web search. "
+                    "Use sports_search when it returns no results and for news, standings or statistics."
+                )
             self.agent = Agent(
                 name="Sports Specialist",
-                instructions="""You are a sports specialist AI assistant, similar to Perplexity AI but focused on sports.
+                instructions=build_instructions(
+                    """You are a sports specialist AI assistant, similar to Perplexity AI but focused on sports.
                 
                 You excel at providing comprehensive sports information including:
                 - Live scores and current game results
@@ -47,7 +83,9 @@ class SportsAgent(BaseAgent):
                 - Recent trades, transfers, and roster changes
                 
                 When users ask sports-related questions, use the sports_search tool to find current 
-                information and provide detailed, engaging responses. Always focus on:
+                information and provide detailed, engaging responses. When a question covers several 
+                teams, players or leagues, use sports_search_batch with one query per entity in a 
+                single call instead of calling sports_search repeatedly. Always focus on:
                 
                 1. Current scores, standings, and live game information
                 2. Recent sports news and developments
@@ -62,20 +100,58 @@ class SportsAgent(BaseAgent):
                 - Provide the most up-to-date information available
                 
                 Structure your responses to be informative yet easy to follow, highlighting key 
-                statistics and providing context for casual and serious sports fans alike.""",
-                tools=[sports_search],
+                statistics and providing context for casual and serious sports fans alike.
+                """,
+                    SEARCH_RESULTS_GUIDE,
+                    live_scores_guide
+                ),
+                tools=tools,
                 model="gpt-4o-mini",
-                output_type=PerplexityResponse
+                output_type=AgentAnswer,
+                model_settings=self.model_settings()
             )
         return self.agent
 
-    async def get_initial_summary(self):
-        """Get an initial sports summary for the landing page"""
-        return await self.chat("Give me a comprehensive overview of today's top sports stories, including recent major league games, current scores, and trending sports news.")
-
 
 class FinanceAgent(BaseAgent):
     """Specialized agent for finance and market queries"""
+    
+    agent_type = "finance"
+    summary_prompt = "Give me a comprehensive overview of today's financial markets, including current major stock indices, recent trending stocks, latest economic news, and current market analysis."
+    
+    async def _record_quote_answer(self, message: str, thread_id: str, response: PerplexityResponse) -> None:
+        """Add a fast-path answer to the thread's history so follow-up questions keep the context"""
+        session = await conversation_manager.get_session(thread_id)
+        seed_items = await summary_scheduler.claim_seed(thread_id)
+        await session.add_items((seed_items or []) + [
+            {"role": "user", "content": message},
+            {"role": "assistant", "content": response.model_dump_json()}
+        ])
+    
+    async def chat(self, message: str, thread_id: str = None):
+        """Answer plain ticker quote lookups directly from google_finance; anything else runs the agent"""
+        response = await quote_service.answer(message)
+        if response is None:
+            return await super().chat(message, thread_id)
+        
+        thread_id = thread_id or str(uuid.uuid4())
+        await self._record_quote_answer(message, thread_id, response)
+        return {"response": response, "thread_id": thread_id, "cache": "bypass", "fast_path": "quote"}
+    
+    async def chat_stream(self, message: str, thread_id: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of chat; a quote answer arrives as a single token"""
+        response = await quote_service.answer(message)
+        if response is None:
+            async for event in super().chat_stream(message, thread_id):
+                yield event
+            return
+        
+        thread_id = thread_id or str(uuid.uuid4())
+        yield {"event": "start", "data": {"thread_id": thread_id}}
+        await self._record_quote_answer(message, thread_id, response)
+        yield {"event": "sources", "data": {"sources": [source.model_dump() for source in response.explore_more]}}
+        yield {"event": "token", "data": {"text": response.summary}}
+        yield {"event": "done", "data": {"response": response.model_dump(), "thread_id": thread_id}}
         
     def create_agent(self):
         """Create the finance specialist agent"""
@@ -83,7 +159,8 @@ class FinanceAgent(BaseAgent):
             from agents import Agent
             self.agent = Agent(
                 name="Finance Specialist",
-                instructions="""You are a finance specialist AI assistant, similar to Perplexity AI but focused on financial markets and economics.
+                instructions=build_instructions(
+                    """You are a finance specialist AI assistant, similar to Perplexity AI but focused on financial markets and economics.
                 
                 You excel at providing comprehensive financial information including:
                 - Current stock prices, market indices, and trading data
@@ -94,7 +171,9 @@ class FinanceAgent(BaseAgent):
                 - Current investment insights and market commentary
                 
                 When users ask finance-related questions, use the finance_search tool to find current 
-                market data and provide detailed, professional responses. Always focus on:
+                market data and provide detailed, professional responses. When a question covers several 
+                tickers, companies or markets, use finance_search_batch with one query per entity in a 
+                single call instead of calling finance_search repeatedly. Always focus on:
                 
                 1. Current market conditions and stock prices
                 2. Recent economic news and financial developments
@@ -112,18 +191,24 @@ class FinanceAgent(BaseAgent):
                 
                 Structure your responses to be informative and professional, suitable for both 
                 casual investors and finance professionals. Always include relevant current financial 
-                metrics and provide context for recent market movements.""",
-                tools=[finance_search],
+                metrics and provide context for recent market movements.
+                """,
+                    SEARCH_RESULTS_GUIDE
+                ),
+                tools=[finance_search, finance_search_batch],
                 model="gpt-4o-mini",
-                output_type=PerplexityResponse
+                output_type=AgentAnswer,
+                model_settings=self.model_settings()
             )
         return self.agent
 
-    async def get_initial_summary(self):
-        """Get an initial finance summary for the landing page"""
-        return await self.chat("Give me a comprehensive overview of today's financial markets, including current major stock indices, recent trending stocks, latest economic news, and current market analysis.")
-
 
 # Create global instances
 sports_agent = SportsAgent()
-finance_agent = FinanceAgent() 
\ No newline at end of file
+finance_agent = FinanceAgent()
+agent_registry.register(sports_agent)
+agent_registry.register(finance_agent)
+
+# Landing page summaries are precomputed in the background and shared by all visitors
+summary_scheduler.register("sports", sports_agent)
+summary_scheduler.register("finance", finance_agent) 
\ No newline at end of file
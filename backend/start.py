@@ -1,7 +1,11 @@
  #!/usr/bin/env python3
 """
 Startup script for the Perplexity AI Clone
+
+Runs one uvicorn worker per CPU when STATE_BACKEND is shared, otherwise one
+worker; pass --reload for a single auto-reloading development server.
 """
+import argparse
 import uvicorn
 import os
 from dotenv import load_dotenv
@@ -28,18 +32,53 @@ def check_environment():
     print("All required environment variables are set!")
     return True
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the Perplexity AI Clone API server")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument(
+        "--workers", type=int, default=int(os.environ["WEB_CONCURRENCY"]) if os.getenv("WEB_CONCURRENCY") else None,
+        help="Worker processes (default: WEB_CONCURRENCY, else the CPU count with STATE_BACKEND=redis and 1 without)"
+    )
+    parser.add_argument(
+        "--reload", action="store_true",
+        help="Development mode: one worker, restarted when the code changes"
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=float, default=float(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", 30)),
+        help="Seconds a stopping worker waits for in-flight requests"
+    )
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     print("Starting Perplexity AI Clone...")
     
     if not check_environment():
         return
     
-    print("Starting FastAPI server...")
+    # Job records live in the state backend; with per-process memory a poll reaching
+    # another worker than the one that queued the job would get a 404
+    shared_state = os.getenv("STATE_BACKEND", "memory").lower() != "memory"
+    if args.reload:
+        workers = 1
+    elif args.workers is None:
+        workers = (os.cpu_count() or 1) if shared_state else 1
+    else:
+        workers = args.workers
+    if workers > 1 and not shared_state:
+        print("Running more than one worker needs STATE_BACKEND=redis: with per-worker memory,")
+        print("background jobs and cached state are only visible to the worker that created them.")
+        return
+    
+    print(f"Starting FastAPI server with {workers} worker(s)...")
     uvicorn.run(
         "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
+        host=args.host,
+        port=args.port,
+        reload=args.reload,
+        workers=None if args.reload else workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
         log_level="info"
     )
 
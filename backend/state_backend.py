@@ -0,0 +1,251 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class StateBackend(ABC):
+    """
+    Key-value, lease and invalidation primitives for state that caches hold
+
+    Values must be JSON-serializable so every backend can store them. The
+    in-process backend is the single-worker default; a shared backend lets
+    several workers see one copy of the search and summary caches and tell
+    each other when a cached item must be dropped.
+    """
+
+    name = "base"
+    # Whether other processes see what this backend stores
+    shared = False
+
+    @abstractmethod
+    async def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Return a stored value, or None if it is missing or expired"""
+
+    @abstractmethod
+    async def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, expiring after ttl seconds if given"""
+
+    @abstractmethod
+    async def pop(self, namespace: str, key: str) -> Optional[Any]:
+        """Remove and return a value; only one caller across all workers gets it"""
+
+    @abstractmethod
+    async def delete(self, namespace: str, key: str) -> None:
+        """Remove a value"""
+
+    @abstractmethod
+    async def acquire(self, name: str, ttl: float) -> bool:
+        """Take a named lease for ttl seconds; False if another holder has it"""
+
+    @abstractmethod
+    async def release(self, name: str) -> None:
+        """Give up a lease taken by this process"""
+
+    @abstractmethod
+    async def publish(self, channel: str, message: str) -> None:
+        """Send an invalidation message to the subscribers of every worker, this one included"""
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]) -> None:
+        """Call callback(message) for every message published on channel"""
+        self._subscribers.setdefault(channel, []).append(callback)
+
+    def _dispatch(self, channel: str, message: str) -> None:
+        for callback in self._subscribers.get(channel, []):
+            try:
+                callback(message)
+            except Exception as e:
+                logger.error(f"Error handling {channel} message: {e}")
+
+    async def start(self) -> None:
+        """Start delivering published messages to subscribers"""
+
+    async def close(self) -> None:
+        """Release connections and background tasks"""
+
+
+class InProcessStateBackend(StateBackend):
+    """Dictionaries in this process; state is per worker and messages never leave it"""
+
+    name = "memory"
+    shared = False
+
+    def __init__(self, max_entries: int = 10000):
+        """
+        Args:
+            max_entries: Values kept per namespace before the least recently stored are dropped
+        """
+        self.max_entries = max_entries
+        # namespace -> key -> (expires at, value), oldest first
+        self._values: Dict[str, "OrderedDict[str, Tuple[Optional[float], Any]]"] = {}
+        self._leases: Dict[str, float] = {}
+        self._subscribers: Dict[str, List[Callable[[str], None]]] = {}
+
+    async def get(self, namespace: str, key: str) -> Optional[Any]:
+        values = self._values.get(namespace)
+        entry = values.get(key) if values else None
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del values[key]
+            return None
+        return value
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        values = self._values.setdefault(namespace, OrderedDict())
+        values[key] = (time.monotonic() + ttl if ttl else None, value)
+        values.move_to_end(key)
+        while len(values) > self.max_entries:
+            values.popitem(last=False)
+
+    async def pop(self, namespace: str, key: str) -> Optional[Any]:
+        value = await self.get(namespace, key)
+        if value is not None:
+            del self._values[namespace][key]
+        return value
+
+    async def delete(self, namespace: str, key: str) -> None:
+        self._values.get(namespace, {}).pop(key, None)
+
+    async def acquire(self, name: str, ttl: float) -> bool:
+        now = time.monotonic()
+        if self._leases.get(name, 0) > now:
+            return False
+        self._leases[name] = now + ttl
+        return True
+
+    async def release(self, name: str) -> None:
+        self._leases.pop(name, None)
+
+    async def publish(self, channel: str, message: str) -> None:
+        self._dispatch(channel, message)
+
+
+class RedisStateBackend(StateBackend):
+    """
+    Redis-backed state shared by every worker and node pointing at the same server
+
+    Requires the optional redis dependency (``poetry install -E redis``).
+    """
+
+    name = "redis"
+    shared = True
+
+    # Delete a lease only if this process still holds it
+    RELEASE_SCRIPT = """
+        if redis.call("get", KEYS[1]) == ARGV[1] then
+            return redis.call("del", KEYS[1])
+        end
+        return 0
+    """
+
+    def __init__(self, url: str, prefix: str = "perplex"):
+        """
+        Args:
+            url: Redis URL, e.g. redis://localhost:6379/0
+            prefix: Prefix for every key and channel, so several deployments can share a server
+        """
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("The redis state backend requires redis: poetry install -E redis") from e
+
+        self.url = url
+        self.prefix = prefix
+        self._redis = redis.from_url(url)
+        # Identifies this process as a lease holder
+        self._owner = str(uuid.uuid4())
+        self._subscribers: Dict[str, List[Callable[[str], None]]] = {}
+        self._listener: Optional[asyncio.Task] = None
+        self._pubsub = None
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}:{namespace}:{key}"
+
+    def _channel(self, channel: str) -> str:
+        return f"{self.prefix}:channel:{channel}"
+
+    async def get(self, namespace: str, key: str) -> Optional[Any]:
+        raw = await self._redis.get(self._key(namespace, key))
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self._redis.set(
+            self._key(namespace, key), json.dumps(value), px=int(ttl * 1000) if ttl else None
+        )
+
+    async def pop(self, namespace: str, key: str) -> Optional[Any]:
+        raw = await self._redis.getdel(self._key(namespace, key))
+        return json.loads(raw) if raw is not None else None
+
+    async def delete(self, namespace: str, key: str) -> None:
+        await self._redis.delete(self._key(namespace, key))
+
+    async def acquire(self, name: str, ttl: float) -> bool:
+        return bool(await self._redis.set(self._key("lease", name), self._owner, nx=True, px=int(ttl * 1000)))
+
+    async def release(self, name: str) -> None:
+        await self._redis.eval(self.RELEASE_SCRIPT, 1, self._key("lease", name), self._owner)
+
+    async def publish(self, channel: str, message: str) -> None:
+        await self._redis.publish(self._channel(channel), message)
+
+    async def start(self) -> None:
+        if self._listener is None and self._subscribers:
+            self._pubsub = self._redis.pubsub()
+            await self._pubsub.subscribe(*(self._channel(channel) for channel in self._subscribers))
+            self._listener = asyncio.ensure_future(self._listen())
+
+    async def _listen(self) -> None:
+        """Deliver published messages to this worker's subscribers"""
+        prefix = self._channel("")
+        async for message in self._pubsub.listen():
+            if message["type"] != "message":
+                continue
+            channel = message["channel"].decode()[len(prefix):]
+            data = message["data"]
+            self._dispatch(channel, data.decode() if isinstance(data, bytes) else data)
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        await self._redis.aclose()
+
+
+def create_state_backend(backend: str = None) -> StateBackend:
+    """
+    Build the state backend selected by STATE_BACKEND
+
+    Args:
+        backend: "memory" or "redis"; defaults to the STATE_BACKEND environment variable
+
+    Returns:
+        A StateBackend instance
+    """
+    backend = (backend or os.getenv("STATE_BACKEND", "memory")).lower()
+    if backend == "memory":
+        return InProcessStateBackend()
+    if backend == "redis":
+        url = os.getenv("REDIS_URL")
+        if not url:
+            raise ValueError("REDIS_URL must be set when STATE_BACKEND=redis")
+        return RedisStateBackend(url)
+    raise ValueError(f"Unknown state backend: {backend}")
+
+
+# Global state backend instance
+state_backend = create_state_backend()
@@ -0,0 +1,86 @@
+import json
+from typing import Dict, Any
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class SummaryTokenExtractor:
+    """
+    Incrementally extracts the "summary" string from streamed structured-output JSON
+
+    The agents emit an AgentAnswer as JSON text deltas. This pulls the
+    decoded summary characters out as they arrive so they can be forwarded as
+    tokens before the full object (and its citations list) is complete.
+    """
+
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self, field: str = "summary"):
+        self._key = f'"{field}"'
+        self._buffer = ""
+        self._pos = 0
+        self._in_value = False
+        self._done = False
+
+    def feed(self, delta: str) -> str:
+        """
+        Consume a JSON text delta
+
+        Args:
+            delta: Next chunk of the model's JSON output
+
+        Returns:
+            Newly decoded summary text, possibly empty
+        """
+        if self._done:
+            return ""
+        self._buffer += delta
+
+        if not self._in_value and not self._find_value_start():
+            return ""
+
+        out = []
+        buffer = self._buffer
+        while self._pos < len(buffer):
+            char = buffer[self._pos]
+            if char == '"':
+                self._done = True
+                break
+            if char != "\\":
+                out.append(char)
+                self._pos += 1
+                continue
+
+            # Escape sequence; wait for more input if it is split across deltas
+            if self._pos + 1 >= len(buffer):
+                break
+            code = buffer[self._pos + 1]
+            if code == "u":
+                if self._pos + 6 > len(buffer):
+                    break
+                out.append(chr(int(buffer[self._pos + 2:self._pos + 6], 16)))
+                self._pos += 6
+            else:
+                out.append(self._ESCAPES.get(code, code))
+                self._pos += 2
+
+        return "".join(out)
+
+    def _find_value_start(self) -> bool:
+        """Advance past `"summary": "` once it is fully buffered"""
+        key_at = self._buffer.find(self._key)
+        if key_at == -1:
+            return False
+
+        pos = key_at + len(self._key)
+        while pos < len(self._buffer) and self._buffer[pos] in " \t\r\n:":
+            pos += 1
+        if pos >= len(self._buffer) or self._buffer[pos] != '"':
+            return False
+
+        self._pos = pos + 1
+        self._in_value = True
+        return True
@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Dict, Any, List, Optional
+from models import PerplexityResponse
+from state_backend import StateBackend, InProcessStateBackend, state_backend
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class SummaryEntry:
+    """A generated landing page summary and when it was produced"""
+
+    def __init__(self, response: PerplexityResponse, prompt: str, generated_at: float = None):
+        self.response = response
+        self.prompt = prompt
+        self.generated_at = generated_at or time.time()
+        self._serialized = None
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.generated_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form for the state backend, built once per entry"""
+        if self._serialized is None:
+            self._serialized = {
+                "response": self.response.model_dump(),
+                "prompt": self.prompt,
+                "generated_at": self.generated_at
+            }
+        return self._serialized
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SummaryEntry":
+        return cls(PerplexityResponse(**data["response"]), data["prompt"], data["generated_at"])
+
+
+class SummaryScheduler:
+    """
+    Regenerates each domain's landing summary in the background and serves it from memory
+
+    With a shared state backend, workers publish each new summary there and
+    take a lease before regenerating, so only one of them runs the agent per
+    refresh interval while the others adopt its result.
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = 900,
+        backend: StateBackend = None,
+        seed_ttl: float = 86400,
+        lease_ttl: float = 300
+    ):
+        """
+        Args:
+            refresh_interval: Seconds between background regenerations of each summary
+            backend: Where summaries and handed-out thread seeds are kept; defaults to this process
+            seed_ttl: Seconds a handed-out thread id stays eligible for history seeding
+            lease_ttl: Upper bound on one regeneration, after which another worker may take over
+        """
+        self.refresh_interval = refresh_interval
+        self.backend = backend or InProcessStateBackend()
+        self.seed_ttl = seed_ttl
+        self.lease_ttl = lease_ttl
+        self._agents: Dict[str, Any] = {}
+        self._entries: Dict[str, SummaryEntry] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._loops: Dict[str, asyncio.Task] = {}
+
+        self.refreshes = 0
+        self.adopted = 0
+        self.refresh_failures = 0
+        self.served = 0
+
+    def register(self, domain: str, agent) -> None:
+        """Register an agent whose summary_prompt produces the summary for a domain"""
+        self._agents[domain] = agent
+
+    def refresh(self, domain: str) -> asyncio.Task:
+        """Start regenerating a domain's summary, or join the regeneration already running"""
+        task = self._refreshing.get(domain)
+        if task is None:
+            task = asyncio.ensure_future(self._regenerate(domain))
+            self._refreshing[domain] = task
+            task.add_done_callback(lambda t: self._on_refresh_done(domain, t))
+        return task
+
+    def _on_refresh_done(self, domain: str, task: asyncio.Task) -> None:
+        """Release the refresh slot; failures are already logged by _regenerate"""
+        self._refreshing.pop(domain, None)
+        if not task.cancelled():
+            task.exception()
+
+    async def _regenerate(self, domain: str) -> SummaryEntry:
+        """Run the domain agent once without a session and store the result"""
+        shared = self.backend.shared
+        if shared:
+            # Another worker may already have produced a fresh summary, or be producing one
+            entry = await self._adopt_shared(domain)
+            if entry is not None and entry.age < self.refresh_interval:
+                return entry
+            if not await self.backend.acquire(f"summary:{domain}", self.lease_ttl):
+                return await self._wait_for_shared(domain)
+
+        agent = self._agents[domain]
+        started = time.perf_counter()
+        try:
+            response = await agent.run_once(agent.summary_prompt)
+        except Exception as e:
+            self.refresh_failures += 1
+            logger.error(f"Error regenerating {domain} summary: {e}")
+            raise
+        finally:
+            if shared:
+                await self.backend.release(f"summary:{domain}")
+
+        entry = SummaryEntry(response, agent.summary_prompt)
+        self._entries[domain] = entry
+        if shared:
+            await self.backend.set("summary", domain, entry.to_dict())
+        self.refreshes += 1
+        logger.info(f"Regenerated {domain} summary in {time.perf_counter() - started:.2f}s")
+        return entry
+
+    async def _adopt_shared(self, domain: str) -> Optional[SummaryEntry]:
+        """Replace the local summary with the shared one if another worker produced a newer one"""
+        data = await self.backend.get("summary", domain)
+        local = self._entries.get(domain)
+        if data is not None and (local is None or data["generated_at"] > local.generated_at):
+            local = self._entries[domain] = SummaryEntry.from_dict(data)
+            self.adopted += 1
+        return local
+
+    async def _wait_for_shared(self, domain: str) -> SummaryEntry:
+        """Wait for the worker holding the lease to publish a fresh summary"""
+        deadline = time.monotonic() + self.lease_ttl
+        while time.monotonic() < deadline:
+            await asyncio.sleep(1)
+            entry = await self._adopt_shared(domain)
+            if entry is not None and entry.age < self.refresh_interval:
+                return entry
+        entry = self._entries.get(domain)
+        if entry is None:
+            raise TimeoutError(f"Timed out waiting for another worker to generate the {domain} summary")
+        return entry
+
+    async def get_summary(self, domain: str) -> Dict[str, Any]:
+        """
+        Return the cached summary for a domain, stale-while-revalidate
+
+        A summary older than the refresh interval is still served while a
+        regeneration runs in the background. Only the very first request for a
+        domain waits for generation.
+
+        Args:
+            domain: Registered domain name, e.g. "sports"
+
+        Returns:
+            Dictionary with the response, a fresh thread_id and the summary age in seconds
+        """
+        if domain not in self._agents:
+            raise KeyError(f"No summary agent registered for domain '{domain}'")
+
+        entry = self._entries.get(domain)
+        if entry is None and self.backend.shared:
+            entry = await self._adopt_shared(domain)
+        if entry is None:
+            entry = await asyncio.shield(self.refresh(domain))
+        elif entry.age > self.refresh_interval:
+            self.refresh(domain)
+
+        self.served += 1
+        return {
+            "response": entry.response,
+            "thread_id": await self._issue_thread(entry),
+            "age": entry.age
+        }
+
+    async def _issue_thread(self, entry: SummaryEntry) -> str:
+        """Hand out a new thread id that will be seeded with the summary if the visitor replies"""
+        thread_id = str(uuid.uuid4())
+        await self.backend.set("summary_seed", thread_id, entry.to_dict(), self.seed_ttl)
+        return thread_id
+
+    async def claim_seed(self, thread_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Return the history items to seed a summary thread with, at most once per thread"""
+        data = await self.backend.pop("summary_seed", thread_id)
+        if data is None:
+            return None
+        return [
+            {"role": "user", "content": data["prompt"]},
+            {"role": "assistant", "content": PerplexityResponse(**data["response"]).model_dump_json()}
+        ]
+
+    async def _refresh_loop(self, domain: str) -> None:
+        """Regenerate a domain's summary every refresh interval"""
+        while True:
+            try:
+                await self.refresh(domain)
+            except Exception:
+                # Keep serving the previous summary; the next tick retries
+                pass
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        """Start a background refresh loop for every registered domain"""
+        for domain in self._agents:
+            if domain not in self._loops:
+                self._loops[domain] = asyncio.ensure_future(self._refresh_loop(domain))
+
+    async def stop(self) -> None:
+        """Cancel background refresh loops and any regeneration in flight"""
+        tasks = list(self._loops.values()) + list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loops.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Summary freshness and refresh counters for monitoring"""
+        return {
+            "backend": self.backend.name,
+            "refresh_interval": self.refresh_interval,
+            "domains": {
+                domain: {
+                    "age": self._entries[domain].age if domain in self._entries else None,
+                    "refreshing": domain in self._refreshing
+                }
+                for domain in self._agents
+            },
+            "refreshes": self.refreshes,
+            "adopted": self.adopted,
+            "refresh_failures": self.refresh_failures,
+            "served": self.served
+        }
+
+
+# Global summary scheduler instance
+summary_scheduler = SummaryScheduler(
+    refresh_interval=float(os.getenv("SUMMARY_REFRESH_INTERVAL", 900)),
+    backend=state_backend
+)
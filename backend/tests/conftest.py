@@ -0,0 +1,58 @@
+import zlib
+from typing import Any, Dict, List, Optional
+import pytest
+from resilience import ResilientFetcher, RetryPolicy
+from result_index import ResultIndex
+from search_cache import SearchCache
+from tools import WebSearchTool, set_web_search_tool
+
+
+class StubSerpClient:
+    """Answers SerpAPI requests with canned payloads and records them"""
+
+    def __init__(self, organic: Optional[List[Dict[str, Any]]] = None):
+        """
+        Args:
+            organic: Organic results for every google request; generated from the query if not given
+        """
+        self.organic = organic
+        self.calls: List[Dict[str, Any]] = []
+
+    async def get_dict(self, params: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        self.calls.append(params)
+        query = params.get("q", "")
+        organic = self.organic if self.organic is not None else [
+            {
+                "title": f"{query} result {i}",
+                "link": f"https://example.com/{zlib.crc32(query.encode())}/{i}",
+                "snippet": f"Snippet {i} about {query}.",
+                "displayed_link": "example.com",
+                "date": "1 day ago",
+            }
+            for i in range(3)
+        ]
+        if params.get("engine") == "google_finance":
+            return {"summary": {"title": query.split()[0], "price": "$100.00", "price_change": "+1.2%"}, "organic_results": []}
+        return {"organic_results": organic}
+
+    async def aclose(self) -> None:
+        pass
+
+
+@pytest.fixture
+def stub_client() -> StubSerpClient:
+    return StubSerpClient()
+
+
+@pytest.fixture
+def search_tool(stub_client, tmp_path):
+    """The shared search tool, backed by the stub client with its own cache and no result index"""
+    tool = WebSearchTool(
+        client=stub_client,
+        cache=SearchCache(),
+        fetcher=ResilientFetcher(retry=RetryPolicy(max_attempts=1)),
+        index=ResultIndex(str(tmp_path / "search_index.db"), enabled=False)
+    )
+    set_web_search_tool(tool)
+    yield tool
+    set_web_search_tool(None)
@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+import main
+from admission import AdmissionController, AdmissionRejected, RateLimiter, TokenBucket
+from models import ChatRequest
+
+
+class StreamingAgent:
+    agent_type = "general"
+
+    async def chat_stream(self, message, thread_id=None):
+        yield {"event": "start", "data": {"thread_id": "t"}}
+        yield {"event": "done", "data": {"thread_id": "t"}}
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    controller = AdmissionController(max_concurrent=1, max_queue=0)
+    monkeypatch.setattr(main, "admission_controller", controller)
+    return controller
+
+
+def test_unread_stream_holds_no_slot(controller):
+    async def scenario():
+        for _ in range(3):
+            # The client disconnects before the body is iterated
+            await main.stream_chat_response(StreamingAgent(), ChatRequest(message="hi"))
+        assert controller.in_flight.get("general", 0) == 0
+
+        response = await main.stream_chat_response(StreamingAgent(), ChatRequest(message="hi"))
+        events = [chunk async for chunk in response.body_iterator]
+        assert len(events) == 2
+        assert controller.in_flight["general"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_stream_is_rejected_when_the_queue_is_full(controller):
+    async def scenario():
+        slot = await controller.acquire("general")
+        try:
+            with pytest.raises(AdmissionRejected):
+                await main.stream_chat_response(StreamingAgent(), ChatRequest(message="hi"))
+        finally:
+            slot.release()
+
+    asyncio.run(scenario())
+
+
+def test_large_cost_needs_a_full_bucket_and_leaves_debt():
+    bucket = TokenBucket(rate=1, burst=10)
+    assert bucket.take(50) == 0.0
+    assert bucket.take() > 40
+
+    bucket = TokenBucket(rate=1, burst=10)
+    bucket.take(5)
+    assert bucket.take(50) > 0
+
+
+def test_rate_limiter_charges_batch_cost():
+    limiter = RateLimiter(requests_per_minute=60, burst=10)
+    limiter.check("client", 10)
+    with pytest.raises(AdmissionRejected) as rejected:
+        limiter.check("client")
+    assert rejected.value.status_code == 429
@@ -0,0 +1,125 @@
+import asyncio
+from answer_cache import AnswerCache, HashingEmbedder, same_subject
+from models import PerplexityResponse
+from tools import search_failures_sink, search_tool_error
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def embed(self, text):
+        self.calls += 1
+        return await super().embed(text)
+
+
+def answer(summary: str) -> PerplexityResponse:
+    return PerplexityResponse(summary=summary, explore_more=[])
+
+
+def test_rephrased_question_hits():
+    async def scenario():
+        cache = AnswerCache(embedder=HashingEmbedder(), threshold=0.85)
+        await cache.store("general", "What is the latest news about Tesla stock?", answer("Tesla"))
+        hit, _ = await cache.lookup("general", "latest Tesla stock news")
+        assert hit is not None
+        response, similarity = hit
+        assert response.summary == "Tesla"
+        assert similarity >= 0.85
+        assert cache.hits == 1
+
+    asyncio.run(scenario())
+
+
+def test_added_words_are_left_to_the_threshold():
+    async def scenario():
+        cache = AnswerCache(embedder=HashingEmbedder(), threshold=0.85)
+        await cache.store("sports", "how did the Lakers do last night", answer("Lakers"))
+        hit, _ = await cache.lookup("sports", "lakers score last night")
+        assert hit is not None
+        assert hit[0].summary == "Lakers"
+
+    asyncio.run(scenario())
+
+
+def test_related_question_below_threshold_misses():
+    async def scenario():
+        cache = AnswerCache(embedder=HashingEmbedder(), threshold=0.85)
+        await cache.store("general", "What is the latest news about Tesla stock?", answer("Tesla"))
+        hit, _ = await cache.lookup("general", "Tesla earnings report")
+        assert hit is None
+        hit, _ = await cache.lookup("general", "What is the weather in Paris?")
+        assert hit is None
+        assert cache.misses == 2
+
+    asyncio.run(scenario())
+
+
+def test_answers_are_kept_per_agent_type():
+    async def scenario():
+        cache = AnswerCache(embedder=HashingEmbedder())
+        await cache.store("finance", "NVDA outlook", answer("finance"))
+        hit, _ = await cache.lookup("general", "NVDA outlook")
+        assert hit is None
+
+    asyncio.run(scenario())
+
+
+def test_expired_answers_miss():
+    async def scenario():
+        cache = AnswerCache(embedder=HashingEmbedder(), ttls={"general": 0})
+        await cache.store("general", "NVDA outlook", answer("old"))
+        hit, _ = await cache.lookup("general", "NVDA outlook")
+        assert hit is None
+
+    asyncio.run(scenario())
+
+
+def test_miss_embeds_the_message_once():
+    async def scenario():
+        embedder = CountingEmbedder()
+        cache = AnswerCache(embedder=embedder)
+        await cache.store("general", "Who won the Lakers game?", answer("Lakers"))
+        embedder.calls = 0
+
+        hit, vector = await cache.lookup("general", "best pizza in Chicago")
+        assert hit is None
+        await cache.store("general", "best pizza in Chicago", answer("pizza"), vector)
+        assert embedder.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_search_tool_error_is_recorded_for_the_run():
+    failures = []
+    token = search_failures_sink.set(failures)
+    try:
+        message = search_tool_error(None, RuntimeError("circuit open"))
+    finally:
+        search_failures_sink.reset(token)
+    assert "unavailable" in message
+    assert len(failures) == 1
+
+
+def test_entity_swapped_question_misses():
+    async def scenario():
+        cache = AnswerCache(embedder=HashingEmbedder(), threshold=0.85)
+        await cache.store(
+            "general", "latest news about the 2024 presidential election polls in pennsylvania", answer("PA")
+        )
+        hit, _ = await cache.lookup("general", "latest news about the 2024 presidential election polls in arizona")
+        assert hit is None
+
+        await cache.store("finance", "what did tesla report for quarterly earnings revenue and margins", answer("TSLA"))
+        hit, _ = await cache.lookup("finance", "what did nvidia report for quarterly earnings revenue and margins")
+        assert hit is None
+
+    asyncio.run(scenario())
+
+
+def test_entities_must_match_for_semantic_embedders():
+    assert same_subject("Tesla stock news", "news on tesla stock")
+    assert not same_subject("Latest news on Tesla stock", "latest news on stock from Nvidia")
+    assert not same_subject("election polls 2024", "election polls 2028")
+    assert not same_subject("What is the AAPL price target", "what is the price target")
@@ -0,0 +1,58 @@
+import asyncio
+import base_agent
+from base_agent import BaseAgent
+from tools import search_failures_sink
+
+
+class FakeStreamedRun:
+    def __init__(self):
+        self.cancelled = False
+        self.failures_sink = search_failures_sink.get()
+
+    async def stream_events(self):
+        while True:
+            yield type("Event", (), {"type": "agent_updated_stream_event"})()
+            await asyncio.sleep(0)
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class StreamedAgent(BaseAgent):
+    def create_agent(self):
+        self.agent = object()
+
+
+def test_closing_the_stream_cancels_the_run(monkeypatch):
+    runs = []
+
+    def run_streamed(**kwargs):
+        runs.append(FakeStreamedRun())
+        return runs[-1]
+
+    async def get_session(thread_id):
+        return None
+
+    async def claim_seed(thread_id):
+        return None
+
+    monkeypatch.setattr(base_agent.Runner, "run_streamed", run_streamed)
+    monkeypatch.setattr(base_agent.conversation_manager, "get_session", get_session)
+    monkeypatch.setattr(base_agent.summary_scheduler, "claim_seed", claim_seed)
+
+    async def scenario():
+        stream = StreamedAgent().chat_stream("hello")
+        assert (await stream.__anext__())["event"] == "start"
+
+        # The client disconnects while the run is still going
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.01)
+        pending.cancel()
+        await asyncio.gather(pending, return_exceptions=True)
+        await stream.aclose()
+
+        assert runs[0].cancelled
+        assert runs[0].failures_sink == []
+        assert base_agent.inflight_runs.active == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,66 @@
+import asyncio
+import batch_chat
+from batch_chat import BatchChatRunner
+from models import BatchChatItem, PerplexityResponse
+
+
+class CountingAgent:
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+
+    async def chat(self, message, thread_id=None):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return {"response": PerplexityResponse(summary=message, explore_more=[]), "thread_id": thread_id or message}
+
+
+def test_concurrent_batches_share_the_concurrency_cap(monkeypatch):
+    agent = CountingAgent()
+    monkeypatch.setattr(batch_chat.agent_registry, "get", lambda agent_type: agent)
+
+    async def scenario():
+        runner = BatchChatRunner(max_concurrency=3)
+
+        async def run_batch(batch: int):
+            items = [BatchChatItem(message=f"batch {batch} item {i}", agent="general") for i in range(6)]
+            return [record async for record in runner.run(items)]
+
+        batches = await asyncio.gather(*(run_batch(batch) for batch in range(4)))
+        assert all(records[-1]["errors"] == 0 for records in batches)
+        assert agent.peak == 3
+
+    asyncio.run(scenario())
+
+
+class FailingAgent:
+    def __init__(self):
+        self.calls = 0
+
+    async def chat(self, message, thread_id=None):
+        self.calls += 1
+        return {
+            "response": PerplexityResponse(summary="I encountered an error while processing your request: boom", explore_more=[]),
+            "thread_id": "t",
+            "error": "boom"
+        }
+
+
+def test_failed_runs_are_reported_as_errors(monkeypatch):
+    agent = FailingAgent()
+    monkeypatch.setattr(batch_chat.agent_registry, "get", lambda agent_type: agent)
+
+    async def scenario():
+        runner = BatchChatRunner(max_concurrency=2)
+        items = [BatchChatItem(message="same question", agent="general") for _ in range(3)]
+        records = [record async for record in runner.run(items)]
+        results = [record for record in records if record["type"] == "result"]
+        assert agent.calls == 1
+        assert all(result["status"] == "error" for result in results)
+        assert not any("response" in result for result in results)
+        assert records[-1]["errors"] == 3
+
+    asyncio.run(scenario())
+
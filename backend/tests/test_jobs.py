@@ -0,0 +1,32 @@
+import asyncio
+import jobs
+from jobs import JobManager
+from models import PerplexityResponse
+
+
+class FailingAgent:
+    async def chat(self, message, thread_id=None):
+        return {
+            "response": PerplexityResponse(summary="I encountered an error while processing your request: boom", explore_more=[]),
+            "thread_id": "t",
+            "error": "boom"
+        }
+
+
+def test_failed_run_marks_the_job_failed(monkeypatch):
+    monkeypatch.setattr(jobs.agent_registry, "get", lambda agent_type: FailingAgent())
+
+    async def scenario():
+        manager = JobManager(workers=1)
+        manager.start()
+        job = await manager.submit("general", "hello")
+        async for record in manager.watch(job["job_id"]):
+            pass
+        await manager.stop(timeout=1)
+
+        assert record["status"] == "failed"
+        assert record["error"] == "boom"
+        assert record["result"] is None
+        assert manager.failed == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,90 @@
+import asyncio
+import time
+import pytest
+from quotes import QuoteService, parse_quote_lookup
+
+
+@pytest.mark.parametrize("message, symbols", [
+    ("AAPL price", ["AAPL"]),
+    ("$nvda and $amd", ["NVDA", "AMD"]),
+    ("what's MSFT trading at?", ["MSFT"]),
+    ("T stock price", ["T"]),
+    ("PLTR stock", ["PLTR"]),
+    ("$AI price", ["AI"]),
+])
+def test_plain_lookups_are_parsed(message, symbols):
+    assert parse_quote_lookup(message) == symbols
+
+
+@pytest.mark.parametrize("message", [
+    "AI stocks",
+    "US stocks",
+    "EV stocks",
+    "ETF prices",
+    "the S&P price",
+    "CEO shares",
+    "what is T",
+    "what is the price of AI",
+])
+def test_capitalised_words_are_not_tickers(message):
+    assert parse_quote_lookup(message) is None
+
+
+def test_questions_go_to_the_agent():
+    assert parse_quote_lookup("why did AAPL drop?") is None
+
+
+def test_unknown_symbols_need_a_cashtag():
+    assert parse_quote_lookup("ZZZZ") is None
+    assert parse_quote_lookup("ZZZZ price") is None
+    assert parse_quote_lookup("$ZZZZ price") == ["ZZZZ"]
+
+
+@pytest.mark.parametrize("message", ["HOT stocks", "TOP stocks", "NEW stock prices", "SELL AAPL stock"])
+def test_capitalised_words_next_to_keywords_are_not_tickers(message):
+    assert parse_quote_lookup(message) is None
+
+
+def test_failed_lookups_are_not_reported_missing(search_tool, stub_client, monkeypatch):
+    original = stub_client.get_dict
+
+    async def get_dict(params, timeout=None):
+        if params.get("q") == "MSFT":
+            raise RuntimeError("SerpAPI is down")
+        if params.get("q") == "ZZZZ":
+            return {}
+        return await original(params, timeout)
+    monkeypatch.setattr(stub_client, "get_dict", get_dict)
+
+    async def scenario():
+        service = QuoteService(search_tool=search_tool)
+        quotes, missing, failed = await service.get_quotes(["AAPL", "MSFT", "ZZZZ"])
+        assert [quote.symbol for quote in quotes] == ["AAPL"]
+        assert missing == ["ZZZZ"]
+        assert failed == ["MSFT"]
+
+        response = await service.answer("$AAPL $MSFT $ZZZZ")
+        assert "No quote was found for ZZZZ." in response.summary
+        assert "MSFT could not be fetched" in response.summary
+
+    asyncio.run(scenario())
+
+
+def test_expired_quotes_are_not_served_when_upstream_fails(search_tool, stub_client, monkeypatch):
+    async def scenario():
+        service = QuoteService(search_tool=search_tool)
+        assert await service.answer("AAPL price") is not None
+
+        cache = search_tool.cache
+        for key, (_, value) in list(cache._entries.items()):
+            cache._entries[key] = (time.monotonic() - 1, value)
+
+        async def failing_get_dict(params, timeout=None):
+            raise RuntimeError("SerpAPI is down")
+        monkeypatch.setattr(stub_client, "get_dict", failing_get_dict)
+
+        # Falls back to the agent instead of answering with an outdated price
+        assert await service.answer("AAPL price") is None
+        assert cache.stale_served == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,82 @@
+import asyncio
+from result_index import ResultIndex, _stem
+
+
+def result(title: str, snippet: str = "") -> dict:
+    return {"title": title, "snippet": snippet}
+
+
+def test_coverage_matches_whole_words():
+    index = ResultIndex(enabled=False)
+    assert index.coverage("start art", [result("starting")]) == 0.5
+    assert index.coverage("war awards", [result("software award")]) == 0.5
+    assert index.coverage("lakers games", [result("Lakers win", "game recap")]) == 1.0
+
+
+def test_stem_matches_plurals_to_their_singular():
+    assert _stem("games") == _stem("game")
+    assert _stem("matches") == _stem("match")
+    assert _stem("passes") == _stem("pass")
+
+
+def test_unrelated_snippets_do_not_answer_locally(tmp_path):
+    async def scenario():
+        index = ResultIndex(str(tmp_path / "index.db"), min_results=2)
+        index.remember([
+            {"title": "Software update released", "link": "https://a.example.com", "snippet": "New award winning app."},
+            {"title": "Award season software", "link": "https://b.example.com", "snippet": "Software awards."},
+            {"title": "Warehouse software", "link": "https://c.example.com", "snippet": "Logistics award."},
+        ], "software awards")
+        await index.close()
+
+        # Each result mentions awards, and "war" only inside other words
+        outcome, _ = await index.lookup("war awards")
+        assert outcome == "low_recall"
+
+        index.remember([
+            {"title": "War updates from the front", "link": "https://d.example.com", "snippet": "Latest war update."},
+            {"title": "War update: talks resume", "link": "https://e.example.com", "snippet": "Updates on the war."},
+        ], "war updates")
+        await index.close()
+
+        outcome, results = await index.lookup("war updates")
+        assert outcome == "local"
+        assert {r["link"] for r in results} >= {"https://d.example.com", "https://e.example.com"}
+        await index.close()
+
+    asyncio.run(scenario())
+
+
+def test_stats_count_indexed_results(tmp_path):
+    async def scenario():
+        index = ResultIndex(str(tmp_path / "index.db"))
+        index.remember([
+            {"title": "First", "link": "https://a.example.com", "snippet": "One."},
+            {"title": "Second", "link": "https://b.example.com", "snippet": "Two."},
+        ], "results")
+        await index.close()
+
+        stats = await index.stats()
+        assert stats["results"] == 2
+        assert stats["size_bytes"] > 0
+        await index.close()
+
+    asyncio.run(scenario())
+
+
+def test_results_about_other_entities_do_not_answer_locally(tmp_path):
+    async def scenario():
+        index = ResultIndex(str(tmp_path / "index.db"), min_results=3)
+        index.remember([
+            {"title": "Microsoft earnings beat estimates", "link": "https://a.example.com", "snippet": "Cloud growth."},
+            {"title": "Nvidia earnings soar", "link": "https://b.example.com", "snippet": "Data center demand."},
+            {"title": "Apple unveils new iPhone", "link": "https://c.example.com", "snippet": "Launch event recap."},
+        ], "tech news")
+        await index.close()
+
+        outcome, results = await index.lookup("apple earnings")
+        assert outcome == "low_recall"
+        assert results == []
+        await index.close()
+
+    asyncio.run(scenario())
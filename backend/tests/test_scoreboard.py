@@ -0,0 +1,19 @@
+import asyncio
+import main
+from scoreboard import scoreboard_poller
+
+
+def test_unread_scoreboard_stream_holds_no_subscription():
+    async def scenario():
+        # The client disconnects before the body is iterated
+        await main.sports_scoreboard_stream()
+        assert scoreboard_poller.stats()["subscribers"] == 0
+
+        response = await main.sports_scoreboard_stream()
+        body = response.body_iterator
+        assert (await body.__anext__()).startswith("event: snapshot")
+        assert scoreboard_poller.stats()["subscribers"] == 1
+        await body.aclose()
+        assert scoreboard_poller.stats()["subscribers"] == 0
+
+    asyncio.run(scenario())
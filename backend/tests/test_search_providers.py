@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+from search_providers import LocalSearchProvider, SearchFederation
+
+
+def shared_results(query, num_results):
+    return [{"title": f"shared {i}", "link": f"https://shared.example.com/{i}", "snippet": ""} for i in range(num_results)]
+
+
+def federation(providers, **kwargs) -> SearchFederation:
+    return SearchFederation(providers, explore_rate=0, **kwargs)
+
+
+def test_first_mode_answers_from_the_fastest_and_cancels_the_rest():
+    fast = LocalSearchProvider("fast", latency=0.01)
+    slow = LocalSearchProvider("slow", latency=1.0)
+    search = federation([slow, fast], mode="first", fanout=2)
+
+    response = asyncio.run(search.search("lakers score", 3))
+
+    assert response["search_metadata"]["answered_by"] == ["fast"]
+    assert all("fast.example.com" in result["link"] for result in response["organic_results"])
+    stats = search.stats()
+    assert stats["answered_first"] == 1
+    assert stats["providers"]["fast"]["wins"] == 1
+    assert stats["providers"]["slow"]["cancelled"] == 1
+    assert stats["providers"]["slow"]["requests"] == 0
+    # The cancelled provider is known to be slower than the time it was given
+    assert stats["ranking"] == ["fast", "slow"]
+
+
+def test_first_mode_waits_past_a_short_result_set():
+    short = LocalSearchProvider("short", latency=0.01, results=lambda query, n: shared_results(query, 1))
+    full = LocalSearchProvider("full", latency=0.05)
+    search = federation([short, full], mode="first", fanout=2, min_results=3)
+
+    response = asyncio.run(search.search("nvda earnings", 3))
+
+    assert response["search_metadata"]["answered_by"] == ["full"]
+    assert len(response["organic_results"]) == 3
+
+
+def test_merge_mode_interleaves_and_removes_duplicate_urls():
+    a = LocalSearchProvider("a", latency=0.01)
+    b = LocalSearchProvider("b", latency=0.02)
+    c = LocalSearchProvider("c", latency=0.0, results=shared_results)
+    d = LocalSearchProvider("d", latency=0.0, results=shared_results)
+
+    response = asyncio.run(federation([a, b], mode="merge", fanout=2).search("fed rates", 4))
+    links = [result["link"] for result in response["organic_results"]]
+    assert response["search_metadata"]["answered_by"] == ["a", "b"]
+    assert "a.example.com" in links[0] and "b.example.com" in links[1]
+
+    response = asyncio.run(federation([c, d], mode="merge", fanout=2).search("fed rates", 4))
+    links = [result["link"] for result in response["organic_results"]]
+    assert len(links) == len(set(links)) == 4
+
+
+def test_stagger_only_launches_the_next_provider_when_the_first_is_slow():
+    first = LocalSearchProvider("first", latency=0.01)
+    second = LocalSearchProvider("second", latency=0.01)
+    search = federation([first, second], mode="first", fanout=2, stagger=0.2)
+    response = asyncio.run(search.search("weather paris", 3))
+    assert response["search_metadata"]["answered_by"] == ["first"]
+    assert second.calls == 0
+
+    first = LocalSearchProvider("first", latency=1.0)
+    second = LocalSearchProvider("second", latency=0.01)
+    search = federation([first, second], mode="first", fanout=2, stagger=0.05)
+    response = asyncio.run(search.search("weather paris", 3))
+    assert response["search_metadata"]["answered_by"] == ["second"]
+    assert search.stats()["providers"]["first"]["cancelled"] == 1
+
+
+def test_failed_provider_falls_back_without_waiting_out_the_stagger():
+    broken = LocalSearchProvider("broken", latency=0.0, error=RuntimeError("down"))
+    backup = LocalSearchProvider("backup", latency=0.01)
+    search = federation([broken, backup], mode="first", fanout=2, stagger=5.0)
+
+    response = asyncio.run(asyncio.wait_for(search.search("ufc results", 3), 1.0))
+
+    assert response["search_metadata"]["answered_by"] == ["backup"]
+    assert search.stats()["providers"]["broken"]["error_rate"] > 0
+
+
+def test_every_provider_failing_raises():
+    search = federation([
+        LocalSearchProvider("a", error=RuntimeError("a down")),
+        LocalSearchProvider("b", error=RuntimeError("b down")),
+    ], fanout=2)
+    with pytest.raises(RuntimeError):
+        asyncio.run(search.search("anything", 3))
+
+
+def test_ranking_prefers_measured_fast_providers_and_limits_fanout():
+    slow = LocalSearchProvider("slow", latency=0.1)
+    fast = LocalSearchProvider("fast", latency=0.01)
+    empty = LocalSearchProvider("empty", latency=0.01, results=lambda query, n: [])
+    search = federation([slow, empty, fast], mode="merge", fanout=3)
+    for _ in range(3):
+        asyncio.run(search.search("warm up", 3))
+
+    # Coming back empty inflates the expected wait of an otherwise fast provider
+    assert [provider.name for provider in search.rank()] == ["fast", "empty", "slow"]
+    search.fanout = 1
+    assert [provider.name for provider in search.select()] == ["fast"]
@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from tools import cited_sources, execute_batch_search_async, format_search_results, search_failures_sink, search_results_sink
+
+
+def run_batch(queries, kind):
+    """Run a batch search, returning the results and failures it recorded"""
+    results, failures = [], []
+    results_token = search_results_sink.set(results)
+    failures_token = search_failures_sink.set(failures)
+    try:
+        asyncio.run(execute_batch_search_async(queries, kind))
+    finally:
+        search_failures_sink.reset(failures_token)
+        search_results_sink.reset(results_token)
+    return results, failures
+
+
+def test_finance_batch_keeps_a_snapshot_per_ticker(search_tool):
+    results, failures = run_batch(["AAPL stock", "MSFT stock", "NVDA stock"], "finance")
+
+    snapshots = [result["title"] for result in results if result["type"] == "finance_data"]
+    assert snapshots == ["Finance: AAPL", "Finance: MSFT", "Finance: NVDA"]
+    assert failures == []
+
+
+def test_cited_finance_snapshots_are_all_kept(search_tool):
+    results, _ = run_batch(["AAPL stock", "MSFT stock", "NVDA stock"], "finance")
+
+    citations = [number for number, result in enumerate(results, 1) if result["type"] == "finance_data"]
+    titles = [source.title for source in cited_sources(results, citations)]
+    assert titles == ["Finance: AAPL", "Finance: MSFT", "Finance: NVDA"]
+
+
+def test_batch_keeps_results_without_links(search_tool, stub_client):
+    stub_client.organic = [
+        {"title": "First", "snippet": "one"},
+        {"title": "Second", "snippet": "two"},
+    ]
+
+    results, _ = run_batch(["one query", "another query"], "web")
+
+    assert [result["title"] for result in results] == ["First", "Second", "First", "Second"]
+
+
+def test_batch_removes_duplicate_organic_urls(search_tool, stub_client):
+    stub_client.organic = [{"title": "Shared", "link": "https://example.com/shared", "snippet": "same"}]
+
+    results, _ = run_batch(["one query", "another query"], "web")
+
+    assert [result["link"] for result in results] == ["https://example.com/shared"]
+
+
+def test_raised_batch_failures_are_left_to_the_tool_error_handler(search_tool, stub_client, monkeypatch):
+    async def get_dict(params, timeout=None):
+        if params.get("q") == "broken query":
+            raise RuntimeError("SerpAPI is down")
+        return {"organic_results": []}
+    monkeypatch.setattr(stub_client, "get_dict", get_dict)
+
+    failures = []
+    token = search_failures_sink.set(failures)
+    try:
+        with pytest.raises(RuntimeError):
+            asyncio.run(execute_batch_search_async(["broken query", "empty query"], "web"))
+    finally:
+        search_failures_sink.reset(token)
+
+    # search_tool_error records the raised failure, so the batch must not have already
+    assert failures == []
+
+
+def test_verbose_layouts_name_their_kind():
+    rows = [("lakers", {"title": "Lakers 101 - 99 Celtics", "link": "https://example.com", "snippet": "Final", "displayed_link": "example.com"})]
+
+    output = format_search_results("scores", ["lakers"], rows, output_format="verbose")
+
+    assert output.startswith("Live scoreboard results for 'lakers':")
+    assert "=== LIVE SCORES ===" in output
+
+    output = format_search_results("local", ["lakers"], rows, output_format="verbose")
+
+    assert output.startswith("Previously seen search results for 'lakers':")
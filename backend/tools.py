@@ -1,61 +1,254 @@
+import asyncio
+import logging
 import os
-from typing import Dict, Any, List
-from serpapi import GoogleSearch
-from dotenv import load_dotenv
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Tuple
+from serp_client import AsyncSerpClient
+from search_cache import SearchCache, search_cache
+from resilience import ResilientFetcher, resilient_fetcher
+from search_providers import SearchFederation, create_search_federation
+from result_index import ResultIndex, result_index
+from metrics import span
+from models import Source
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Per-run sink for the structured results returned by searches, set by the agent
+# runner so sources can be surfaced before the model finishes its answer
+search_results_sink: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("search_results_sink", default=None)
+# Per-run sink for the errors of searches that could not run, so a degraded answer isn't cached
+search_failures_sink: ContextVar[Optional[List[Exception]]] = ContextVar("search_failures_sink", default=None)
+
+# "compact" returns each search as terse line records and leaves the usage guidance to the
+# agent instructions; "verbose" keeps the original prose blocks with per-call instructions
+TOOL_OUTPUT_FORMAT = os.getenv("TOOL_OUTPUT_FORMAT", "compact").lower()
+
+# Included once in every search agent's instructions so tool outputs needn't repeat it
+SEARCH_RESULTS_GUIDE = """Search results arrive as plain text. Each search starts with a "<kind>: <query>" line followed by
+one "[n] title | url | date | type" line per result (date and type only when known) with its snippet on the next line.
+"no results" means nothing was found; "failed: <error>" means that search could not run, so say current information
+for it could not be retrieved. Base the summary on these results, favouring the most recent, and put the numbers n of
+the results you used in citations. Sources are attached to the answer from these numbers, so never copy titles or
+URLs into the summary and don't add [n] markers to it."""
+
+def record_results(results: List[Dict[str, Any]]) -> int:
+    """
+    Append search results to the current run's sink, if one is active
+    
+    Returns:
+        The number the first result is shown with, so numbers stay unique across a run's searches
+    """
+    sink = search_results_sink.get()
+    if sink is None:
+        return 1
+    start = len(sink) + 1
+    sink.extend(results)
+    return start
+
+def record_failures(errors: List[Exception]) -> None:
+    """Append search errors to the current run's failure sink, if one is active"""
+    sink = search_failures_sink.get()
+    if sink is not None:
+        sink.extend(errors)
+
+def cited_sources(results: List[Dict[str, Any]], citations: List[int]) -> List[Source]:
+    """
+    Build explore_more from a run's recorded search results rather than model-copied titles and URLs
+    
+    Args:
+        results: The run's search_results_sink, whose entries are numbered from 1 in the tool outputs
+        citations: Result numbers the model cited; if none are valid, every result is listed
+        
+    Returns:
+        Sources in citation order with duplicate organic URLs removed; snapshots
+        (sports_data, finance_data) may share a link and are all kept
+    """
+    cited = [results[number - 1] for number in citations if 1 <= number <= len(results)] or results
+    sources = []
+    seen_links = set()
+    for result in cited:
+        if not result["link"]:
+            continue
+        if result.get("type", "organic") == "organic":
+            if result["link"] in seen_links:
+                continue
+            seen_links.add(result["link"])
+        sources.append(Source(title=result["title"], url=result["link"]))
+    return sources
+
+def finance_quote_url(stock: Optional[str], exchange: Optional[str]) -> str:
+    """Google Finance page for a listing, or the Google Finance home page if it isn't known"""
+    if stock and exchange:
+        return f"https://www.google.com/finance/quote/{stock}:{exchange}"
+    return "https://www.google.com/finance"
+
+def search_tool_error(ctx, error: Exception) -> str:
+    """Tool failure message telling the model search is down rather than empty"""
+    record_failures([error])
+    return (
+        f"Search is currently unavailable: {error}. Retries were already attempted, so do not call "
+        "the search tools again for this question. Tell the user that current information could not "
+        "be retrieved instead of answering from memory as if it were up to date."
+    )
+
+def parse_sports_results(sports_results: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Games in a SerpAPI sports_results block as structured records
+    
+    Args:
+        sports_results: The sports_results block of a Google response
+        
+    Returns:
+        Games with id, league, date, time, status, venue and teams (name and score),
+        the spotlighted game first and duplicates removed
+    """
+    spotlight = sports_results.get("game_spotlight")
+    candidates = ([spotlight] if isinstance(spotlight, dict) else []) + list(sports_results.get("games") or [])
+    
+    games = []
+    seen_ids = set()
+    for game in candidates:
+        teams = [
+            {"name": team.get("name", ""), "score": str(team["score"]) if team.get("score") is not None else None}
+            for team in game.get("teams") or [] if isinstance(team, dict)
+        ]
+        if len(teams) < 2:
+            continue
+        league = game.get("league") or game.get("tournament") or ""
+        date = game.get("date", "")
+        game_id = "|".join([league, date] + [team["name"] for team in teams])
+        if game_id in seen_ids:
+            continue
+        seen_ids.add(game_id)
+        games.append({
+            "id": game_id,
+            "league": league,
+            "date": date,
+            "time": game.get("time", ""),
+            "status": game.get("status", ""),
+            "venue": game.get("stadium") or game.get("venue") or "",
+            "teams": teams
+        })
+    return games
+
+def describe_game(game: Dict[str, Any]) -> str:
+    """One-line description of a game, e.g. Lakers 102 - 99 Warriors (NBA, Oct 22, Final)"""
+    first, second = game["teams"][0], game["teams"][1]
+    if first["score"] is not None and second["score"] is not None:
+        matchup = f"{first['name']} {first['score']} - {second['score']} {second['name']}"
+    else:
+        matchup = f"{first['name']} vs {second['name']}"
+    details = [value for value in (game["league"], game["date"], game["time"], game["status"]) if value]
+    return f"{matchup} ({', '.join(details)})" if details else matchup
+
+def _format_organic(result: Dict[str, Any], result_type: str = None) -> Dict[str, Any]:
+    """Normalize a SerpAPI organic result into our result record"""
+    formatted = {
+        "title": result.get("title", ""),
+        "link": result.get("link", ""),
+        "snippet": result.get("snippet", ""),
+        "displayed_link": result.get("displayed_link", ""),
+    }
+    if result_type:
+        formatted["type"] = result_type
+    formatted["date"] = result.get("date", "")
+    return formatted
 
 class WebSearchTool:
     """Tool for web search using SerpAPI"""
     
-    def __init__(self):
-        self.api_key = os.getenv("SERP_API_KEY")
-        if not self.api_key:
-            raise ValueError("SERP_API_KEY environment variable is required")
+    def __init__(
+        self,
+        client: AsyncSerpClient = None,
+        cache: SearchCache = None,
+        fetcher: ResilientFetcher = None,
+        federation: Optional[SearchFederation] = None,
+        index: ResultIndex = None
+    ):
+        """
+        Args:
+            client: SerpAPI client; created from SERP_API_KEY if not given
+            cache: Response cache; defaults to the shared search cache
+            fetcher: Resilience policy for upstream requests
+            federation: Providers that answer web searches; built from SEARCH_PROVIDERS if not given,
+                and None there means web searches go straight to Google
+            index: Where returned results are kept for local_search; defaults to the shared index
+        """
+        if client is None:
+            api_key = os.getenv("SERP_API_KEY")
+            if not api_key:
+                raise ValueError("SERP_API_KEY environment variable is required")
+            client = AsyncSerpClient(api_key=api_key)
+        self.client = client
+        self.cache = cache or search_cache
+        self.fetcher = fetcher or resilient_fetcher
+        self.federation = federation or create_search_federation(self.client, self.fetcher)
+        self.index = index or result_index
+    
+    async def _get_dict(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Fetch a SerpAPI response through the shared result cache"""
+        return await self.cache.get_or_fetch(params, lambda: self._fetch(params))
+    
+    async def _fetch(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Upstream SerpAPI request with timeouts, retries and circuit breaking, timed separately from cache hits and formatting"""
+        with span("serpapi"):
+            return await self.fetcher.call(
+                params.get("engine", "google"),
+                lambda timeout: self.client.get_dict(params, timeout=timeout)
+            )
     
-    def search(self, query: str, num_results: int = 5) -> List[Dict[str, Any]]:
+    async def search(self, query: str, num_results: int = 5) -> List[Dict[str, Any]]:
         """
         Perform a web search using SerpAPI with date filtering for recent results
         
+        With a federation configured the query goes to its fastest healthy providers instead of Google alone.
+        
         Args:
             query: Search query
             num_results: Number of results to return
             
         Returns:
             List of search results with title, link, and snippet
+            
+        Raises:
+            Exception: SerpAPI failed and no stale cached response was available
         """
         try:
-            search = GoogleSearch({
-                "q": query,
-                "api_key": self.api_key,
-                "num": num_results,
-                "engine": "google",
-                "tbs": "qdr:y",  # Filter for results from the past year (more realistic)
-                "sort": "date"   # Sort by date (most recent first)
-            })
-            
-            results = search.get_dict()
+            if self.federation is not None:
+                # Cached under the provider set, with the general freshness window
+                params = {"q": query, "num": num_results, "engine": self.federation.name, "tbs": "qdr:y"}
+                results = await self.cache.get_or_fetch(params, lambda: self.federation.search(query, num_results))
+            else:
+                results = await self._get_dict({
+                    "q": query,
+                    "num": num_results,
+                    "engine": "google",
+                    "tbs": "qdr:y",  # Filter for results from the past year (more realistic)
+                    "sort": "date"   # Sort by date (most recent first)
+                })
             
             # Extract organic results
             organic_results = results.get("organic_results", [])
             
-            formatted_results = []
-            for result in organic_results[:num_results]:
-                formatted_results.append({
-                    "title": result.get("title", ""),
-                    "link": result.get("link", ""),
-                    "snippet": result.get("snippet", ""),
-                    "displayed_link": result.get("displayed_link", ""),
-                    "date": result.get("date", "")
-                })
-            
+            formatted_results = [_format_organic(result) for result in organic_results[:num_results]]
+            self.index.remember(formatted_results, query)
             return formatted_results
             
         except Exception as e:
-            print(f"Error performing web search: {e}")
-            return []
+            logger.error(f"Error performing web search: {e}")
+            raise
 
-    def sports_search(self, query: str = "latest sports news") -> List[Dict[str, Any]]:
+    @staticmethod
+    def _sports_params(query: str) -> Dict[str, Any]:
+        return {
+            "q": query,
+            "engine": "google",
+            "tbs": "qdr:m",  # Filter for results from the past month (more realistic)
+            "sort": "date"   # Sort by date (most recent first)
+        }
+    
+    async def sports_search(self, query: str = "latest sports news") -> List[Dict[str, Any]]:
         """
         Perform a sports-focused search using SerpAPI with recent date filtering
         
@@ -66,15 +259,7 @@ class WebSearchTool:
             List of sports results with structured data
         """
         try:
-            search = GoogleSearch({
-                "q": query,
-                "api_key": self.api_key,
-                "engine": "google",
-                "tbs": "qdr:m",  # Filter for results from the past month (more realistic)
-                "sort": "date"   # Sort by date (most recent first)
-            })
-            
-            results = search.get_dict()
+            results = await self._get_dict(self._sports_params(query))
             
             # Check for sports results first
             sports_results = results.get("sports_results", {})
@@ -84,10 +269,11 @@ class WebSearchTool:
             
             # Add sports-specific results if available
             if sports_results:
+                games = parse_sports_results(sports_results)
                 formatted_results.append({
                     "title": f"Sports: {sports_results.get('title', 'Sports Results')}",
                     "link": "https://www.google.com/search?q=" + query.replace(" ", "+"),
-                    "snippet": f"Sports data: {str(sports_results)[:200]}...",
+                    "snippet": "; ".join(describe_game(game) for game in games[:5]) if games else f"Sports data: {str(sports_results)[:200]}...",
                     "displayed_link": "google.com/sports",
                     "type": "sports_data",
                     "date": "current"
@@ -95,22 +281,16 @@ class WebSearchTool:
             
             # Add regular organic results
             for result in organic_results[:4]:
-                formatted_results.append({
-                    "title": result.get("title", ""),
-                    "link": result.get("link", ""),
-                    "snippet": result.get("snippet", ""),
-                    "displayed_link": result.get("displayed_link", ""),
-                    "type": "organic",
-                    "date": result.get("date", "")
-                })
+                formatted_results.append(_format_organic(result, "organic"))
             
+            self.index.remember(formatted_results, query)
             return formatted_results
             
         except Exception as e:
-            print(f"Error performing sports search: {e}")
-            return []
+            logger.error(f"Error performing sports search: {e}")
+            raise
 
-    def finance_search(self, query: str = "market news") -> List[Dict[str, Any]]:
+    async def finance_search(self, query: str = "market news") -> List[Dict[str, Any]]:
         """
         Perform a finance-focused search using SerpAPI with recent date filtering
         
@@ -123,14 +303,11 @@ class WebSearchTool:
         try:
             # Try Google Finance API first for stock-specific queries
             if "stock" in query.lower() or len(query.split()) <= 2:
-                search = GoogleSearch({
+                finance_results = await self._get_dict({
                     "engine": "google_finance",
-                    "q": query,
-                    "api_key": self.api_key
+                    "q": query
                 })
                 
-                finance_results = search.get_dict()
-                
                 if finance_results.get("summary") or finance_results.get("knowledge_graph"):
                     formatted_results = []
                     
@@ -138,7 +315,7 @@ class WebSearchTool:
                         summary = finance_results["summary"]
                         formatted_results.append({
                             "title": f"Finance: {summary.get('title', 'Market Summary')}",
-                            "link": "https://www.google.com/finance",
+                            "link": finance_quote_url(summary.get("stock"), summary.get("exchange")),
                             "snippet": f"Price: {summary.get('price', 'N/A')}, Change: {summary.get('price_change', 'N/A')}",
                             "displayed_link": "google.com/finance",
                             "type": "finance_data",
@@ -148,44 +325,68 @@ class WebSearchTool:
                     # Add any organic results for additional context
                     organic_results = finance_results.get("organic_results", [])
                     for result in organic_results[:3]:
-                        formatted_results.append({
-                            "title": result.get("title", ""),
-                            "link": result.get("link", ""),
-                            "snippet": result.get("snippet", ""),
-                            "displayed_link": result.get("displayed_link", ""),
-                            "type": "organic",
-                            "date": result.get("date", "")
-                        })
+                        formatted_results.append(_format_organic(result, "organic"))
                     
+                    self.index.remember(formatted_results, query)
                     return formatted_results
             
             # Fall back to regular search with finance focus and date filtering
-            search = GoogleSearch({
+            results = await self._get_dict({
                 "q": f"finance {query} market news stock",
-                "api_key": self.api_key,
                 "engine": "google",
                 "tbs": "qdr:w",  # Filter for results from the past week (more realistic than daily)
                 "sort": "date"   # Sort by date (most recent first)
             })
-            results = search.get_dict()
             organic_results = results.get("organic_results", [])
             
-            formatted_results = []
-            for result in organic_results[:5]:
-                formatted_results.append({
-                    "title": result.get("title", ""),
-                    "link": result.get("link", ""),
-                    "snippet": result.get("snippet", ""),
-                    "displayed_link": result.get("displayed_link", ""),
-                    "type": "organic",
-                    "date": result.get("date", "")
-                })
-            
+            formatted_results = [_format_organic(result, "organic") for result in organic_results[:5]]
+            self.index.remember(formatted_results, query)
             return formatted_results
             
         except Exception as e:
-            print(f"Error performing finance search: {e}")
-            return []
+            logger.error(f"Error performing finance search: {e}")
+            raise
+
+    async def sports_scoreboard(self, query: str) -> Dict[str, Any]:
+        """
+        Fetch the current sports_results for a team or league, bypassing the cache
+        
+        The response still refreshes the search cache, so sports_search for the
+        same query reuses it.
+        
+        Args:
+            query: Team or league name
+            
+        Returns:
+            The sports_results block, or an empty dictionary if Google showed none
+        """
+        params = self._sports_params(query)
+        results = await self._fetch(params)
+        self.cache.set(self.cache.make_key(params), results, self.cache.ttl_for(params))
+        return results.get("sports_results") or {}
+    
+    async def quote(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a single ticker on the google_finance engine
+        
+        Responses go through the shared search cache, so repeated lookups within
+        SEARCH_CACHE_TTL_QUOTE seconds cost no upstream request.
+        
+        Args:
+            symbol: Ticker symbol, optionally with its exchange (e.g. "AAPL" or "AAPL:NASDAQ")
+            
+        Returns:
+            The google_finance summary block, or None if the symbol was not found
+            
+        Raises:
+            Exception: SerpAPI failed; quotes are never served from an expired cache entry
+        """
+        try:
+            results = await self._get_dict({"engine": "google_finance", "q": symbol})
+            return results.get("summary") or None
+        except Exception as e:
+            logger.error(f"Error looking up quote for {symbol}: {e}")
+            raise
 
 def get_web_search_tool_definition():
     """Return the tool definition for OpenAI Agents"""
@@ -254,82 +455,234 @@ def get_finance_search_tool_definition():
         }
     }
 
-# Initialize the web search tool
-web_search_tool = WebSearchTool()
+# Verbose layout per search kind: heading, section name, "no results" text and closing instructions
+VERBOSE_LAYOUTS = {
+    "web": (
+        "Web search results", "SEARCH RESULTS", "No search results found.",
+        "Instructions: Use this information to create a comprehensive summary focusing on the most recent information and include ALL sources in an 'Explore More' section with titles and URLs."
+    ),
+    "sports": (
+        "Sports search results", "SPORTS RESULTS", "No sports results found.",
+        "Instructions: Use this sports information to create a comprehensive summary focusing on current games, recent scores, schedules, and sports news. Include ALL sources in an 'Explore More' section."
+    ),
+    "finance": (
+        "Finance search results", "FINANCE RESULTS", "No finance results found.",
+        "Instructions: Use this financial information to create a comprehensive summary focusing on current market trends, recent stock prices, economic news, and financial analysis. Include ALL sources in an 'Explore More' section."
+    ),
+    "scores": (
+        "Live scoreboard results", "LIVE SCORES", "No live games found.",
+        "Instructions: Use these live scores to answer with the current score, status and clock of each game. Include ALL sources in an 'Explore More' section."
+    ),
+    "local": (
+        "Previously seen search results", "INDEXED RESULTS", "No indexed results found.",
+        "Instructions: These results come from earlier searches rather than a new one, and relative dates give the day they were relative to. Use them to create a comprehensive summary and include ALL sources in an 'Explore More' section with titles and URLs."
+    ),
+}
+BATCH_INSTRUCTIONS = "Instructions: Use this information to create a comprehensive summary that covers every query, focusing on the most recent information, and include ALL sources in an 'Explore More' section with titles and URLs."
 
-def execute_web_search(query: str, num_results: int = 5) -> str:
-    """Execute web search and return formatted results"""
-    results = web_search_tool.search(query, num_results)
+def _format_verbose(kind: str, queries: List[str], rows: List[Tuple[str, Dict[str, Any]]], failures: List[Tuple[str, Exception]], batch: bool, start: int) -> str:
+    """Prose blocks with per-call instructions, as the search tools originally returned"""
+    heading, section, empty, instructions = VERBOSE_LAYOUTS.get(kind, VERBOSE_LAYOUTS["web"])
+    if not rows:
+        return "No search results found." if batch else empty
     
-    if not results:
-        return "No search results found."
+    if batch:
+        quoted_queries = ", ".join(f"'{query}'" for query in queries)
+        lines = [f"Batch {kind} search results for {quoted_queries}:", "", "=== SEARCH RESULTS ===", ""]
+    else:
+        lines = [f"{heading} for '{queries[0]}':", "", f"=== {section} ===", ""]
     
-    formatted_output = f"Web search results for '{query}':\n\n"
-    formatted_output += "=== SEARCH RESULTS ===\n\n"
-    
-    for i, result in enumerate(results, 1):
-        formatted_output += f"Result {i}:\n"
-        formatted_output += f"Title: {result['title']}\n"
-        formatted_output += f"URL: {result['link']}\n"
-        formatted_output += f"Content: {result['snippet']}\n"
-        formatted_output += f"Source: {result['displayed_link']}\n"
+    for i, (query, result) in enumerate(rows, start):
+        lines.append(f"Result {i}:")
+        if batch:
+            lines.append(f"Query: {query}")
+        lines.append(f"Title: {result['title']}")
+        lines.append(f"URL: {result['link']}")
+        lines.append(f"Content: {result['snippet']}")
+        lines.append(f"Source: {result['displayed_link']}")
+        if result.get('type'):
+            lines.append(f"Type: {result['type']}")
         if result.get('date'):
-            formatted_output += f"Date: {result['date']}\n"
-        formatted_output += "\n"
+            lines.append(f"Date: {result['date']}")
+        lines.append("")
     
-    formatted_output += "=== END RESULTS ===\n\n"
-    formatted_output += "Instructions: Use this information to create a comprehensive summary focusing on the most recent information and include ALL sources in an 'Explore More' section with titles and URLs."
+    lines += ["=== END RESULTS ===", ""]
+    if failures:
+        failed = ", ".join(f"'{query}' ({error})" for query, error in failures)
+        lines += [f"Search failed for: {failed}. Say that current information for these could not be retrieved.", ""]
+    lines.append(BATCH_INSTRUCTIONS if batch else instructions)
+    return "\n".join(lines)
+
+def _format_compact(kind: str, queries: List[str], rows: List[Tuple[str, Dict[str, Any]]], failures: List[Tuple[str, Exception]], batch: bool, start: int) -> str:
+    """Line records in the fixed layout described by SEARCH_RESULTS_GUIDE"""
+    rows_by_query: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+    for i, (query, result) in enumerate(rows, start):
+        rows_by_query.setdefault(query, []).append((i, result))
+    errors = dict(failures)
     
-    return formatted_output
+    lines = []
+    for query in queries:
+        lines.append(f"{kind}: {query}")
+        if query in errors:
+            lines.append(f"failed: {errors[query]}")
+            continue
+        if query not in rows_by_query:
+            lines.append("no results")
+            continue
+        for i, result in rows_by_query[query]:
+            fields = [result["title"], result["link"]]
+            if result.get("date") or result.get("type", "organic") != "organic":
+                fields.append(result.get("date", ""))
+            if result.get("type", "organic") != "organic":
+                fields.append(result["type"])
+            lines.append(f"[{i}] " + " | ".join(fields))
+            lines.append(result["snippet"])
+    return "\n".join(lines)
+
+def format_search_results(
+    kind: str,
+    queries: List[str],
+    rows: List[Tuple[str, Dict[str, Any]]],
+    failures: List[Tuple[str, Exception]] = None,
+    batch: bool = False,
+    output_format: str = None,
+    start: int = 1
+) -> str:
+    """
+    Render search results as a tool output for the model
+    
+    Args:
+        kind: Search that produced the results: "web", "sports", "finance", "scores" or "local"
+        queries: Queries that were searched
+        rows: (query, result) pairs in display order
+        failures: (query, error) pairs for batch queries that failed
+        batch: Whether the results come from a batch search
+        output_format: "compact" or "verbose" (default: TOOL_OUTPUT_FORMAT)
+        start: Number shown for the first result
+        
+    Returns:
+        The formatted tool output
+    """
+    output_format = output_format or TOOL_OUTPUT_FORMAT
+    formatter = _format_verbose if output_format == "verbose" else _format_compact
+    return formatter(kind, queries, rows, failures or [], batch, start)
+
+# Search tool shared by the agent tools; installed by the app lifespan or created on first use
+_web_search_tool: Optional[WebSearchTool] = None
+
+def get_web_search_tool() -> WebSearchTool:
+    """The shared search tool, created from SERP_API_KEY if none was installed"""
+    global _web_search_tool
+    if _web_search_tool is None:
+        _web_search_tool = WebSearchTool()
+    return _web_search_tool
+
+def set_web_search_tool(tool: Optional[WebSearchTool]) -> None:
+    """Install the shared search tool, e.g. one with a fake client; None drops it"""
+    global _web_search_tool
+    _web_search_tool = tool
 
-def execute_sports_search(query: str = "latest sports news") -> str:
-    """Execute sports search and return formatted results"""
-    results = web_search_tool.sports_search(query)
+async def execute_web_search_async(query: str, num_results: int = 5) -> str:
+    """Execute web search without blocking the event loop and return formatted results"""
+    results = await get_web_search_tool().search(query, num_results)
+    start = record_results(results)
     
-    if not results:
-        return "No sports results found."
+    with span("format"):
+        return format_search_results("web", [query], [(query, result) for result in results], start=start)
+
+async def execute_local_search_async(query: str, num_results: int = 5, web_query: str = None) -> str:
+    """
+    Answer from the index of results seen before, searching the web when it can't
     
-    formatted_output = f"Sports search results for '{query}':\n\n"
-    formatted_output += "=== SPORTS RESULTS ===\n\n"
+    Args:
+        query: Search query
+        num_results: Number of results to return
+        web_query: Query for the web search fallback (default: query)
+        
+    Returns:
+        Formatted indexed results when enough recent ones cover the query, otherwise web search results
+    """
+    outcome, results = await get_web_search_tool().index.lookup(query, num_results)
+    if outcome != "local":
+        logger.info(f"local_search fell back to the web for {query!r} ({outcome})")
+        return await execute_web_search_async(web_query or query, num_results)
+    start = record_results(results)
     
-    for i, result in enumerate(results, 1):
-        formatted_output += f"Result {i}:\n"
-        formatted_output += f"Title: {result['title']}\n"
-        formatted_output += f"URL: {result['link']}\n"
-        formatted_output += f"Content: {result['snippet']}\n"
-        formatted_output += f"Source: {result['displayed_link']}\n"
-        formatted_output += f"Type: {result.get('type', 'organic')}\n"
-        if result.get('date'):
-            formatted_output += f"Date: {result['date']}\n"
-        formatted_output += "\n"
+    with span("format"):
+        return format_search_results("local", [query], [(query, result) for result in results], start=start)
+
+async def execute_sports_search_async(query: str = "latest sports news") -> str:
+    """Execute sports search without blocking the event loop and return formatted results"""
+    results = await get_web_search_tool().sports_search(query)
+    start = record_results(results)
     
-    formatted_output += "=== END RESULTS ===\n\n"
-    formatted_output += "Instructions: Use this sports information to create a comprehensive summary focusing on current games, recent scores, schedules, and sports news. Include ALL sources in an 'Explore More' section."
+    with span("format"):
+        return format_search_results("sports", [query], [(query, result) for result in results], start=start)
+
+async def execute_finance_search_async(query: str = "market news") -> str:
+    """Execute finance search without blocking the event loop and return formatted results"""
+    results = await get_web_search_tool().finance_search(query)
+    start = record_results(results)
     
-    return formatted_output
+    with span("format"):
+        return format_search_results("finance", [query], [(query, result) for result in results], start=start)
 
-def execute_finance_search(query: str = "market news") -> str:
-    """Execute finance search and return formatted results"""
-    results = web_search_tool.finance_search(query)
+async def execute_batch_search_async(queries: List[str], kind: str = "web", num_results: int = 5, max_concurrency: int = None) -> str:
+    """
+    Execute several searches concurrently and return one merged block of formatted results
     
-    if not results:
-        return "No finance results found."
+    Args:
+        queries: Search queries to run
+        kind: Which search to run for each query: "web", "sports" or "finance"
+        num_results: Number of results per query (web searches only)
+        max_concurrency: Cap on searches in flight at once (default: SEARCH_BATCH_CONCURRENCY)
+        
+    Returns:
+        Formatted results from all queries, with duplicate organic URLs removed
+    """
+    search_tool = get_web_search_tool()
+    searches = {
+        "web": lambda q: search_tool.search(q, num_results),
+        "sports": search_tool.sports_search,
+        "finance": search_tool.finance_search
+    }
+    if kind not in searches:
+        raise ValueError(f"Unknown search kind: {kind}")
     
-    formatted_output = f"Finance search results for '{query}':\n\n"
-    formatted_output += "=== FINANCE RESULTS ===\n\n"
+    semaphore = asyncio.Semaphore(max_concurrency or int(os.getenv("SEARCH_BATCH_CONCURRENCY", 4)))
     
-    for i, result in enumerate(results, 1):
-        formatted_output += f"Result {i}:\n"
-        formatted_output += f"Title: {result['title']}\n"
-        formatted_output += f"URL: {result['link']}\n"
-        formatted_output += f"Content: {result['snippet']}\n"
-        formatted_output += f"Source: {result['displayed_link']}\n"
-        formatted_output += f"Type: {result.get('type', 'organic')}\n"
-        if result.get('date'):
-            formatted_output += f"Date: {result['date']}\n"
-        formatted_output += "\n"
+    async def run(query: str) -> List[Dict[str, Any]]:
+        async with semaphore:
+            return await searches[kind](query)
+    
+    # Duplicate queries share one search
+    unique_queries = list(dict.fromkeys(queries))
+    result_sets = await asyncio.gather(*(run(query) for query in unique_queries), return_exceptions=True)
+    
+    # One failed query shouldn't lose the others' results; only fail if every query did
+    failures = [(query, error) for query, error in zip(unique_queries, result_sets) if isinstance(error, Exception)]
+    if failures and len(failures) == len(unique_queries):
+        raise failures[0][1]
+    
+    # Merge in query order, keeping the first occurrence of each organic URL. Snapshots
+    # (sports_data, finance_data) share a generic link per search kind and are kept per query
+    merged = []
+    seen_links = set()
+    for query, results in zip(unique_queries, result_sets):
+        if isinstance(results, Exception):
+            continue
+        for result in results:
+            if result.get("type", "organic") == "organic" and result["link"]:
+                if result["link"] in seen_links:
+                    continue
+                seen_links.add(result["link"])
+            merged.append((query, result))
+    start = record_results([result for _, result in merged])
     
-    formatted_output += "=== END RESULTS ===\n\n"
-    formatted_output += "Instructions: Use this financial information to create a comprehensive summary focusing on current market trends, recent stock prices, economic news, and financial analysis. Include ALL sources in an 'Explore More' section."
+    # Raised failures are recorded by search_tool_error, so only record them when returning
+    if not merged and failures:
+        raise failures[0][1]
+    record_failures([error for _, error in failures])
     
-    return formatted_output 
\ No newline at end of file
+    with span("format"):
+        return format_search_results(kind, unique_queries, merged, failures, batch=True, start=start)